@@ -151,7 +151,12 @@ def main(args=None):
         '--downsample',
         dest='downsample',
         metavar='RATE',
-        help='downsample to RATE [Hz]')
+        help='downsample to RATE [Hz]. Non-integer ratios are handled with '
+             'a polyphase FIR resampler. Each output window is computed from '
+             'input padded by ten output samples on either side, which '
+             'covers the resampling filter, so that there are no artifacts '
+             'at window boundaries. RATE must not be higher than the '
+             'sampling rate of the input.')
 
     parser.add_option(
         '--output',
@@ -240,6 +245,14 @@ def main(args=None):
         metavar='/PATTERN/REPLACEMENT/',
         help='update channel code, can be given more than once')
 
+    parser.add_option(
+        '--mmap',
+        dest='mmap',
+        action='store_true',
+        default=False,
+        help='access uncompressed input files (SAC, KAN) through memory maps '
+             'instead of reading them completely')
+
     parser.add_option(
         '--output-data-type',
         dest='output_data_type',
@@ -325,7 +338,8 @@ def main(args=None):
         regex=options.regex,
         fileformat=options.format,
         cachedirname=options.cache_dir,
-        show_progress=not options.quiet)
+        show_progress=not options.quiet,
+        mmap=options.mmap)
 
     if p.tmin is None:
         die('data selection is empty')
@@ -359,6 +373,9 @@ def main(args=None):
 
     tpad = 0.
     if target_deltat is not None:
+        # also covers the half length of the polyphase resampling filter
+        # (10 output samples), so windows are processed independently and
+        # there is no pending tail to flush
         tpad = target_deltat * 10.
 
     if tinc is None:
@@ -397,7 +414,8 @@ def main(args=None):
                 for tr in traces:
                     try:
                         tr.downsample_to(
-                            target_deltat, snap=True, demean=False)
+                            target_deltat, snap=True, demean=False,
+                            allow_polyphase=True)
 
                         if options.output_data_type == 'same':
                             tr.ydata = tr.ydata.astype(tr.ydata.dtype)
@@ -408,6 +426,10 @@ def main(args=None):
                     except (trace.TraceTooShort, trace.NoData):
                         pass
 
+                    except util.UnavailableDecimation as e:
+                        die('cannot downsample %s.%s.%s.%s: %s' % (
+                            tr.nslc_id + (str(e),)))
+
                 traces = out_traces
 
             if options.output_data_type != 'same':
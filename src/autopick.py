@@ -38,3 +38,186 @@ def recursive_stalta(
         return temp
     else:
         return energytrace, temp
+
+
+# size of the per-channel state in autopick_ext.recursive_stalta_stream,
+# without the ring buffer
+_stalta_nstate = 7
+
+
+class _StaLtaChannel(object):
+    def __init__(self, deltat, tmin, ns, nl):
+        self.deltat = deltat
+        self.tnext = tmin
+        self.ns = ns
+        self.nl = nl
+        self.state = num.zeros(_stalta_nstate + ns, dtype=num.float64)
+        self.triggered = False
+        self.ton = None
+
+    def continues(self, tr):
+        return abs(self.deltat - tr.deltat) < self.deltat * 1e-6 \
+            and tr.tmin - self.deltat * 0.01 <= self.tnext \
+            <= tr.tmax + self.deltat * 1.01
+
+
+class StreamingStaLta(object):
+    '''
+    Recursive STA/LTA trigger for continuous data given in successive chunks.
+
+    Traces of any number of channels can be fed with :py:meth:`process`,
+    e.g. the windows produced by :py:meth:`pyrocko.pile.Pile.chopper` or
+    the traces arriving in a :py:class:`pyrocko.hamster_pile.HamsterPile`.
+    The filter state is kept per channel, so that the output does not depend
+    on how the data is split into chunks. Overlapping parts of successive
+    chunks (e.g. from the ``tpad`` argument of the chopper) are skipped. The
+    state of a channel is reset when a gap occurs.
+
+    The characteristic function is computed by the C extension, one call for
+    all channels sharing sampling rate and chunk length. It follows
+    :py:func:`recursive_stalta`, with the normalization term based on the
+    maximum of the LTA seen so far. For the first ``tshort+tlong`` seconds of
+    a channel, its output is 1.
+
+    A trigger is declared on when the characteristic function rises above
+    ``threshold_on`` and off when it falls below ``threshold_off``.
+    Completed triggers are returned as :py:class:`pyrocko.gui.marker.Marker`
+    objects spanning from on to off time.
+
+    :param tshort: length of short time window [s]
+    :param tlong: length of long time window [s]
+    :param kshort: weight of the short time window
+    :param klong: weight of the long time window
+    :param kderivative: weight of the derivative term in the characteristic
+        function
+    :param threshold_on: trigger on level
+    :param threshold_off: trigger off level (default: ``threshold_on``)
+    :param quad: whether to square the data prior to applying the filter
+    '''
+
+    def __init__(
+            self, tshort, tlong, kshort, klong, kderivative,
+            threshold_on, threshold_off=None, quad=True):
+
+        self.tshort = tshort
+        self.tlong = tlong
+        self.kshort = kshort
+        self.klong = klong
+        self.kderivative = kderivative
+        self.threshold_on = threshold_on
+        self.threshold_off = threshold_off \
+            if threshold_off is not None else threshold_on
+
+        self.quad = quad
+        self._channels = {}
+
+    def process(self, traces):
+        '''
+        Feed next chunk of data.
+
+        :param traces: list of :py:class:`pyrocko.trace.Trace` objects
+        :returns: tuple ``(cf_traces, markers)`` with the characteristic
+            function for the new data and the triggers completed in it
+        '''
+
+        from pyrocko.gui.marker import Marker
+
+        markers = []
+        batches = {}
+        for tr in traces:
+            if tr.ydata is None or tr.data_len() == 0:
+                continue
+
+            ch = self._channels.get(tr.nslc_id)
+            if ch is not None and ch.continues(tr):
+                iskip = int(round((ch.tnext - tr.tmin) / tr.deltat))
+            else:
+                if ch is not None and ch.triggered:
+                    markers.append(Marker(
+                        [tr.nslc_id], ch.ton, ch.tnext - ch.deltat))
+
+                ns = max(1, int(round(self.tshort / tr.deltat)))
+                nl = max(1, int(round(self.tlong / tr.deltat)))
+                ch = _StaLtaChannel(tr.deltat, tr.tmin, ns, nl)
+                self._channels[tr.nslc_id] = ch
+                iskip = 0
+
+            if iskip >= tr.data_len():
+                continue
+
+            ydata = tr.ydata[iskip:].astype(num.float32)
+            if self.quad:
+                ydata **= 2
+
+            k = (ch.ns, ch.nl, ydata.size)
+            batches.setdefault(k, []).append(
+                (tr, tr.tmin + iskip * tr.deltat, ch, ydata))
+
+        cf_traces = []
+        for (ns, nl, nsamples), batch in batches.items():
+            inout = num.vstack([ydata for (_, _, _, ydata) in batch])
+            state = num.vstack([ch.state for (_, _, ch, _) in batch])
+            autopick_ext.recursive_stalta_stream(
+                ns, nl, self.kshort/ns, self.klong/nl, self.kderivative,
+                inout, state)
+
+            for (tr, tmin, ch, _), cf, chstate in zip(batch, inout, state):
+                ch.state = chstate
+                ch.tnext = tmin + nsamples * tr.deltat
+                markers.extend(self._triggers(tr.nslc_id, ch, tmin, cf))
+                cf_tr = tr.copy(data=False)
+                cf_tr.tmin = tmin
+                cf_tr.set_ydata(cf)
+                cf_traces.append(cf_tr)
+
+        cf_traces.sort(key=lambda tr: (tr.nslc_id, tr.tmin))
+        markers.sort(key=lambda marker: marker.tmin)
+        return cf_traces, markers
+
+    def close(self):
+        '''
+        Finish processing, return markers for the triggers still on.
+
+        The triggers are ended at the last sample of the respective channel.
+        '''
+
+        from pyrocko.gui.marker import Marker
+
+        markers = [
+            Marker([nslc_id], ch.ton, ch.tnext - ch.deltat)
+            for (nslc_id, ch) in sorted(self._channels.items())
+            if ch.triggered]
+
+        self._channels = {}
+        markers.sort(key=lambda marker: marker.tmin)
+        return markers
+
+    def _triggers(self, nslc_id, ch, tmin, cf):
+        from pyrocko.gui.marker import Marker
+
+        ion = num.nonzero(cf > self.threshold_on)[0]
+        ioff = num.nonzero(cf < self.threshold_off)[0]
+        markers = []
+        ipos = 0
+        while True:
+            if not ch.triggered:
+                j = num.searchsorted(ion, ipos)
+                if j == ion.size:
+                    break
+
+                ch.triggered = True
+                ch.ton = tmin + ion[j] * ch.deltat
+                ipos = ion[j] + 1
+
+            else:
+                j = num.searchsorted(ioff, ipos)
+                if j == ioff.size:
+                    break
+
+                ch.triggered = False
+                markers.append(Marker(
+                    [nslc_id], ch.ton, tmin + ioff[j] * ch.deltat))
+
+                ipos = ioff[j] + 1
+
+        return markers
@@ -115,6 +115,149 @@ int autopick_recursive_stalta( int ns, int nl, float ks, float kl, float k, int
     return 0;
 }
 
+/*
+ * Streaming variant of the recursive STA/LTA.
+ *
+ * All information needed to continue with the next chunk of data is kept in
+ * the state array (length STALTA_NSTATE + ns, double precision), so that the
+ * result does not depend on how the data is split into chunks:
+ *
+ *   state[0]: number of samples processed so far
+ *   state[1]: last input sample (for the derivative term)
+ *   state[2]: sta
+ *   state[3]: lta
+ *   state[4]: maximum of |lta| so far
+ *   state[5]: running sum of cf for initialization of sta
+ *   state[6]: running sum of cf for initialization of lta
+ *   state[STALTA_NSTATE + (j % ns)]: cf of sample j, for the last ns samples
+ *
+ * During the first ns+nl samples, sta and lta are initialized with the means
+ * of cf over the samples [nl, nl+ns) and [0, nl) and the output is 1.
+ */
+
+#define STALTA_NSTATE 7
+
+void autopick_recursive_stalta_stream(int ns, int nl, double ks, double kl, double k, int nsamples, float *inout, double *state)
+{
+    int i;
+    long j;
+    double eps = 1.0e-7;
+    double x, cf, cf_lag, sta, lta, maxlta, sum_sta, sum_lta;
+    double *ring;
+
+    j = (long)state[0];
+    x = state[1];
+    sta = state[2];
+    lta = state[3];
+    maxlta = state[4];
+    sum_sta = state[5];
+    sum_lta = state[6];
+    ring = state + STALTA_NSTATE;
+
+    for (i=0; i<nsamples; i++) {
+        if (j == 0) {
+            cf = inout[i];
+        } else {
+            cf = inout[i] + fabs(k*(inout[i]-x));
+        }
+        x = inout[i];
+        cf_lag = ring[j % ns];
+        ring[j % ns] = cf;
+
+        if (j < nl) {
+            sum_lta += cf;
+            inout[i] = 1.0;
+        } else if (j < nl + ns) {
+            sum_sta += cf;
+            if (j == nl + ns - 1) {
+                sta = sum_sta / ns;
+                lta = sum_lta / nl;
+                maxlta = fabs(lta);
+            }
+            inout[i] = 1.0;
+        } else {
+            sta = ks*cf + (1.-ks)*sta;
+            lta = kl*cf_lag + (1.-kl)*lta;
+            maxlta = max(fabs(lta), maxlta);
+            inout[i] = (sta + eps*maxlta + eps*eps) / (lta + eps*maxlta + eps*eps);
+        }
+
+        j++;
+    }
+
+    state[0] = (double)j;
+    state[1] = x;
+    state[2] = sta;
+    state[3] = lta;
+    state[4] = maxlta;
+    state[5] = sum_sta;
+    state[6] = sum_lta;
+}
+
+static PyObject* autopick_recursive_stalta_stream_wrapper(PyObject *module, PyObject *args) {
+    PyObject *inout_array_obj, *state_array_obj;
+    PyArrayObject *inout_array = NULL;
+    PyArrayObject *state_array = NULL;
+    int ns, nl, nchannels, nsamples, ichannel;
+    double ks, kl, k;
+    float *inout;
+    double *state;
+
+    struct module_state *st = GETSTATE(module);
+    if (!PyArg_ParseTuple(args, "iidddOO", &ns, &nl, &ks, &kl, &k, &inout_array_obj, &state_array_obj)) {
+        PyErr_SetString(st->error, "invalid arguments in recursive_stalta_stream(ns, nl, ks, kl, k, inout_data, state)" );
+        return NULL;
+    }
+
+    if (ns < 1 || nl < 1) {
+        PyErr_SetString(st->error, "ns and nl must be positive.");
+        return NULL;
+    }
+
+    if (!PyArray_Check(inout_array_obj) ||
+            PyArray_TYPE((PyArrayObject*)inout_array_obj) != NPY_FLOAT32 ||
+            PyArray_NDIM((PyArrayObject*)inout_array_obj) != 2 ||
+            !PyArray_IS_C_CONTIGUOUS((PyArrayObject*)inout_array_obj)) {
+        PyErr_SetString(st->error, "inout_data must be a C-contiguous 2D float32 array.");
+        return NULL;
+    }
+
+    if (!PyArray_Check(state_array_obj) ||
+            PyArray_TYPE((PyArrayObject*)state_array_obj) != NPY_FLOAT64 ||
+            PyArray_NDIM((PyArrayObject*)state_array_obj) != 2 ||
+            !PyArray_IS_C_CONTIGUOUS((PyArrayObject*)state_array_obj)) {
+        PyErr_SetString(st->error, "state must be a C-contiguous 2D float64 array.");
+        return NULL;
+    }
+
+    inout_array = (PyArrayObject*)inout_array_obj;
+    state_array = (PyArrayObject*)state_array_obj;
+
+    nchannels = PyArray_DIM(inout_array, 0);
+    nsamples = PyArray_DIM(inout_array, 1);
+
+    if (PyArray_DIM(state_array, 0) != nchannels ||
+            PyArray_DIM(state_array, 1) != STALTA_NSTATE + ns) {
+        PyErr_SetString(st->error, "state must have shape (nchannels, 7+ns).");
+        return NULL;
+    }
+
+    inout = (float*)PyArray_DATA(inout_array);
+    state = (double*)PyArray_DATA(state_array);
+
+    Py_BEGIN_ALLOW_THREADS
+    for (ichannel=0; ichannel<nchannels; ichannel++) {
+        autopick_recursive_stalta_stream(
+            ns, nl, ks, kl, k, nsamples,
+            inout + (size_t)ichannel*nsamples,
+            state + (size_t)ichannel*(STALTA_NSTATE + ns));
+    }
+    Py_END_ALLOW_THREADS
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 static PyObject* autopick_recursive_stalta_wrapper(PyObject *module, PyObject *args) {
     PyObject *inout_array_obj, *temp_array_obj;
     PyArrayObject *inout_array = NULL;
@@ -166,6 +309,9 @@ static PyMethodDef AutoPickMethods[] = {
     {"recursive_stalta",  (PyCFunction) autopick_recursive_stalta_wrapper, METH_VARARGS,
         "Recursive STA/LTA picker." },
 
+    {"recursive_stalta_stream",  (PyCFunction) autopick_recursive_stalta_stream_wrapper, METH_VARARGS,
+        "Recursive STA/LTA with state carried between calls, for many channels." },
+
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
@@ -677,6 +677,132 @@ static store_error_t store_sum(
     return SUCCESS;
 }
 
+static store_error_t store_sum_many_extent(
+        const store_t *store,
+        const uint64_t *irecords,
+        const float32_t *delays,
+        const uint64_t *offsets,
+        const int32_t *itoffsets,
+        size_t npairs,
+        int32_t *nsamples_,
+        int32_t *itmin_) {
+
+    size_t ipair;
+    int32_t itmin, nsamples, itmin_all, itmax_all;
+    int ihave;
+    store_error_t err;
+
+    itmin_all = itmax_all = 0;
+    ihave = 0;
+    for (ipair=0; ipair<npairs; ipair++) {
+        if (offsets[ipair+1] == offsets[ipair])
+            continue;
+
+        err = store_sum_extent(
+            store, &irecords[offsets[ipair]], &delays[offsets[ipair]],
+            offsets[ipair+1] - offsets[ipair], &nsamples, &itmin);
+
+        if (SUCCESS != err)
+            return err;
+
+        itmin += itoffsets[ipair];
+        if (!inlimits(itmin))
+            return BAD_REQUEST;
+
+        if (ihave) {
+            itmin_all = min(itmin_all, itmin);
+            itmax_all = max(itmax_all, itmin + nsamples);
+        } else {
+            itmin_all = itmin;
+            itmax_all = itmin + nsamples;
+            ihave = 1;
+        }
+    }
+
+    *itmin_ = itmin_all;
+    *nsamples_ = itmax_all - itmin_all;
+    return SUCCESS;
+}
+
+static store_error_t store_sum_many(
+        const store_t *store,
+        const uint64_t *irecords,
+        const float32_t *delays,
+        const float32_t *weights,
+        const uint64_t *offsets,
+        const int32_t *itoffsets,
+        size_t npairs,
+        int32_t itmin,
+        int32_t nsamples,
+        int32_t nthreads,
+        gf_dtype *out,
+        npy_bool *is_zero,
+        gf_dtype *begin_values,
+        gf_dtype *end_values) {
+
+    /* Sum GF traces for many (source, receiver) pairs into the rows of a
+     * preallocated and zeroed output array of shape (npairs, nsamples). The
+     * summation parameters of pair ipair are found in the index range
+     * offsets[ipair]:offsets[ipair+1] of irecords, delays and weights; its
+     * delays are relative to sample itoffsets[ipair]. */
+
+    size_t ipair;
+    trace_t result;
+    store_error_t err = SUCCESS, err_this;
+    (void) nthreads;
+
+    if (!inposlimits(nsamples))
+        return BAD_REQUEST;
+
+    #if defined(_OPENMP)
+        if (nthreads == 0)
+            nthreads = omp_get_num_procs();
+
+        /* without mmap, traces are read and cached on demand, which is not
+         * thread-safe */
+        if (NULL == store->data)
+            nthreads = 1;
+
+        #pragma omp parallel \
+            shared (store, irecords, delays, weights, offsets, itoffsets, \
+                    npairs, itmin, nsamples, out, is_zero, begin_values, \
+                    end_values, err) \
+            private (result, err_this) \
+            num_threads (nthreads)
+        {
+        #pragma omp for schedule (dynamic)
+    #endif
+        for (ipair=0; ipair<npairs; ipair++) {
+            result.data = &out[ipair*nsamples];
+            result.itmin = itmin - itoffsets[ipair];
+            result.nsamples = nsamples;
+
+            err_this = store_sum(
+                store,
+                &irecords[offsets[ipair]],
+                &delays[offsets[ipair]],
+                &weights[offsets[ipair]],
+                offsets[ipair+1] - offsets[ipair],
+                &result);
+
+            if (SUCCESS != err_this) {
+                #if defined(_OPENMP)
+                #pragma omp critical
+                #endif
+                err = err_this;
+            }
+
+            is_zero[ipair] = result.is_zero;
+            begin_values[ipair] = result.begin_value;
+            end_values[ipair] = result.end_value;
+        }
+    #if defined(_OPENMP)
+        }
+    #endif
+
+    return err;
+}
+
 static store_error_t store_sum_static(
         const store_t *store,
         const uint64_t *irecords,
@@ -1737,6 +1863,137 @@ static PyObject* w_store_sum(PyObject *m, PyObject *args) {
                          result.is_zero, result.begin_value, result.end_value);
 }
 
+static PyObject* w_store_sum_many(PyObject *m, PyObject *args) {
+    PyObject *capsule, *irecords_arr, *delays_arr, *weights_arr, *offsets_arr,
+             *itoffsets_arr;
+    PyArrayObject *array = NULL, *is_zero_arr = NULL, *begin_values_arr = NULL,
+                  *end_values_arr = NULL;
+    store_t *store;
+    npy_intp array_dims[2] = {0, 0};
+    uint64_t *irecords, *offsets;
+    float32_t *delays, *weights;
+    int32_t *itoffsets;
+    npy_intp n_, npairs_;
+    size_t npairs, ipair;
+    int itmin_, nsamples_, nthreads_;
+    int32_t itmin, nsamples;
+    store_error_t err;
+
+    struct module_state *st = GETSTATE(m);
+
+    if (!PyArg_ParseTuple(args, "OOOOOOiii", &capsule, &irecords_arr,
+                          &delays_arr, &weights_arr, &offsets_arr,
+                          &itoffsets_arr, &itmin_, &nsamples_, &nthreads_)) {
+        PyErr_SetString(st->error,
+            "usage: store_sum_many(cstore, irecords, delays, weights, offsets, itoffsets, itmin, nsamples, nthreads)");
+
+        return NULL;
+    }
+
+    store = get_store_from_capsule(capsule);
+    if (store == NULL) return NULL;
+
+    if (!good_array(irecords_arr, NPY_UINT64, -1, 1, NULL)) return NULL;
+    n_ = PyArray_SIZE((PyArrayObject*)irecords_arr);
+
+    if (!good_array(delays_arr, NPY_FLOAT32, n_, 1, NULL)) return NULL;
+    if (!good_array(weights_arr, NPY_FLOAT32, n_, 1, NULL)) return NULL;
+    if (!good_array(offsets_arr, NPY_UINT64, -1, 1, NULL)) return NULL;
+
+    npairs_ = PyArray_SIZE((PyArrayObject*)offsets_arr) - 1;
+    if (npairs_ < 0) {
+        PyErr_SetString(st->error,
+            "store_sum_many: offsets array must not be empty");
+        return NULL;
+    }
+
+    if (!good_array(itoffsets_arr, NPY_INT32, npairs_, 1, NULL)) return NULL;
+
+    npairs = npairs_;
+    irecords = PyArray_DATA((PyArrayObject*)irecords_arr);
+    delays = PyArray_DATA((PyArrayObject*)delays_arr);
+    weights = PyArray_DATA((PyArrayObject*)weights_arr);
+    offsets = PyArray_DATA((PyArrayObject*)offsets_arr);
+    itoffsets = PyArray_DATA((PyArrayObject*)itoffsets_arr);
+
+    if (offsets[0] != 0 || offsets[npairs] != (uint64_t)n_) {
+        PyErr_SetString(st->error, "store_sum_many: invalid offsets");
+        return NULL;
+    }
+
+    for (ipair=0; ipair<npairs; ipair++) {
+        if (offsets[ipair+1] < offsets[ipair] ||
+                offsets[ipair+1] - offsets[ipair] > SLIMIT) {
+            PyErr_SetString(st->error, "store_sum_many: invalid offsets");
+            return NULL;
+        }
+    }
+
+    if (!inlimits(itmin_)) {
+        PyErr_SetString(st->error, "store_sum_many: invalid itmin argument");
+        return NULL;
+    }
+    itmin = itmin_;
+
+    if (!(inposlimits(nsamples_) || -1 == nsamples_)) {
+        PyErr_SetString(st->error,
+            "store_sum_many: invalid nsamples argument");
+        return NULL;
+    }
+    nsamples = nsamples_;
+
+    if (nsamples == -1) {
+        err = store_sum_many_extent(
+            store, irecords, delays, offsets, itoffsets, npairs,
+            &nsamples, &itmin);
+
+        if (SUCCESS != err) {
+            PyErr_SetString(st->error, store_error_names[err]);
+            return NULL;
+        }
+    }
+
+    array_dims[0] = npairs;
+    array_dims[1] = nsamples;
+    array = (PyArrayObject*)PyArray_ZEROS(2, array_dims, NPY_GFDTYPE, 0);
+    is_zero_arr = (PyArrayObject*)PyArray_ZEROS(1, array_dims, NPY_BOOL, 0);
+    begin_values_arr = (PyArrayObject*)PyArray_ZEROS(
+        1, array_dims, NPY_GFDTYPE, 0);
+    end_values_arr = (PyArrayObject*)PyArray_ZEROS(
+        1, array_dims, NPY_GFDTYPE, 0);
+
+    if (array == NULL || is_zero_arr == NULL || begin_values_arr == NULL ||
+            end_values_arr == NULL) {
+        Py_XDECREF(array);
+        Py_XDECREF(is_zero_arr);
+        Py_XDECREF(begin_values_arr);
+        Py_XDECREF(end_values_arr);
+        return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    err = store_sum_many(
+        store, irecords, delays, weights, offsets, itoffsets, npairs,
+        itmin, nsamples, nthreads_,
+        (gf_dtype*)PyArray_DATA(array),
+        (npy_bool*)PyArray_DATA(is_zero_arr),
+        (gf_dtype*)PyArray_DATA(begin_values_arr),
+        (gf_dtype*)PyArray_DATA(end_values_arr));
+    Py_END_ALLOW_THREADS
+
+    if (SUCCESS != err) {
+        Py_DECREF(array);
+        Py_DECREF(is_zero_arr);
+        Py_DECREF(begin_values_arr);
+        Py_DECREF(end_values_arr);
+        PyErr_SetString(st->error, store_error_names[err]);
+        return NULL;
+    }
+
+    return Py_BuildValue("NifNNN", array, itmin, store->deltat,
+                         is_zero_arr, begin_values_arr, end_values_arr);
+}
+
 static PyObject* w_store_sum_static(PyObject *m, PyObject *args) {
     PyObject *capsule;
     PyArrayObject *irecords_arr, *delays_arr, *weights_arr, *result_arr;
@@ -1933,6 +2190,10 @@ static PyMethodDef store_ext_methods[] = {
     {"store_sum", w_store_sum, METH_VARARGS,
         "Get weight-and-delay-sum of GF traces." },
 
+    {"store_sum_many", w_store_sum_many, METH_VARARGS,
+        "Get weight-and-delay-sums of GF traces for many source-receiver "
+        "pairs." },
+
     {"store_sum_static", w_store_sum_static, METH_VARARGS,
         "Get weight-and-delay-sum of GF samples for static displacement." },
 
@@ -24,6 +24,7 @@ from pyrocko.guts_array import Array
 
 from pyrocko import moment_tensor as mt
 from pyrocko import trace, util, config, model
+from pyrocko.parimap import parimap
 from pyrocko.orthodrome import ne_to_latlon
 from pyrocko.model import Location
 
@@ -151,13 +152,12 @@ def arr(x):
     return num.atleast_1d(num.asarray(x))
 
 
-def discretize_rect_source(deltas, deltat, strike, dip, length, width,
-                           anchor, velocity, stf=None,
-                           nucleation_x=None, nucleation_y=None,
-                           tref=0.0, decimation_factor=1):
+cached_rect_source_geometry = util.LRUCache(nbytes_max=64*1024**2)
 
-    if stf is None:
-        stf = STF()
+
+def _discretize_rect_source_geometry(
+        deltas, deltat, strike, dip, length, width, anchor, velocity,
+        nucleation_x, nucleation_y, decimation_factor):
 
     mindeltagf = num.min(deltas)
     mindeltagf = min(mindeltagf, deltat * velocity)
@@ -168,19 +168,12 @@ def discretize_rect_source(deltas, deltat, strike, dip, length, width,
     nl = int((2./decimation_factor) * num.ceil(ln / mindeltagf)) + 1
     nw = int((2./decimation_factor) * num.ceil(wd / mindeltagf)) + 1
 
-    n = int(nl*nw)
-
     dl = ln / nl
     dw = wd / nw
 
     xl = num.linspace(-0.5*(ln-dl), 0.5*(ln-dl), nl)
     xw = num.linspace(-0.5*(wd-dw), 0.5*(wd-dw), nw)
 
-    points = num.empty((n, 3), dtype=num.float)
-    points[:, 0] = num.tile(xl, nw)
-    points[:, 1] = num.repeat(xw, nl)
-    points[:, 2] = 0.0
-
     anch_x = 0.
     anch_y = 0.
     if anchor == 'top' or anchor == 'bottom':
@@ -200,33 +193,83 @@ def discretize_rect_source(deltas, deltat, strike, dip, length, width,
     if anchor == 'bottom_right' or anchor == 'bottom_left':
         anch_y *= -1.
 
-    points[:, 0] += anch_x
-    points[:, 1] += anch_y
+    xl += anch_x
+    xw += anch_y
 
+    # rupture times on the (nw, nl) grid
     if nucleation_x is not None:
-        dist_x = num.abs(nucleation_x - points[:, 0])
+        dist_x2 = (nucleation_x - xl)**2
     else:
-        dist_x = num.zeros(n)
+        dist_x2 = num.zeros(nl)
 
     if nucleation_y is not None:
-        dist_y = num.abs(nucleation_y - points[:, 1])
+        dist_y2 = (nucleation_y - xw)**2
     else:
-        dist_y = num.zeros(n)
+        dist_y2 = num.zeros(nw)
 
-    dist = num.sqrt(dist_x**2 + dist_y**2)
-    times = dist / velocity
+    times = num.sqrt(
+        dist_x2[num.newaxis, :] + dist_y2[:, num.newaxis]).ravel()
+    times /= velocity
 
+    # rotated points, equivalent to rotmat.T . (xl, xw, 0)
     rotmat = num.asarray(
         mt.euler_to_matrix(dip*d2r, strike*d2r, 0.0))
 
-    points = num.dot(rotmat.T, points.T).T
+    points = (
+        xl[num.newaxis, :, num.newaxis] * rotmat[0, :]
+        + xw[:, num.newaxis, num.newaxis] * rotmat[1, :]).reshape(-1, 3)
+
+    points.flags.writeable = False
+    times.flags.writeable = False
+
+    return points, times, dl, dw
+
+
+def _discretize_rect_source_compact(
+        deltas, deltat, strike, dip, length, width, anchor, velocity, stf,
+        nucleation_x, nucleation_y, tref, decimation_factor):
+
+    # The geometric part of the discretization does not depend on STF and
+    # moment and is cached. Returned point coordinates and rupture times are
+    # read-only and have to be combined with the STF samples by the caller.
+
+    if stf is None:
+        stf = STF()
+
+    key = (
+        tuple(float(x) for x in deltas), deltat, strike, dip, length, width,
+        anchor, velocity, nucleation_x, nucleation_y, decimation_factor)
+
+    points, times, dl, dw = cached_rect_source_geometry.get_or_set(
+        key, lambda: _discretize_rect_source_geometry(*key))
 
     xtau, amplitudes = stf.discretize_t(deltat, tref)
+
+    return points, times, xtau, amplitudes, dl, dw
+
+
+def discretize_rect_source(deltas, deltat, strike, dip, length, width,
+                           anchor, velocity, stf=None,
+                           nucleation_x=None, nucleation_y=None,
+                           tref=0.0, decimation_factor=1):
+
+    points, times, xtau, amplitudes, dl, dw = \
+        _discretize_rect_source_compact(
+            deltas, deltat, strike, dip, length, width, anchor, velocity,
+            stf, nucleation_x, nucleation_y, tref, decimation_factor)
+
+    n = times.size
     nt = xtau.size
 
-    points2 = num.repeat(points, nt, axis=0)
-    times2 = num.repeat(times, nt) + num.tile(xtau, n)
-    amplitudes2 = num.tile(amplitudes, n)
+    points2 = num.empty((n, nt, 3))
+    points2[:] = points[:, num.newaxis, :]
+    points2 = points2.reshape((n*nt, 3))
+
+    times2 = (times[:, num.newaxis] + xtau[num.newaxis, :]).ravel()
+
+    amplitudes2 = num.empty((n, nt))
+    amplitudes2[:] = amplitudes[num.newaxis, :]
+    amplitudes2 = amplitudes2.ravel()
 
     return points2, times2, amplitudes2, dl, dw
 
@@ -1244,7 +1287,9 @@ class ExplosionSource(SourceWithDerivedMagnitude):
     discretized_source_class = meta.DiscretizedExplosionSource
 
     def base_key(self):
-        return Source.base_key(self)
+        # the moment is applied during discretization
+        return Source.base_key(self) + (
+            self.magnitude, self.volume_change, self.interpolation)
 
     def check_conflicts(self):
         if self.magnitude is not None and self.volume_change is not None:
@@ -1362,7 +1407,8 @@ class RectangularExplosionSource(ExplosionSource):
     def base_key(self):
         return Source.base_key(self) + (self.strike, self.dip, self.length,
                                         self.width, self.nucleation_x,
-                                        self.nucleation_y, self.velocity)
+                                        self.nucleation_y, self.velocity,
+                                        self.anchor)
 
     def discretize_basesource(self, store, target=None):
 
@@ -1378,19 +1424,22 @@ class RectangularExplosionSource(ExplosionSource):
 
         stf = self.effective_stf_pre()
 
-        points, times, amplitudes, dl, dw = discretize_rect_source(
-            store.config.deltas, store.config.deltat,
-            self.strike, self.dip, self.length, self.width, self.anchor,
-            self.velocity, stf=stf, nucleation_x=nucx, nucleation_y=nucy)
+        points, times, xtau, amplitudes, dl, dw = \
+            _discretize_rect_source_compact(
+                store.config.deltas, store.config.deltat,
+                self.strike, self.dip, self.length, self.width, self.anchor,
+                self.velocity, stf, nucx, nucy, 0.0, 1)
+
+        nt = xtau.size
 
         return meta.DiscretizedExplosionSource(
             lat=self.lat,
             lon=self.lon,
-            times=times,
-            north_shifts=self.north_shift + points[:, 0],
-            east_shifts=self.east_shift + points[:, 1],
-            depths=self.depth + points[:, 2],
-            m0s=amplitudes)
+            times=(times[:, num.newaxis] + xtau[num.newaxis, :]).ravel(),
+            north_shifts=num.repeat(self.north_shift + points[:, 0], nt),
+            east_shifts=num.repeat(self.east_shift + points[:, 1], nt),
+            depths=num.repeat(self.depth + points[:, 2], nt),
+            m0s=num.tile(amplitudes, times.size))
 
     def outline(self, cs='xyz'):
         points = outline_rect_source(self.strike, self.dip, self.length,
@@ -1678,7 +1727,17 @@ class RectangularSource(DCSource):
             self.nucleation_x,
             self.nucleation_y,
             self.velocity,
-            self.slip)
+            self.slip,
+            self.anchor,
+            self.decimation_factor,
+            self.interpolation)
+
+    def get_factor(self):
+        if self.slip is not None:
+            # the moment is applied during discretization
+            return 1.0
+
+        return DCSource.get_factor(self)
 
     def discretize_basesource(self, store, target=None):
 
@@ -1694,45 +1753,50 @@ class RectangularSource(DCSource):
 
         stf = self.effective_stf_pre()
 
-        points, times, amplitudes, dl, dw = discretize_rect_source(
-            store.config.deltas, store.config.deltat,
-            self.strike, self.dip, self.length, self.width, self.anchor,
-            self.velocity, stf=stf, nucleation_x=nucx, nucleation_y=nucy,
-            decimation_factor=self.decimation_factor)
+        points, times, xtau, amplitudes, dl, dw = \
+            _discretize_rect_source_compact(
+                store.config.deltas, store.config.deltat,
+                self.strike, self.dip, self.length, self.width, self.anchor,
+                self.velocity, stf, nucx, nucy, 0.0, self.decimation_factor)
+
+        npoints = times.size
+        nt = xtau.size
+        n = npoints * nt
+
+        depths = self.depth + points[:, 2]
 
         if self.slip is not None:
             points2 = points.copy()
-            points2[:, 2] += self.depth
+            points2[:, 2] = depths
             shear_moduli = store.config.get_shear_moduli(
                 self.lat, self.lon,
                 points=points2,
                 interpolation=self.interpolation)
 
-            amplitudes *= dl * dw * shear_moduli * self.slip
-
-            n = times.size
+            amplitudes = (
+                (dl * dw * self.slip) * shear_moduli[:, num.newaxis]
+                * amplitudes[num.newaxis, :]).ravel()
 
             mot = mt.MomentTensor(
                 strike=self.strike, dip=self.dip, rake=self.rake)
 
             self.moment = 1.0
         else:
-            n = times.size
+            amplitudes = num.tile(amplitudes, npoints)
 
             mot = mt.MomentTensor(
                 strike=self.strike, dip=self.dip, rake=self.rake,
                 scalar_moment=1.0/n)
 
-        m6s = num.repeat(mot.m6()[num.newaxis, :], n, axis=0)
-        m6s[:, :] *= amplitudes[:, num.newaxis]
+        m6s = amplitudes[:, num.newaxis] * mot.m6()[num.newaxis, :]
 
         ds = meta.DiscretizedMTSource(
             lat=self.lat,
             lon=self.lon,
-            times=times,
-            north_shifts=self.north_shift + points[:, 0],
-            east_shifts=self.east_shift + points[:, 1],
-            depths=self.depth + points[:, 2],
+            times=(times[:, num.newaxis] + xtau[num.newaxis, :]).ravel(),
+            north_shifts=num.repeat(self.north_shift + points[:, 0], nt),
+            east_shifts=num.repeat(self.east_shift + points[:, 1], nt),
+            depths=num.repeat(depths, nt),
             m6s=m6s)
 
         return ds
@@ -1990,7 +2054,8 @@ class RingfaultSource(SourceWithMagnitude):
     discretized_source_class = meta.DiscretizedMTSource
 
     def base_key(self):
-        return Source.base_key(self) + (self.strike, self.dip, self.diameter)
+        return Source.base_key(self) + (
+            self.strike, self.dip, self.diameter, self.npointsources)
 
     def get_factor(self):
         return self.sign * self.moment
@@ -2255,6 +2320,22 @@ class Request(Object):
         return m
 
 
+class WorkerStats(Object):
+    '''
+    Timing information of a worker process used in
+    :py:meth:`LocalEngine.process`.
+    '''
+
+    pid = Int.T(help='process id of the worker')
+    n_subrequests = Int.T(
+        default=0,
+        help='number of subrequests processed by the worker')
+    t_busy = Float.T(
+        default=0.,
+        help='wallclock time [s] spent by the worker on processing '
+             'subrequests')
+
+
 class ProcessingStats(Object):
     t_perc_get_store_and_receiver = Float.T(default=0.)
     t_perc_discretize_source = Float.T(default=0.)
@@ -2274,6 +2355,13 @@ class ProcessingStats(Object):
     n_subrequests = Int.T(default=0)
     n_stores = Int.T(default=0)
     n_records_stacked = Int.T(default=0)
+    n_dsource_cache_hits = Int.T(default=0)
+    n_dsource_cache_misses = Int.T(default=0)
+    n_procs = Int.T(default=1)
+    workers = List.T(
+        WorkerStats.T(),
+        help='per-worker timing of the dynamic subrequests, when processed '
+             'in multiple processes')
 
 
 class Response(Object):
@@ -2476,63 +2564,47 @@ class OutOfBoundsContext(Object):
 
 
 def process_subrequest_dynamic(work, pshared=None):
+    '''
+    Process a single dynamic subrequest in a :py:func:`pyrocko.parimap`
+    worker.
+
+    The engine, the request's sources and targets and the worker's caches are
+    passed through ``pshared``, which is inherited by the forked worker
+    processes. File handles of the GF stores opened in the parent process
+    must not be shared between processes, so on its first call in a new
+    process, the worker closes the inherited stores of the engine. They are
+    re-opened on demand by :py:meth:`LocalEngine.get_store`.
+
+    :returns: tuple ``(results, worker_stats)`` where ``results`` is a list
+        of ``((isource, itarget, result), tcounters)`` items, as yielded by
+        :py:func:`process_dynamic` and ``worker_stats`` is a tuple ``(pid,
+        t_busy, nhits, nmisses)`` with the process id of the worker, the
+        wallclock time spent on the subrequest and the numbers of hits and
+        misses in the worker's discretized source cache.
+    '''
+
     engine = pshared['engine']
-    _, _, isources, itargets = work
-
-    sources = [pshared['sources'][isource] for isource in isources]
-    targets = [pshared['targets'][itarget] for itarget in itargets]
-
-    components = set()
-    for target in targets:
-        rule = engine.get_rule(sources[0], target)
-        components.update(rule.required_components(target))
-
-    try:
-        base_seismogram, tcounters = engine.base_seismogram(
-            sources[0],
-            targets[0],
-            components,
-            pshared['dsource_cache'])
-
-    except meta.OutOfBounds as e:
-        e.context = OutOfBoundsContext(
-            source=sources[0],
-            target=targets[0],
-            distance=sources[0].distance_to(targets[0]),
-            components=components)
-        raise
-
-    n_records_stacked = 0
-    t_optimize = 0.0
-    t_stack = 0.0
-    for _, tr in base_seismogram.items():
-        n_records_stacked += tr.n_records_stacked
-        t_optimize += tr.t_optimize
-        t_stack += tr.t_stack
-
-    results = []
-    for isource, source in zip(isources, sources):
-        for itarget, target in zip(itargets, targets):
-            try:
-                result = engine._post_process_dynamic(
-                    base_seismogram, source, target)
-                result.n_records_stacked = n_records_stacked
-                result.n_shared_stacking = len(sources) * len(targets)
-                result.t_optimize = t_optimize
-                result.t_stack = t_stack
 
-            except SeismosizerError as e:
-                result = e
+    pid = os.getpid()
+    if pshared['pid'] != pid:
+        engine.close_cashed_stores()
+        pshared['pid'] = pid
 
-            results.append((isource, itarget, result))
+    dsource_cache = engine._dsource_cache
+    nhits, nmisses = dsource_cache.nhits, dsource_cache.nmisses
 
-    tcounters.append(xtime())
+    t0 = xtime()
+    results = list(process_dynamic(
+        [work], pshared['sources'], pshared['targets'], engine,
+        nthreads=pshared['nthreads']))
 
-    return results, tcounters
+    return results, (
+        pid, xtime() - t0,
+        dsource_cache.nhits - nhits, dsource_cache.nmisses - nmisses)
 
 
-def process_dynamic(work, psources, ptargets, engine, nthreads=0):
-    dsource_cache = {}
+def process_dynamic(work, psources, ptargets, engine, nthreads=0,
+                    dsource_cache=None):
 
     for w in work:
         _, _, isources, itargets = w
@@ -2612,6 +2684,56 @@ def process_static(work, psources, ptargets, engine, nthreads=0):
                 yield (isource, itarget, result), tcounters
 
 
+cached_stf_spectra = util.LRUCache(nbytes_max=64*1024**2)
+
+
+def _dsource_nbytes(dsource):
+    return sum(
+        v.nbytes for v in dsource.__dict__.values()
+        if isinstance(v, num.ndarray))
+
+
+def _get_cached_stf_spectrum(amplitudes, nfft):
+    key = (amplitudes.tobytes(), nfft)
+    return cached_stf_spectra.get_or_set(
+        key, lambda: num.fft.rfft(amplitudes, nfft))
+
+
+def apply_stf(amplitudes, data):
+    '''
+    Convolve seismogram with discretized source time function.
+
+    The seismogram is continued with its last value, to prevent boundary
+    effects at its end, as if it was padded by ``amplitudes.size - 1``
+    samples. The convolution is computed directly or via FFT, depending on
+    which is cheaper for the given lengths. The spectra of the source time
+    functions are cached, so that they are shared among all targets of a
+    source.
+
+    :param amplitudes: STF amplitudes, as returned by ``discretize_t``
+    :param data: seismogram samples
+    :returns: array of length ``data.size + amplitudes.size - 1``
+    '''
+
+    ndata = data.size
+    nstf = amplitudes.size
+
+    if nstf == 1:
+        return num.multiply(data, amplitudes[0], dtype=num.float)
+
+    nout = ndata + nstf - 1
+    nfft = trace.nextpow2(nout)
+    if ndata * nstf > 8. * nfft * math.log(nfft, 2):
+        out = num.fft.irfft(
+            num.fft.rfft(data, nfft) * _get_cached_stf_spectrum(
+                amplitudes, nfft), nfft)[:nout]
+    else:
+        out = num.convolve(amplitudes, data)
+
+    out[ndata:] += data[-1] * num.cumsum(amplitudes[:-1])
+    return out
+
+
 class LocalEngine(Engine):
     '''
     Offline synthetic seismogram calculator.
@@ -2621,6 +2743,9 @@ class LocalEngine(Engine):
         GF_STORE_SUPERDIRS AND GF_STORE_DIRS
     :param use_config: if ``True``, fill :py:attr:`store_superdirs` and
         :py:attr:`store_dirs` with paths set in the user's config file.
+    :param dsource_cache_nbytes_max: memory limit in bytes of the cache of
+        discretized sources, which is kept across calls to :py:meth:`process`
+        (see :py:meth:`clear_dsource_cache`)
     '''
 
     store_superdirs = List.T(
@@ -2639,6 +2764,8 @@ class LocalEngine(Engine):
     def __init__(self, **kwargs):
         use_env = kwargs.pop('use_env', False)
         use_config = kwargs.pop('use_config', False)
+        dsource_cache_nbytes_max = kwargs.pop(
+            'dsource_cache_nbytes_max', 256*1024**2)
         Engine.__init__(self, **kwargs)
         if use_env:
             env_store_superdirs = os.environ.get('GF_STORE_SUPERDIRS', '')
@@ -2658,6 +2785,8 @@ class LocalEngine(Engine):
         self._id_to_store_dir = {}
         self._open_stores = {}
         self._effective_default_store_id = None
+        self._dsource_cache = util.LRUCache(
+            nbytes_max=dsource_cache_nbytes_max, sizeof=_dsource_nbytes)
 
     def _check_store_dirs_type(self):
         for sdir in ['store_dirs', 'store_superdirs']:
@@ -2806,13 +2935,53 @@ class LocalEngine(Engine):
                 source.__class__.__name__))
 
     def _cached_discretize_basesource(self, source, store, cache, target):
-        if (source, store) not in cache:
-            cache[source, store] = source.discretize_basesource(store, target)
+        if cache is not None:
+            if (source, store) not in cache:
+                cache[source, store] = source.discretize_basesource(
+                    store, target)
 
-        return cache[source, store]
+            return cache[source, store]
 
-    def base_seismogram(self, source, target, components, dsource_cache,
-                        nthreads):
+        return self._dsource_cache.get_or_set(
+            (store.store_dir, source.base_key()),
+            lambda: source.discretize_basesource(store, target))
+
+    def clear_dsource_cache(self, store_id=None):
+        '''
+        Discard cached discretized sources.
+
+        Discretized sources are cached across calls to :py:meth:`process`,
+        keyed by the store and :py:meth:`Source.base_key`. The cache must be
+        cleared when a store's configuration is changed while the engine is
+        in use.
+
+        :param store_id: if given, only the entries computed for this store
+            are discarded
+        '''
+
+        if store_id is None:
+            self._dsource_cache.clear()
+        else:
+            store_dir = self.get_store_dir(store_id)
+            for key in self._dsource_cache.keys():
+                if key[0] == store_dir:
+                    try:
+                        del self._dsource_cache[key]
+                    except KeyError:
+                        pass
+
+    def get_dsource_cache_stats(self):
+        '''
+        Get statistics of the discretized source cache.
+
+        :returns: dict, as returned by
+            :py:meth:`pyrocko.util.LRUCache.get_stats`
+        '''
+
+        return self._dsource_cache.get_stats()
+
+    def base_seismogram(self, source, target, components, dsource_cache=None,
+                        nthreads=0):
 
         tcounters = [xtime()]
 
@@ -2873,7 +3042,8 @@ class LocalEngine(Engine):
                 itsnapshot = 1
             tcounters.append(xtime())
 
-            base_source = source.discretize_basesource(store_)
+            base_source = self._cached_discretize_basesource(
+                source, store_, None, target)
 
             tcounters.append(xtime())
 
@@ -2906,17 +3076,13 @@ class LocalEngine(Engine):
         times, amplitudes = stf.discretize_t(
             deltat, source.get_timeshift())
 
-        # repeat end point to prevent boundary effects
-        padded_data = num.empty(data.size + amplitudes.size, dtype=num.float)
-        padded_data[:data.size] = data
-        padded_data[data.size:] = data[-1]
-        data = num.convolve(amplitudes, padded_data)
+        data = apply_stf(amplitudes, data)
 
         tmin = itmin * deltat + times[0]
 
         tr = meta.SeismosizerTrace(
             codes=target.codes,
-            data=data[:-amplitudes.size],
+            data=data,
             deltat=deltat,
             tmin=tmin)
 
@@ -2946,6 +3112,15 @@ class LocalEngine(Engine):
         The request can be given a a :py:class:`Request` object, or such an
         object is created using ``Request(**kwargs)`` for convenience.
 
+        :param status_callback: callback function which is called with the
+            arguments ``(isub, nsub)`` to report processing progress
+        :param nprocs: number of worker processes used to process the dynamic
+            subrequests. With ``nprocs > 1``, the subrequests are distributed
+            over forked worker processes with :py:func:`pyrocko.parimap`,
+            each re-opening the GF stores it needs. Static targets are always
+            processed in the calling process.
+        :param nthreads: number of threads used for stacking and static
+            summation within each process
         :returns: :py:class:`Response` object
         '''
 
@@ -2961,10 +3136,8 @@ class LocalEngine(Engine):
         request = kwargs.pop('request', None)
         status_callback = kwargs.pop('status_callback', None)
 
-        nprocs = kwargs.pop('nprocs', None)
+        nprocs = kwargs.pop('nprocs', None) or 1
         nthreads = kwargs.pop('nthreads', 1)
-        if nprocs:
-            nthreads = nprocs
 
         if request is None:
             request = Request(**kwargs)
@@ -2973,6 +3146,10 @@ class LocalEngine(Engine):
         rc0 = resource.getrusage(resource.RUSAGE_CHILDREN)
         tt0 = xtime()
 
+        dsource_cache = self._dsource_cache
+        n_dsource_cache_hits = -dsource_cache.nhits
+        n_dsource_cache_misses = -dsource_cache.nmisses
+
         # make sure stores are open before fork()
         store_ids = set(target.store_id for target in request.targets)
         for store_id in store_ids:
@@ -2998,6 +3175,8 @@ class LocalEngine(Engine):
 
         # Processing dynamic targets through
         # parimap(process_subrequest_dynamic)
+        worker_stats = {}
+        n_worker_cache = [0, 0]
         if request.has_dynamic:
             work_dynamic = [
                 (i, nsub,
@@ -3006,10 +3185,40 @@ class LocalEngine(Engine):
                   if not isinstance(target, StaticTarget)])
                 for (i, k) in enumerate(skeys)]
 
-            for ii_results, tcounters_dyn in process_dynamic(
-              work_dynamic, request.sources, request.targets, self,
-              nthreads=nthreads):
+            if nprocs > 1:
+                pshared = dict(
+                    engine=self,
+                    sources=request.sources,
+                    targets=request.targets,
+                    nthreads=nthreads,
+                    pid=os.getpid())
+
+                def iter_results():
+                    for results, (pid, t_busy, nhits, nmisses) in parimap(
+                            process_subrequest_dynamic, work_dynamic,
+                            pshared=pshared, nprocs=nprocs):
+
+                        n_worker_cache[0] += nhits
+                        n_worker_cache[1] += nmisses
+
+                        if pid not in worker_stats:
+                            worker_stats[pid] = WorkerStats(pid=pid)
+
+                        wstats = worker_stats[pid]
+                        wstats.n_subrequests += 1
+                        wstats.t_busy += t_busy
+
+                        for ii_results_tcounters in results:
+                            yield ii_results_tcounters
+
+                dynamic_results = iter_results()
+
+            else:
+                dynamic_results = process_dynamic(
+                    work_dynamic, request.sources, request.targets, self,
+                    nthreads=nthreads)
 
+            for ii_results, tcounters_dyn in dynamic_results:
                 tcounters_dyn_list.append(num.diff(tcounters_dyn))
                 isource, itarget, result = ii_results
                 results_list[isource][itarget] = result
@@ -3089,6 +3298,12 @@ class LocalEngine(Engine):
                 s.t_perc_optimize += result.t_optimize / shr
                 s.t_perc_stack += result.t_stack / shr
         s.n_records_stacked = int(n_records_stacked)
+        s.n_dsource_cache_hits = \
+            n_dsource_cache_hits + dsource_cache.nhits + n_worker_cache[0]
+        s.n_dsource_cache_misses = \
+            n_dsource_cache_misses + dsource_cache.nmisses + n_worker_cache[1]
+        s.n_procs = nprocs
+        s.workers = sorted(worker_stats.values(), key=lambda w: w.pid)
         if t_dyn != 0.:
             s.t_perc_optimize /= t_dyn * 100
             s.t_perc_stack /= t_dyn * 100
@@ -3221,6 +3436,7 @@ DerivedMagnitudeError
 STFMode
 '''.split() + [S.__name__ for S in source_classes + stf_classes] + '''
 Request
+WorkerStats
 ProcessingStats
 Response
 Engine
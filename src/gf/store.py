@@ -797,6 +797,79 @@ class BaseStore(object):
 
         return irecords3, delays3, weights3
 
+    def _optimize_many(self, irecords, delays, weights, counts):
+        '''
+        Vectorized :py:meth:`_optimize` for many sums at once.
+
+        The summands of the individual sums are given in consecutive blocks
+        of the lengths ``counts``. As in :py:meth:`_optimize`, only blocks
+        containing duplicate records are modified.
+
+        :returns: optimized ``irecords, delays, weights, counts``
+        '''
+
+        nblocks = counts.size
+        iblock = num.repeat(num.arange(nblocks), counts)
+        iorder = num.lexsort((irecords, iblock))
+        irecords_sorted = irecords[iorder]
+        iblock_sorted = iblock[iorder]
+
+        have_duplicates = num.zeros(nblocks, dtype=num.bool)
+        have_duplicates[iblock_sorted[1:][num.logical_and(
+            num.diff(irecords_sorted) == 0,
+            num.diff(iblock_sorted) == 0)]] = True
+
+        if not num.any(have_duplicates):
+            return irecords, delays, weights, counts
+
+        sel = have_duplicates[iblock]
+        keep = num.logical_not(sel)
+
+        deltat = self._deltat
+
+        idelays = delays[sel] / deltat
+        irecords2 = num.repeat(irecords[sel], 2)
+        iblock2 = num.repeat(iblock[sel], 2)
+        delays2 = num.empty(irecords2.size, dtype=num.float)
+        delays2[0::2] = num.floor(idelays)
+        delays2[1::2] = num.ceil(idelays)
+        weights2 = num.repeat(weights[sel], 2).astype(num.float)
+        weights2[0::2] *= 1.0 - (idelays - delays2[0::2])
+        weights2[1::2] *= (1.0 - (delays2[1::2] - idelays)) * \
+                          (delays2[1::2] - delays2[0::2])
+
+        delays2 *= deltat
+
+        iorder = num.lexsort((delays2, irecords2, iblock2))
+
+        irecords2 = irecords2[iorder]
+        delays2 = delays2[iorder]
+        weights2 = weights2[iorder]
+        iblock2 = iblock2[iorder]
+
+        ui = num.empty(irecords2.size, dtype=num.bool)
+        ui[1:] = num.logical_or(
+            num.logical_or(num.diff(iblock2) != 0, num.diff(irecords2) != 0),
+            num.diff(delays2) != 0.)
+
+        ui[0] = 0
+        ind2 = num.cumsum(ui)
+        ui[0] = 1
+        ind1 = num.where(ui)[0]
+
+        iblock3 = num.concatenate((iblock[keep], iblock2[ind1]))
+        iorder = num.argsort(iblock3, kind='stable')
+
+        irecords3 = num.concatenate(
+            (irecords[keep], irecords2[ind1]))[iorder]
+        delays3 = num.concatenate(
+            (delays[keep], delays2[ind1]))[iorder]
+        weights3 = num.concatenate(
+            (weights[keep], num.bincount(ind2, weights2)))[iorder]
+        counts3 = num.bincount(iblock3, minlength=nblocks)
+
+        return irecords3, delays3, weights3, counts3
+
     def _optimize_statics(self, irecords, weights):
         if num.unique(irecords).size == irecords.size:
             return irecords, weights
@@ -1885,6 +1958,195 @@ class Store(BaseStore):
 
         return out
 
+    def seismograms(self, sources, receivers, components, deltat=None,
+                    itmin=None, nsamples=None,
+                    interpolation='nearest_neighbor',
+                    optimization='enable', nthreads=1):
+
+        '''
+        Calculate seismograms for many sources at many receivers in one go.
+
+        Batched version of :py:meth:`seismogram`. The summation parameters
+        for all source-receiver pairs are computed in a single call, and
+        the GF traces are stacked in parallel into a preallocated array of
+        shape ``(nsources, nreceivers, nsamples)`` for each component. Use
+        this for repeated modelling with a fixed receiver geometry, e.g. in
+        grid searches.
+
+        :param sources: list of discretized sources
+            (:py:class:`~pyrocko.gf.meta.DiscretizedSource`)
+        :param receivers: list of :py:class:`~pyrocko.gf.meta.Receiver`
+            objects
+        :param components: names of the components to be computed
+        :param nthreads: number of threads used for summation (``0`` uses
+            all available processors)
+        :returns: list of lists ``out[isource][ireceiver]`` of dicts mapping
+            component names to :py:class:`GFTrace` objects. All traces share
+            a common time span unless ``itmin`` and ``nsamples`` are given.
+            Their data arrays are views into the per-component output
+            array.
+        '''
+
+        config = self.config
+
+        if deltat is None:
+            decimate = 1
+        else:
+            decimate = int(round(deltat/config.deltat))
+            if abs(deltat / (decimate * config.deltat) - 1.0) > 0.001:
+                raise StoreError(
+                    'unavailable decimation ratio target.deltat / store.deltat'
+                    ' = %g / %g' % (deltat, config.deltat))
+
+        store, decimate_ = self._decimated_store(decimate)
+
+        if not store._f_index:
+            store.open()
+
+        nsources = len(sources)
+        nreceivers = len(receivers)
+
+        out = [[{} for _ in range(nreceivers)] for _ in range(nsources)]
+        if nsources == 0 or nreceivers == 0:
+            return out
+
+        if decimate_ != 1:
+            # no decimated store available, fall back to the reference
+            # implementation
+            for isource, source in enumerate(sources):
+                for ireceiver, receiver in enumerate(receivers):
+                    out[isource][ireceiver] = self.seismogram(
+                        source, receiver, components, deltat=deltat,
+                        itmin=itmin, nsamples=nsamples,
+                        interpolation=interpolation,
+                        optimization=optimization,
+                        nthreads=nthreads)
+
+            return out
+
+        scheme = config.component_scheme
+        scheme_desc = meta.component_scheme_to_description[scheme]
+
+        source_coords_arr = num.vstack(
+            [source.coords5() for source in sources])
+        source_terms = num.vstack(
+            [source.get_source_terms(scheme) for source in sources])
+        receiver_coords_arr = num.vstack(
+            [receiver.coords5 for receiver in receivers])
+
+        nelements = num.array(
+            [source.nelements for source in sources], dtype=num.int64)
+        nelements_total = int(num.sum(nelements))
+        isource_element = num.repeat(num.arange(nsources), nelements)
+
+        try:
+            params = store_ext.make_sum_params(
+                store.cstore,
+                source_coords_arr,
+                source_terms,
+                receiver_coords_arr,
+                scheme,
+                interpolation, nthreads)
+
+        except store_ext.StoreExtError:
+            raise meta.OutOfBounds()
+
+        deltat_store = store._deltat
+        npairs = nsources * nreceivers
+
+        # delays are given relative to a per-source sample offset to keep
+        # them small in single precision
+        itoffsets_source = num.array([
+            int(num.floor(num.min(source.times)/deltat_store))
+            if source.nelements else 0
+            for source in sources], dtype=num.int32)
+
+        itoffsets = num.repeat(itoffsets_source, nreceivers)
+
+        delays_element = num.concatenate(
+            [source.times for source in sources]) \
+            - itoffsets_source[isource_element] * deltat_store
+
+        # make_sum_params returns the summands ordered by (receiver, source
+        # element), reorder them by (source, receiver, source element)
+        ipair_element = (
+            isource_element[num.newaxis, :] * nreceivers
+            + num.arange(nreceivers)[:, num.newaxis]).ravel()
+
+        iorder_element = num.argsort(ipair_element, kind='stable')
+        nelements_pair = num.repeat(nelements, nreceivers)
+
+        for icomp, comp in enumerate(scheme_desc.provided_components):
+            if comp not in components:
+                continue
+
+            t0 = time.time()
+
+            weights, irecords = params[icomp]
+
+            # number of summands per source element and receiver
+            neach = irecords.size // (nelements_total * nreceivers)
+
+            iorder = (
+                iorder_element[:, num.newaxis] * neach
+                + num.arange(neach)[num.newaxis, :]).ravel()
+
+            irecords = irecords[iorder]
+            weights = weights[iorder]
+            delays = num.repeat(
+                num.tile(delays_element, nreceivers)[iorder_element], neach)
+
+            counts = nelements_pair * neach
+
+            if optimization == 'enable':
+                irecords, delays, weights, counts = \
+                    store._optimize_many(irecords, delays, weights, counts)
+            else:
+                assert optimization == 'disable'
+
+            offsets = num.zeros(npairs + 1, dtype=num.uint64)
+            num.cumsum(counts, out=offsets[1:])
+
+            t1 = time.time()
+
+            try:
+                data, itmin_, deltat_, is_zero, begin_values, end_values = \
+                    store_ext.store_sum_many(
+                        store.cstore,
+                        irecords.astype(num.uint64),
+                        delays.astype(num.float32),
+                        weights.astype(num.float32),
+                        offsets,
+                        itoffsets,
+                        int(itmin or 0),
+                        int(nsamples) if nsamples is not None else -1,
+                        nthreads)
+
+            except store_ext.StoreExtError as e:
+                raise StoreError(str(e) + ' in store %s' % self.store_dir)
+
+            t2 = time.time()
+
+            data = data.reshape((nsources, nreceivers, -1))
+            for isource in range(nsources):
+                for ireceiver in range(nreceivers):
+                    ipair = isource * nreceivers + ireceiver
+                    tr = GFTrace(
+                        data[isource, ireceiver], itmin_, deltat_,
+                        is_zero=bool(is_zero[ipair]),
+                        begin_value=begin_values[ipair],
+                        end_value=end_values[ipair])
+
+                    # see seismogram()
+                    tr.deltat = config.deltat * decimate
+
+                    tr.n_records_stacked = int(counts[ipair])
+                    tr.t_optimize = (t1 - t0) / npairs
+                    tr.t_stack = (t2 - t1) / npairs
+                    out[isource][ireceiver][comp] = tr
+
+        return out
+
 
 __all__ = '''
 gf_dtype
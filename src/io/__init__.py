@@ -39,7 +39,8 @@ def allowed_formats(operation, use=None, default=None):
         return lst
 
 
-def load(filename, format='mseed', getdata=True, substitutions=None):
+def load(filename, format='mseed', getdata=True, substitutions=None,
+         byte_range=None, mmap=False):
     '''Load traces from file.
 
     :param format: format of the file (%s)
@@ -47,6 +48,13 @@ def load(filename, format='mseed', getdata=True, substitutions=None):
         traces metadata
     :param substitutions:  dict with substitutions to be applied to the traces
         metadata
+    :param byte_range: tuple ``(offset, nbytes)``, to read only the records
+        starting within the given range of bytes (only supported for
+        Mini-SEED, see :py:func:`pyrocko.io.mseed.get_byte_range`)
+    :param mmap: if ``True``, return traces whose data arrays are read-only
+        :py:class:`numpy.memmap` views into the file, where the on-disk layout
+        allows it (SAC and KAN format). The data is then given in the data
+        type of the file. For other formats, this option has no effect.
 
     :returns: list of loaded traces
 
@@ -63,7 +71,8 @@ def load(filename, format='mseed', getdata=True, substitutions=None):
     '''
 
     return list(iload(
-        filename, format=format, getdata=getdata, substitutions=substitutions))
+        filename, format=format, getdata=getdata, substitutions=substitutions,
+        byte_range=byte_range, mmap=mmap))
 
 
 load.__doc__ %= allowed_formats('load', 'doc')
@@ -93,7 +102,8 @@ def detect_format(filename):
     raise FileLoadError(UnknownFormat(filename))
 
 
-def iload(filename, format='mseed', getdata=True, substitutions=None):
+def iload(filename, format='mseed', getdata=True, substitutions=None,
+          byte_range=None, mmap=False):
     '''Load traces from file (iterator version).
 
     This function works like :py:func:`load`, but returns an iterator which
@@ -151,11 +161,18 @@ def iload(filename, format='mseed', getdata=True, substitutions=None):
 
     add_args = {
         'seisan': {'subformat': subformat},
+        'mseed': {'byte_range': byte_range},
+        'sac': {'mmap': mmap},
+        'kan': {'mmap': mmap},
     }
 
     if format not in format_to_module:
         raise UnsupportedFormat(format)
 
+    if byte_range is not None and format != 'mseed':
+        raise UnsupportedFormat(
+            '%s (reading of byte ranges not supported)' % format)
+
     mod = format_to_module[format]
 
     for tr in mod.iload(
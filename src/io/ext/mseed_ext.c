@@ -26,6 +26,40 @@ static struct module_state _state;
 #define BUFSIZE 1024
 
 
+static int
+read_traces_range (MSTraceGroup **ppmstg, const char *msfile, off_t offset,
+                   off_t nbytes, flag dataflag)
+{
+    /* like ms_readtraces, but only records starting in the byte range
+     * [offset, offset+nbytes) are considered (nbytes < 0: until EOF) */
+
+    MSRecord    *msr = NULL;
+    MSFileParam *msfp = NULL;
+    off_t       fpos;
+    int         retcode;
+
+    *ppmstg = mst_initgroup (NULL);
+    if ( ! *ppmstg )
+        return MS_GENERROR;
+
+    fpos = -offset;
+    while ( (retcode = ms_readmsr_main (&msfp, &msr, msfile, 0, &fpos, NULL,
+                                        1, dataflag, NULL, 0)) == MS_NOERROR) {
+
+        if (nbytes >= 0 && fpos >= offset + nbytes)
+            break;
+
+        mst_addmsrtogroup (*ppmstg, msr, 0, -1.0, -1.0);
+    }
+
+    if ( retcode == MS_ENDOFFILE )
+        retcode = MS_NOERROR;
+
+    ms_readmsr_main (&msfp, &msr, NULL, 0, NULL, NULL, 0, 0, NULL, 0);
+
+    return retcode;
+}
+
 static PyObject*
 mseed_get_traces (PyObject *m, PyObject *args)
 {
@@ -40,11 +74,13 @@ mseed_get_traces (PyObject *m, PyObject *args)
     int           numpytype;
     char          strbuf[BUFSIZE];
     PyObject      *unpackdata = NULL;
+    long long     offset = 0;
+    long long     nbytes = -1;
 
     struct module_state *st = GETSTATE(m);
 
-    if (!PyArg_ParseTuple(args, "sO", &filename, &unpackdata)) {
-        PyErr_SetString(st->error, "usage get_traces(filename, dataflag)" );
+    if (!PyArg_ParseTuple(args, "sO|LL", &filename, &unpackdata, &offset, &nbytes)) {
+        PyErr_SetString(st->error, "usage get_traces(filename, dataflag[, offset, nbytes])" );
         return NULL;
     }
 
@@ -53,8 +89,15 @@ mseed_get_traces (PyObject *m, PyObject *args)
         return NULL;
     }
   
-    /* get data from mseed file */
-    retcode = ms_readtraces (&mstg, filename, 0, -1.0, -1.0, 0, 1, (unpackdata == Py_True), 0);
+    /* get data from mseed file, file state is local in libmseed, so other
+     * threads may run meanwhile */
+    Py_BEGIN_ALLOW_THREADS
+    if (offset == 0 && nbytes < 0) {
+        retcode = ms_readtraces (&mstg, filename, 0, -1.0, -1.0, 0, 1, (unpackdata == Py_True), 0);
+    } else {
+        retcode = read_traces_range (&mstg, filename, (off_t)offset, (off_t)nbytes, (unpackdata == Py_True));
+    }
+    Py_END_ALLOW_THREADS
     if ( retcode < 0 ) {
         snprintf (strbuf, BUFSIZE, "Cannot read file '%s': %s", filename, ms_errorstr(retcode));
         PyErr_SetString(st->error, strbuf);
@@ -142,6 +185,67 @@ mseed_get_traces (PyObject *m, PyObject *args)
     return out_traces;
 }
 
+static PyObject*
+mseed_get_record_index (PyObject *m, PyObject *args)
+{
+    char          *filename;
+    MSRecord      *msr = NULL;
+    MSFileParam   *msfp = NULL;
+    off_t         fpos = 0;
+    int           retcode;
+    char          strbuf[BUFSIZE];
+    PyObject      *out_records = NULL;
+    PyObject      *out_record = NULL;
+
+    struct module_state *st = GETSTATE(m);
+
+    if (!PyArg_ParseTuple(args, "s", &filename)) {
+        PyErr_SetString(st->error, "usage get_record_index(filename)" );
+        return NULL;
+    }
+
+    out_records = PyList_New(0);
+    if (out_records == NULL) {
+        return NULL;
+    }
+
+    while ( (retcode = ms_readmsr_main (&msfp, &msr, filename, 0, &fpos, NULL,
+                                        1, 0, NULL, 0)) == MS_NOERROR) {
+
+        out_record = Py_BuildValue( "(L,i,s,s,s,s,L,L,d,L)",
+                                    (long long)fpos,
+                                    msr->reclen,
+                                    msr->network,
+                                    msr->station,
+                                    msr->location,
+                                    msr->channel,
+                                    (long long)msr->starttime,
+                                    (long long)msr_endtime(msr),
+                                    msr->samprate,
+                                    (long long)msr->samplecnt );
+
+        if (out_record == NULL || PyList_Append(out_records, out_record) != 0) {
+            Py_XDECREF(out_record);
+            ms_readmsr_main (&msfp, &msr, NULL, 0, NULL, NULL, 0, 0, NULL, 0);
+            Py_DECREF(out_records);
+            return NULL;
+        }
+
+        Py_DECREF(out_record);
+    }
+
+    ms_readmsr_main (&msfp, &msr, NULL, 0, NULL, NULL, 0, 0, NULL, 0);
+
+    if ( retcode != MS_ENDOFFILE ) {
+        snprintf (strbuf, BUFSIZE, "Cannot read file '%s': %s", filename, ms_errorstr(retcode));
+        PyErr_SetString(st->error, strbuf);
+        Py_DECREF(out_records);
+        return NULL;
+    }
+
+    return out_records;
+}
+
 static void record_handler (char *record, int reclen, void *outfile) {    
     if ( fwrite(record, reclen, 1, outfile) != 1 ) {
       fprintf(stderr, "Error writing mseed record to output file\n");
@@ -284,7 +388,7 @@ mseed_store_traces (PyObject *m, PyObject *args)
 
 static PyMethodDef mseed_ext_methods[] = {
     {"get_traces",  mseed_get_traces, METH_VARARGS, 
-    "get_traces(filename, dataflag)\n"
+    "get_traces(filename, dataflag[, offset, nbytes])\n"
     "Get all traces stored in an mseed file.\n\n"
     "Returns a list of tuples, one tuple for each trace in the file. Each tuple\n"
     "has 9 elements:\n\n"
@@ -292,7 +396,16 @@ static PyMethodDef mseed_ext_methods[] = {
     "    startime, endtime, samprate, data)\n\n"
     "These come straight from the MSTrace data structure, defined and described\n"
     "in libmseed. If dataflag is True, `data` is a numpy array containing the\n"
-    "data. If dataflag is False, the data is not unpacked and `data` is None.\n" },
+    "data. If dataflag is False, the data is not unpacked and `data` is None.\n"
+    "If offset and nbytes are given, only the records starting within the\n"
+    "given byte range are read (nbytes < 0: until end of file).\n" },
+
+    {"get_record_index",  mseed_get_record_index, METH_VARARGS,
+    "get_record_index(filename)\n"
+    "Get header information of all records in an mseed file.\n\n"
+    "Returns a list of tuples, one tuple for each record in the file:\n\n"
+    "  (offset, reclen, network, station, location, channel,\n"
+    "    starttime, endtime, samprate, samplecnt)\n" },
 
     {"store_traces",  mseed_store_traces, METH_VARARGS, 
     "store_traces(traces, filename)\n" },
@@ -34,17 +34,19 @@ class KanFile:
         self.b = 0.0
         self.data = [num.arange(0, dtype=num.int32)]
 
-    def read(self, filename, load_data=True):
+    def read(self, filename, load_data=True, mmap=False):
         '''Read SAC file.
 
            filename -- Name of KAN file.
            load_data -- If True, the data is read, otherwise only read headers.
+           mmap -- If True, the data array is a read-only memory map of the
+                   file.
         '''
         nbh = KanFile.nbytes_header
 
         # read in all data
         with open(filename, 'rb') as f:
-            if load_data:
+            if load_data and not mmap:
                 filedata = f.read()
             else:
                 filedata = f.read(nbh)
@@ -85,7 +87,16 @@ class KanFile:
             else:
                 dtype = '>i4'
 
-            self.data = num.fromstring(filedata[nbh:], dtype=dtype)
+            if mmap:
+                n = (os.stat(filename).st_size - nbh) // 4
+                if n == 0:
+                    self.data = num.zeros(0, dtype=dtype)
+                else:
+                    self.data = num.memmap(
+                        filename, dtype=dtype, mode='r', offset=nbh,
+                        shape=(n,))
+            else:
+                self.data = num.fromstring(filedata[nbh:], dtype=dtype)
 
             assert self.data.size == self.npts
         else:
@@ -100,9 +111,9 @@ class KanFile:
             self.data)
 
 
-def iload(filename, load_data):
+def iload(filename, load_data, mmap=False):
     try:
-        kanf = KanFile(filename, load_data=load_data)
+        kanf = KanFile(filename, load_data=load_data, mmap=mmap)
         tr = kanf.to_trace()
         yield tr
 
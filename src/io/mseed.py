@@ -10,6 +10,8 @@ import os
 import re
 import logging
 
+import numpy as num
+
 from pyrocko import trace
 from pyrocko.util import reuse, ensuredirs
 from .io_common import FileLoadError, FileSaveError
@@ -21,13 +23,16 @@ class CodeTooLong(FileSaveError):
     pass
 
 
-def iload(filename, load_data=True):
+def iload(filename, load_data=True, byte_range=None):
     from pyrocko import mseed_ext
 
+    if byte_range is None:
+        byte_range = (0, -1)
+
     have_zero_rate_traces = False
     try:
         traces = []
-        for tr in mseed_ext.get_traces(filename, load_data):
+        for tr in mseed_ext.get_traces(filename, load_data, *byte_range):
             network, station, location, channel = tr[1:5]
             tmin = float(tr[5])/float(mseed_ext.HPTMODULUS)
             tmax = float(tr[6])/float(mseed_ext.HPTMODULUS)
@@ -55,6 +60,82 @@ def iload(filename, load_data=True):
             '(maybe LOG traces)' % filename)
 
 
+record_dtype = num.dtype([
+    ('offset', num.int64),
+    ('nbytes', num.int32),
+    ('network', 'U11'),
+    ('station', 'U11'),
+    ('location', 'U11'),
+    ('channel', 'U11'),
+    ('tmin', num.float64),
+    ('tmax', num.float64),
+    ('deltat', num.float64),
+    ('nsamples', num.int64)])
+
+
+def get_record_index(filename):
+    '''
+    Get byte offsets, codes and time spans of the records in a Mini-SEED file.
+
+    :returns: NumPy structured array of type :py:data:`record_dtype`, one
+        entry per data record, with fields ``offset``, ``nbytes``,
+        ``network``, ``station``, ``location``, ``channel``, ``tmin``,
+        ``tmax`` (time of last sample), ``deltat`` and ``nsamples``. Records
+        with sampling rate of zero are skipped.
+    '''
+
+    from pyrocko import mseed_ext
+
+    try:
+        recs = mseed_ext.get_record_index(filename)
+    except (OSError, mseed_ext.MSeedError) as e:
+        raise FileLoadError(str(e)+' (file: %s)' % filename)
+
+    hptmod = float(mseed_ext.HPTMODULUS)
+    records = num.array([
+        (offset, nbytes, network, station, location, channel,
+         itmin/hptmod, itmax/hptmod, 1.0/srate, nsamples)
+        for (offset, nbytes, network, station, location, channel,
+             itmin, itmax, srate, nsamples) in recs if srate != 0.0],
+        dtype=record_dtype)
+
+    return records
+
+
+def get_byte_range(records, tmin, tmax, nslc_ids=None):
+    '''
+    Get byte range of the records overlapping with a time span.
+
+    :param records: record index as returned by :py:func:`get_record_index`
+    :param tmin: start time of time span
+    :param tmax: end time of time span
+    :param nslc_ids: if not ``None``, only consider records with matching
+        codes
+
+    :returns: tuple ``(offset, nbytes)`` or ``None`` if no records match
+    '''
+
+    mask = num.logical_and(
+        records['tmax'] + records['deltat'] >= tmin,
+        records['tmin'] <= tmax)
+
+    if nslc_ids is not None:
+        mask_codes = num.zeros(records.size, dtype=bool)
+        for nslc in set(nslc_ids):
+            mask_codes |= num.logical_and.reduce([
+                records[k] == v for (k, v) in zip(
+                    ('network', 'station', 'location', 'channel'), nslc)])
+
+        mask &= mask_codes
+
+    if not num.any(mask):
+        return None
+
+    offset = int(num.min(records['offset'][mask]))
+    end = int(num.max(records['offset'][mask] + records['nbytes'][mask]))
+    return offset, end - offset
+
+
 def as_tuple(tr):
     from pyrocko import mseed_ext
     itmin = int(round(tr.tmin*mseed_ext.HPTMODULUS))
@@ -6,6 +6,7 @@
 from __future__ import absolute_import
 from builtins import range
 
+import os
 import struct
 import logging
 import math
@@ -219,20 +220,22 @@ iqb1 iqb2 iqbx iqmt ieq ieq1 ieq2 ime iex inu inc io_ il ir it iu
                 'This file has header version %i. '
                 'It might still work though...' % self.nvhdr)
 
-    def read(self, filename, load_data=True, byte_sex='try'):
+    def read(self, filename, load_data=True, byte_sex='try', mmap=False):
         '''
         Read SAC file.
 
         filename -- Name of SAC file.
         load_data -- If True, the data is read, otherwise only read headers.
         byte_sex -- Endianness: 'try', 'little' or 'big'
+        mmap -- If True, the data arrays are read-only memory maps of the
+                file in its original float32 data type.
         '''
 
         nbh = SacFile.nbytes_header
 
         # read in all data
         with open(filename, 'rb') as f:
-            if load_data:
+            if load_data and not mmap:
                 filedata = f.read()
             else:
                 filedata = f.read(nbh)
@@ -287,7 +290,27 @@ iqb1 iqb2 iqbx iqmt ieq ieq1 ieq2 ime iex inu inc io_ il ir it iu
                 'This seems to be a %s endian SAC file: %s' % (sex, filename))
 
         # possibly get data
-        if load_data:
+        if load_data and mmap:
+            nblocks = self.ndatablocks()
+            nbb = self.npts*4
+            filesize = os.stat(filename).st_size
+            if filesize < nbh+nblocks*nbb:
+                raise SacError('File is incomplete.')
+
+            if sex == 'big':
+                dtype = num.dtype('>f4')
+            else:
+                dtype = num.dtype('<f4')
+
+            for iblock in range(nblocks):
+                if self.npts == 0:
+                    self.data.append(num.zeros(0, dtype=dtype))
+                else:
+                    self.data.append(num.memmap(
+                        filename, dtype=dtype, mode='r',
+                        offset=nbh+iblock*nbb, shape=(self.npts,)))
+
+        elif load_data:
             nblocks = self.ndatablocks()
             nbb = self.npts*4  # word length is always 4 bytes in sac files
             for iblock in range(nblocks):
@@ -395,10 +418,10 @@ iqb1 iqb2 iqbx iqmt ieq ieq1 ieq2 ime iex inu inc io_ il ir it iu
             meta=meta)
 
 
-def iload(filename, load_data=True):
+def iload(filename, load_data=True, mmap=False):
 
     try:
-        sacf = SacFile(filename, load_data=load_data)
+        sacf = SacFile(filename, load_data=load_data, mmap=mmap)
         tr = sacf.to_trace()
         yield tr
 
@@ -5,22 +5,39 @@
 
 
 class Stage(object):
-    def __init__(self, f):
+    def __init__(self, f, cache=None):
         self._f = f
         self._parent = None
-        self._cache = {}
+        if cache is None:
+            self._cache = {}
+            self._token = None
+        else:
+            # shared cache, e.g. a pyrocko.util.LRUCache: entries of this
+            # stage are distinguished by a token, which is replaced on clear()
+            self._cache = cache
+            self._token = object()
+
+    def _key(self, x):
+        if self._token is None:
+            return x
+        else:
+            return (self._token, x)
 
     def __call__(self, *x, **kwargs):
         if kwargs.get('nocache', False):
             return self.call_nocache(*x)
 
-        if x not in self._cache:
+        k = self._key(x)
+        try:
+            return self._cache[k]
+        except KeyError:
             if self._parent is not None:
-                self._cache[x] = self._f(self._parent(*x[:-1]), *x[-1])
+                value = self._f(self._parent(*x[:-1]), *x[-1])
             else:
-                self._cache[x] = self._f(*x[-1])
+                value = self._f(*x[-1])
 
-        return self._cache[x]
+            self._cache[k] = value
+            return value
 
     def call_nocache(self, *x):
         if self._parent is not None:
@@ -29,16 +46,30 @@ class Stage(object):
             return self._f(*x[-1])
 
     def clear(self):
-        self._cache.clear()
+        if self._token is None:
+            self._cache.clear()
+        else:
+            # stale entries are left to the eviction of the shared cache
+            self._token = object()
 
 
 class Chain(object):
-    def __init__(self, *stages):
+    def __init__(self, *stages, **kwargs):
+        '''
+        Chain of processing stages with cached intermediate results.
+
+        If a ``cache`` keyword argument is given, all stages store their
+        results in this dict-like object (e.g. a size-limited
+        :py:class:`pyrocko.util.LRUCache` shared among many chains), instead
+        of in private, unbounded dicts.
+        '''
+
+        cache = kwargs.pop('cache', None)
         parent = None
         self.stages = []
         for stage in stages:
             if not isinstance(stage, Stage):
-                stage = Stage(stage)
+                stage = Stage(stage, cache=cache)
 
             stage._parent = parent
             parent = stage
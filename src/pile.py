@@ -19,16 +19,25 @@ import sys
 import operator
 import math
 import hashlib
+import functools
+import sqlite3
+import threading
+import queue
+from collections import OrderedDict
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
 
 
+import numpy as num
+
 from . import avl
 from . import trace, io, util
+from .io import mseed
 from . import config
 from .trace import degapper
+from .parimap import parimap
 
 
 show_progress_force_off = False
@@ -200,6 +209,19 @@ class TracesFileCache(object):
             return dircache[abspath]
         return None
 
+    def get_info(self, abspath):
+        '''Get format and modification time of a file as stored in the cache.
+
+        :returns: tuple ``(format, mtime)`` or ``None`` if the file is not
+            in the cache.
+        '''
+
+        tfile = self.get(abspath)
+        if tfile is None:
+            return None
+
+        return tfile.format, tfile.mtime
+
     def put(self, abspath, tfile):
         '''Put an item into the cache.
 
@@ -305,17 +327,569 @@ class TracesFileCache(object):
         os.rename(tmpfn, cachefilename)
 
 
-def get_cache(cachedir):
-    '''Get global TracesFileCache object for given directory.'''
-    if cachedir not in TracesFileCache.caches:
-        TracesFileCache.caches[cachedir] = TracesFileCache(cachedir)
+def _split_time(t):
+    # split (possibly high precision) time into float and float residual
+    t_float = float(t)
+    return t_float, float(t - t_float)
+
+
+def _join_time(t_float, t_residual, deltat):
+    if deltat < 0.001:
+        return util.hpfloat(t_float) + util.hpfloat(t_residual)
+    else:
+        return t_float
+
+
+def _synchronized(method):
+    # serialize use of the database connection, which is shared between
+    # threads (selections are temporary tables, only visible to the
+    # connection which created them)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class SQLiteTracesFileCache(object):
+    '''Manages trace metainformation in an SQLite database.
+
+    All trace headers are kept in a single database file with one row per
+    trace segment. In contrast to :py:class:`TracesFileCache`, the headers do
+    not have to be loaded into memory as a whole. The index can be queried by
+    time span and code patterns with :py:meth:`query_traces` and
+    :py:meth:`query_files`, and it is updated incrementally, file by file,
+    when :py:meth:`put` is called for new or modified files.
+
+    The cache object may be used from several threads. Access to the
+    database is serialized internally.
+    '''
+
+    caches = {}
+    database_filename = 'traces_index.sqlite'
+    nflush = 1000
+
+    # increment whenever the database schema is changed, existing databases
+    # with a different version are rebuilt
+    schema_version = 1
+
+    tables = ('records', 'traces', 'files')
+
+    def __init__(self, cachedir):
+        '''Create new cache.
+
+        :param cachedir: directory to hold the database file.
+        '''
+
+        self.cachedir = cachedir
+        util.ensuredir(self.cachedir)
+        self.database_path = pjoin(cachedir, self.database_filename)
+        self._conn = None
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._tlenmax = None
+
+    def _get_connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.database_path, timeout=60., check_same_thread=False)
+
+            conn.create_function('match_nslc', 5, _sql_match_nslc)
+            conn.execute('PRAGMA foreign_keys = ON')
+
+            (version,) = conn.execute('PRAGMA user_version').fetchone()
+            if version != self.schema_version:
+                if version != 0:
+                    logger.info(
+                        'Rebuilding trace index with outdated schema: %s'
+                        % self.database_path)
+
+                with conn:
+                    for table in self.tables:
+                        conn.execute('DROP TABLE IF EXISTS %s' % table)
+
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS files (
+                    file_id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    format TEXT NOT NULL,
+                    mtime REAL);
+
+                CREATE TABLE IF NOT EXISTS traces (
+                    file_id INTEGER NOT NULL
+                        REFERENCES files(file_id) ON DELETE CASCADE,
+                    network TEXT NOT NULL,
+                    station TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    tmin REAL NOT NULL,
+                    tmin_residual REAL NOT NULL,
+                    tmax REAL NOT NULL,
+                    tmax_residual REAL NOT NULL,
+                    deltat REAL NOT NULL,
+                    mtime REAL);
+
+                CREATE INDEX IF NOT EXISTS traces_file_id
+                    ON traces (file_id);
+
+                CREATE INDEX IF NOT EXISTS traces_tmin
+                    ON traces (tmin);
+
+                CREATE TABLE IF NOT EXISTS records (
+                    file_id INTEGER NOT NULL
+                        REFERENCES files(file_id) ON DELETE CASCADE,
+                    offset INTEGER NOT NULL,
+                    nbytes INTEGER NOT NULL,
+                    network TEXT NOT NULL,
+                    station TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    tmin REAL NOT NULL,
+                    tmax REAL NOT NULL,
+                    deltat REAL NOT NULL,
+                    nsamples INTEGER NOT NULL);
+
+                CREATE INDEX IF NOT EXISTS records_file_id
+                    ON records (file_id);
+            ''')
+
+            conn.execute('PRAGMA user_version = %i' % self.schema_version)
+            self._conn = conn
+
+        return self._conn
+
+    @_synchronized
+    def get(self, abspath):
+        '''Try to get an item from the cache.
+
+        :param abspath: absolute path of the object to retrieve
+
+        :returns: a :py:class:`TracesFile` object is returned or None if
+            nothing could be found.
+        '''
+
+        if abspath in self._pending:
+            return self._pending[abspath]
+
+        info = self.get_info(abspath)
+        if info is None:
+            return None
+
+        format, mtime = info
+        tfile = TracesFile(
+            None, abspath, format, mtime=mtime,
+            traces=self._get_headers(abspath))
+
+        tfile.records = self._get_records(abspath)
+        return tfile
+
+    @_synchronized
+    def get_info(self, abspath):
+        '''Get format and modification time of a file as stored in the cache.
+
+        :returns: tuple ``(format, mtime)`` or ``None`` if the file is not
+            indexed.
+        '''
+
+        if abspath in self._pending:
+            tfile = self._pending[abspath]
+            return tfile.format, tfile.mtime
+
+        row = self._get_connection().execute(
+            'SELECT format, mtime FROM files WHERE path = ?',
+            (abspath,)).fetchone()
+
+        if row is None:
+            return None
+
+        return row
+
+    def _get_headers(self, abspath):
+        rows = self._get_connection().execute('''
+            SELECT network, station, location, channel,
+                tmin, tmin_residual, tmax, tmax_residual, deltat,
+                traces.mtime
+            FROM traces JOIN files ON traces.file_id = files.file_id
+            WHERE files.path = ?
+        ''', (abspath,))
+
+        return [_trace_from_row(row) for row in rows]
+
+    def _get_records(self, abspath):
+        rows = self._get_connection().execute('''
+            SELECT offset, nbytes, network, station, location, channel,
+                tmin, tmax, deltat, nsamples
+            FROM records JOIN files ON records.file_id = files.file_id
+            WHERE files.path = ?
+            ORDER BY offset
+        ''', (abspath,)).fetchall()
+
+        if not rows:
+            return None
+
+        return num.array(rows, dtype=mseed.record_dtype)
+
+    @_synchronized
+    def put(self, abspath, tfile):
+        '''Put an item into the cache.
+
+        :param abspath: absolute path of the object to be stored
+        :param tfile: :py:class:`TracesFile` object to be stored
+
+        The database is updated when :py:meth:`dump_modified` is called or
+        automatically, when more than :py:attr:`nflush` files are pending.
+        '''
+
+        self._pending[abspath] = tfile
+        if len(self._pending) >= self.nflush:
+            self.dump_modified()
+
+    @_synchronized
+    def dump_modified(self):
+        '''Save any modifications to disk.'''
+
+        if not self._pending:
+            return
+
+        conn = self._get_connection()
+        with conn:
+            for abspath, tfile in self._pending.items():
+                # keep file_id stable, it is referenced by selections
+                conn.execute(
+                    'INSERT OR IGNORE INTO files (path, format) VALUES (?, ?)',
+                    (abspath, tfile.format))
+
+                (file_id,) = conn.execute(
+                    'SELECT file_id FROM files WHERE path = ?',
+                    (abspath,)).fetchone()
+
+                conn.execute(
+                    'UPDATE files SET format = ?, mtime = ? WHERE file_id = ?',
+                    (tfile.format, tfile.mtime, file_id))
+
+                conn.execute(
+                    'DELETE FROM traces WHERE file_id = ?', (file_id,))
+
+                conn.executemany('''
+                    INSERT INTO traces VALUES (
+                        ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    (file_id,) + tr.nslc_id
+                    + _split_time(tr.tmin) + _split_time(tr.tmax)
+                    + (tr.deltat, tr.mtime)
+                    for tr in tfile.traces))
+
+                conn.execute(
+                    'DELETE FROM records WHERE file_id = ?', (file_id,))
+
+                if tfile.records is not None:
+                    conn.executemany('''
+                        INSERT INTO records VALUES (
+                            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        (file_id,) + tuple(rec.tolist())
+                        for rec in tfile.records))
+
+        self._pending = {}
+        self._tlenmax = None
+
+    @_synchronized
+    def remove(self, abspaths):
+        '''Remove entries of given files from the cache.'''
+
+        if isinstance(abspaths, str):
+            abspaths = [abspaths]
+
+        conn = self._get_connection()
+        with conn:
+            for abspath in abspaths:
+                self._pending.pop(abspath, None)
+                conn.execute('DELETE FROM files WHERE path = ?', (abspath,))
+
+        self._tlenmax = None
+
+    @_synchronized
+    def clean(self):
+        '''Weed out missing files from the database.'''
+
+        self.dump_modified()
+
+        missing = [
+            abspath for (abspath,) in self._get_connection().execute(
+                'SELECT path FROM files')
+            if not os.path.isfile(abspath)]
+
+        self.remove(missing)
+
+    @_synchronized
+    def get_tlenmax(self):
+        '''Get duration of the longest trace segment in the index.'''
+
+        if self._tlenmax is None:
+            self.dump_modified()
+            (self._tlenmax,) = self._get_connection().execute(
+                'SELECT MAX(tmax - tmin) FROM traces').fetchone()
+
+        return self._tlenmax
+
+    @_synchronized
+    def new_selection(self):
+        '''Create a new, empty selection of files.
+
+        A selection is a temporary table holding the ids of a subset of the
+        indexed files. It can be used to restrict queries to the files
+        belonging to a specific data set.
+
+        :returns: name of the selection
+        '''
+
+        conn = self._get_connection()
+        self._nselections = getattr(self, '_nselections', 0) + 1
+        name = 'selection_%i' % self._nselections
+        conn.execute(
+            'CREATE TEMP TABLE %s (file_id INTEGER PRIMARY KEY)' % name)
+
+        return name
+
+    @_synchronized
+    def add_to_selection(self, selection, abspaths):
+        '''Add files to a selection.
+
+        Files which are not in the index are silently ignored.
+        '''
+
+        self.dump_modified()
+        conn = self._get_connection()
+        with conn:
+            conn.executemany('''
+                INSERT OR IGNORE INTO %s
+                SELECT file_id FROM files WHERE path = ?
+            ''' % selection, ((abspath,) for abspath in abspaths))
+
+    @_synchronized
+    def remove_from_selection(self, selection, abspaths):
+        '''Remove files from a selection.'''
+
+        conn = self._get_connection()
+        with conn:
+            conn.executemany('''
+                DELETE FROM %s WHERE file_id IN (
+                    SELECT file_id FROM files WHERE path = ?)
+            ''' % selection, ((abspath,) for abspath in abspaths))
+
+    @_synchronized
+    def delete_selection(self, selection):
+        '''Delete a selection (the indexed files are not affected).'''
+
+        if self._conn is not None:
+            self._conn.execute('DROP TABLE IF EXISTS %s' % selection)
+
+    def _join(self, selection):
+        s = 'FROM traces JOIN files ON traces.file_id = files.file_id'
+        if selection is not None:
+            s += ' JOIN %s ON traces.file_id = %s.file_id' % (
+                selection, selection)
+
+        return s
+
+    def _where(self, tmin, tmax, codes, path=None):
+        conds = []
+        args = []
+        if tmin is not None:
+            tlenmax = self.get_tlenmax() or 0.0
+            conds.append('traces.tmin >= ? AND traces.tmax >= ?')
+            args.extend((float(tmin) - tlenmax, float(tmin)))
+
+        if tmax is not None:
+            conds.append('traces.tmin <= ?')
+            args.append(float(tmax))
+
+        if codes is not None:
+            if isinstance(codes, str):
+                codes = [codes]
+
+            conds.append('(%s)' % ' OR '.join(
+                'match_nslc(?, traces.network, traces.station, '
+                'traces.location, traces.channel)' for _ in codes))
+            args.extend(codes)
+
+        if path is not None:
+            conds.append('files.path = ?')
+            args.append(path)
+
+        if conds:
+            return ' WHERE ' + ' AND '.join(conds), args
+        else:
+            return '', args
+
+    @_synchronized
+    def query_traces(self, tmin=None, tmax=None, codes=None, selection=None):
+        '''Get data-less traces from the index matching given constraints.
+
+        :param tmin: start time of query interval or ``None``
+        :param tmax: end time of query interval or ``None``
+        :param codes: pattern or list of patterns to be matched against
+            network-station-location-channel codes (see
+            :py:func:`pyrocko.util.match_nslc`)
+        :param selection: restrict query to files in given selection (see
+            :py:meth:`new_selection`)
+
+        :returns: list of tuples ``(abspath, format, trace)``
+        '''
+
+        self.dump_modified()
+        where, args = self._where(tmin, tmax, codes)
+        rows = self._get_connection().execute('''
+            SELECT network, station, location, channel,
+                tmin, tmin_residual, tmax, tmax_residual, deltat,
+                traces.mtime, files.path, files.format
+        ''' + self._join(selection) + where, args)
+
+        return [(row[10], row[11], _trace_from_row(row[:10])) for row in rows]
+
+    @_synchronized
+    def query_trace_table(
+            self, tmin=None, tmax=None, codes=None, selection=None):
 
-    return TracesFileCache.caches[cachedir]
+        '''Get headers of traces matching given constraints as a table.
+
+        Like :py:meth:`query_traces`, but without creating
+        :py:class:`pyrocko.trace.Trace` objects.
+
+        :returns: :py:class:`pyrocko.trace.TraceTable` object
+        '''
+
+        self.dump_modified()
+        where, args = self._where(tmin, tmax, codes)
+        rows = self._get_connection().execute('''
+            SELECT network, station, location, channel,
+                tmin, tmax, deltat, traces.mtime
+        ''' + self._join(selection) + where, args).fetchall()
+
+        code_index = {}
+        icodes = [
+            code_index.setdefault(row[:4], len(code_index)) for row in rows]
+
+        codes = sorted(code_index, key=code_index.__getitem__)
+        columns = num.array(
+            [row[4:] for row in rows], dtype=num.float64).reshape(-1, 4)
+
+        return trace.TraceTable(
+            codes, icodes,
+            columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3])
+
+    @_synchronized
+    def query_files(self, tmin=None, tmax=None, codes=None, selection=None):
+        '''Get files containing traces matching given constraints.
+
+        :param tmin: start time of query interval or ``None``
+        :param tmax: end time of query interval or ``None``
+        :param codes: pattern or list of patterns to be matched against
+            network-station-location-channel codes
+        :param selection: restrict query to files in given selection (see
+            :py:meth:`new_selection`)
+
+        :returns: sorted list of tuples ``(abspath, format, mtime)``
+        '''
+
+        self.dump_modified()
+        where, args = self._where(tmin, tmax, codes)
+        return list(self._get_connection().execute('''
+            SELECT DISTINCT files.path, files.format, files.mtime
+        ''' + self._join(selection) + where + '''
+            ORDER BY files.path
+        ''', args))
+
+    @_synchronized
+    def query_summary(self, selection=None):
+        '''Get overview of the index contents.
+
+        :param selection: restrict query to files in given selection (see
+            :py:meth:`new_selection`)
+
+        :returns: list of tuples ``(nslc, deltat, count, tmin, tmax,
+            tlenmax, mtime)``, one per distinct combination of codes and
+            sampling interval
+        '''
+
+        self.dump_modified()
+        return [
+            (tuple(row[:4]),) + tuple(row[4:])
+            for row in self._get_connection().execute('''
+                SELECT network, station, location, channel, deltat,
+                    COUNT(*), MIN(tmin), MAX(tmax), MAX(tmax - tmin),
+                    MAX(traces.mtime)
+            ''' + self._join(selection) + '''
+                GROUP BY network, station, location, channel, deltat
+            ''')]
+
+    @_synchronized
+    def close(self):
+        '''Write pending modifications and close the database.'''
+
+        self.dump_modified()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _sql_match_nslc(pattern, network, station, location, channel):
+    return util.match_nslc(pattern, (network, station, location, channel))
+
+
+def _trace_from_row(row):
+    network, station, location, channel, \
+        tmin, tmin_residual, tmax, tmax_residual, deltat, mtime = row
+
+    return trace.Trace(
+        network, station, location, channel,
+        tmin=_join_time(tmin, tmin_residual, deltat),
+        tmax=_join_time(tmax, tmax_residual, deltat),
+        deltat=deltat,
+        mtime=mtime)
+
+
+g_cache_backends = {
+    'sqlite': SQLiteTracesFileCache,
+    'pickle': TracesFileCache}
+
+
+def get_cache(cachedir, backend='sqlite'):
+    '''Get global trace metainformation cache object for given directory.
+
+    :param cachedir: directory to hold the cache files
+    :param backend: ``'sqlite'`` to get a :py:class:`SQLiteTracesFileCache`,
+        ``'pickle'`` to get a :py:class:`TracesFileCache` (one pickle file per
+        data directory)
+    '''
+
+    cls = g_cache_backends[backend]
+    if cachedir not in cls.caches:
+        cls.caches[cachedir] = cls(cachedir)
+
+    return cls.caches[cachedir]
+
+
+def _load_headers(abspath, fileformat, substitutions):
+    # runs in worker processes when loading with nworkers > 1, exceptions are
+    # passed back as results to be handled by the caller
+    try:
+        return list(io.load(
+            abspath,
+            format=fileformat,
+            getdata=False,
+            substitutions=substitutions)), None
+
+    except (io.FileLoadError, OSError) as xerror:
+        return None, xerror
 
 
 def loader(
         filenames, fileformat, cache, filename_attributes,
-        show_progress=True, update_progress=None):
+        show_progress=True, update_progress=None, yield_unchanged=True,
+        nworkers=1, mmap=False):
 
     if show_progress_force_off:
         show_progress = False
@@ -375,17 +949,17 @@ def loader(
                         substitutions[k] = m.groupdict()[k]
 
             mtime = os.stat(filename)[8]
-            tfile = None
+            info = None
             if cache:
-                tfile = cache.get(abspath)
+                info = cache.get_info(abspath)
 
             mustload = (
-                not tfile or
-                (tfile.format != fileformat and fileformat != 'detect') or
-                tfile.mtime != mtime or
+                not info or
+                (info[0] != fileformat and fileformat != 'detect') or
+                info[1] != mtime or
                 substitutions is not None)
 
-            to_load.append((mustload, mtime, abspath, substitutions, tfile))
+            to_load.append((mustload, mtime, abspath, substitutions))
 
         except (OSError, FilenameAttributeError) as xerror:
             failures.append(abspath)
@@ -411,31 +985,57 @@ def loader(
     if to_load:
         progress = Progress('Scanning files', nload)
 
-        for (mustload, mtime, abspath, substitutions, tfile) in to_load:
-            try:
-                if mustload:
-                    tfile = TracesFile(
-                        None, abspath, fileformat,
-                        substitutions=substitutions, mtime=mtime)
+        # header extraction is fanned out to worker processes, results come
+        # back in order of to_load
+        must_load = [x for x in to_load if x[0]]
+        headers = parimap(
+            _load_headers,
+            [x[2] for x in must_load],
+            [fileformat] * len(must_load),
+            [x[3] for x in must_load],
+            nprocs=nworkers)
+
+        try:
+            for (mustload, mtime, abspath, substitutions) in to_load:
+                tfile = None
+                try:
+                    if mustload:
+                        traces, xerror = next(headers)
+                        if xerror is not None:
+                            raise xerror
 
-                    if cache and not substitutions:
-                        cache.put(abspath, tfile)
+                        tfile = TracesFile(
+                            None, abspath, fileformat,
+                            substitutions=substitutions, mtime=mtime,
+                            traces=traces)
 
-                    if not count_all:
+                        if cache and not substitutions:
+                            cache.put(abspath, tfile)
+
+                        if not count_all:
+                            iload += 1
+
+                    elif yield_unchanged:
+                        tfile = cache.get(abspath)
+
+                    if count_all:
                         iload += 1
 
-                if count_all:
-                    iload += 1
+                except (io.FileLoadError, OSError) as xerror:
+                    failures.append(abspath)
+                    logger.warning(xerror)
+                else:
+                    if tfile is not None:
+                        tfile.mmap = mmap
+                        yield tfile
 
-            except (io.FileLoadError, OSError) as xerror:
-                failures.append(abspath)
-                logger.warning(xerror)
-            else:
-                yield tfile
+                abort = progress.update(iload+1)
+                if abort:
+                    break
 
-            abort = progress.update(iload+1)
-            if abort:
-                break
+        finally:
+            # shuts down the worker processes if the scan is aborted
+            headers.close()
 
         progress.update(nload)
 
@@ -642,6 +1242,8 @@ class MemTracesFile(TracesGroup):
     '''This is needed to make traces without an actual disc file to be inserted
     into a Pile.'''
 
+    data_loaded = True
+
     def __init__(self, parent, traces):
         TracesGroup.__init__(self, parent)
         self.add(traces)
@@ -659,7 +1261,10 @@ class MemTracesFile(TracesGroup):
     def load_headers(self, mtime=None):
         pass
 
-    def load_data(self):
+    def read_data(self, tmin=None, tmax=None, nslc_ids=None):
+        return None
+
+    def load_data(self, force=False, traces=None):
         pass
 
     def use_data(self):
@@ -702,9 +1307,20 @@ class MemTracesFile(TracesGroup):
 
 
 class TracesFile(TracesGroup):
+
+    # record index, only available for Mini-SEED files (see get_records)
+    records = None
+
+    # whether records can be read selectively, None if not determined yet
+    # (see is_partially_readable)
+    _partially_readable = None
+
+    # whether to memory-map file data where the file format allows it
+    mmap = False
+
     def __init__(
             self, parent, abspath, format,
-            substitutions=None, mtime=None):
+            substitutions=None, mtime=None, traces=None):
 
         TracesGroup.__init__(self, parent)
         self.abspath = abspath
@@ -713,7 +1329,11 @@ class TracesFile(TracesGroup):
         self.data_loaded = False
         self.data_use_count = 0
         self.substitutions = substitutions
-        self.load_headers(mtime=mtime)
+        if traces is None:
+            self.load_headers(mtime=mtime)
+        else:
+            self.set_headers(traces)
+
         self.mtime = mtime
 
     def load_headers(self, mtime=None):
@@ -721,16 +1341,24 @@ class TracesFile(TracesGroup):
         if mtime is None:
             self.mtime = os.stat(self.abspath)[8]
 
+        self.set_headers(io.load(
+            self.abspath,
+            format=self.format,
+            getdata=False,
+            substitutions=self.substitutions))
+
+    def set_headers(self, traces):
+        '''
+        Replace trace headers of this file with the given (data-less) traces.
+        '''
+
         def kgen(tr):
             return (tr.mtime, tr.tmin, tr.tmax) + tr.nslc_id
 
         self.remove(self.traces)
+        self.traces = []
         ks = set()
-        for tr in io.load(self.abspath,
-                          format=self.format,
-                          getdata=False,
-                          substitutions=self.substitutions):
-
+        for tr in traces:
             k = kgen(tr)
             if k not in ks:
                 ks.add(k)
@@ -742,25 +1370,107 @@ class TracesFile(TracesGroup):
         self.data_loaded = False
         self.data_use_count = 0
 
-    def load_data(self, force=False):
+    def is_partially_readable(self):
+        '''
+        Check if the data of the file can be read selectively by time span.
+
+        This is the case for files in Mini-SEED format. The file format is
+        detected only once, if needed.
+        '''
+
+        if self._partially_readable is None:
+            format = self.format
+            if format == 'detect':
+                format = io.detect_format(self.abspath)
+
+            self._partially_readable = format == 'mseed'
+
+        return self._partially_readable
+
+    def get_records(self):
+        '''
+        Get record index of the file.
+
+        The index is created on first use and is only available for files in
+        Mini-SEED format.
+
+        :returns: record index as returned by
+            :py:func:`pyrocko.io.mseed.get_record_index` or ``None``
+        '''
+
+        if self.records is None and self.is_partially_readable():
+            self.records = mseed.get_record_index(self.abspath)
+
+        return self.records
+
+    def read_data(self, tmin=None, tmax=None, nslc_ids=None):
+        '''
+        Read traces with data from the file.
+
+        :param tmin: start time of time span to be read
+        :param tmax: end time of time span to be read
+        :param nslc_ids: codes of the traces to be read
+
+        If ``tmin`` and ``tmax`` are given and the file is in Mini-SEED
+        format, only the records overlapping with the time span are decoded
+        (the returned traces may contain more data than requested, and traces
+        not matching ``nslc_ids``). Otherwise, the complete file is read.
+
+        The state of this object is not modified (except for the record index
+        being created), so this method may be called from a background
+        thread.
+        '''
+
+        def kgen(tr):
+            return (tr.mtime, tr.tmin, tr.tmax) + tr.nslc_id
+
+        byte_range = None
+        if tmin is not None and tmax is not None:
+            records = self.get_records()
+            if records is not None:
+                byte_range = mseed.get_byte_range(
+                    records, tmin, tmax, nslc_ids)
+
+                if byte_range is None:
+                    return []
+
+        traces_ = io.load(self.abspath, format=self.format, getdata=True,
+                          substitutions=self.substitutions,
+                          byte_range=byte_range,
+                          mmap=self.mmap and byte_range is None)
+
+        # prevent adding duplicate snippets from corrupt mseed files
+        k_loaded = set()
+        traces = []
+        for tr in traces_:
+            k = kgen(tr)
+            if k not in k_loaded:
+                k_loaded.add(k)
+                traces.append(tr)
+
+        return traces
+
+    def load_data(self, force=False, traces=None):
+        '''
+        Load the data of the file into the traces of this object.
+
+        :param force: reload, even if the data is already loaded
+        :param traces: traces as returned by :py:meth:`read_data`, if the
+            data has been read beforehand
+
+        :returns: ``True`` if the contents of the file have changed
+        '''
+
         file_changed = False
         if not self.data_loaded or force:
-            logger.debug('loading data from file: %s' % self.abspath)
-
             def kgen(tr):
                 return (tr.mtime, tr.tmin, tr.tmax) + tr.nslc_id
 
-            traces_ = io.load(self.abspath, format=self.format, getdata=True,
-                              substitutions=self.substitutions)
+            if traces is None:
+                logger.debug('loading data from file: %s' % self.abspath)
+                traces = self.read_data()
 
-            # prevent adding duplicate snippets from corrupt mseed files
-            k_loaded = set()
-            traces = []
-            for tr in traces_:
-                k = kgen(tr)
-                if k not in k_loaded:
-                    k_loaded.add(k)
-                    traces.append(tr)
+            k_loaded = set(kgen(tr) for tr in traces)
 
             k_current_d = dict((kgen(tr), tr) for tr in self.traces)
             k_current = set(k_current_d)
@@ -819,6 +1529,8 @@ class TracesFile(TracesGroup):
                 'mtime=%i, reloading file: %s' % (mtime, self.abspath))
 
             self.mtime = mtime
+            self.records = None
+            self._partially_readable = None
             if self.data_loaded:
                 self.load_data(force=True)
             else:
@@ -859,98 +1571,496 @@ class FilenameAttributeError(Exception):
     pass
 
 
-class SubPile(TracesGroup):
-    def __init__(self, parent):
-        TracesGroup.__init__(self, parent)
-        self.files = []
-        self.empty()
+def _traces_nbytes(traces):
+    return sum(tr.ydata.nbytes for tr in traces if tr.ydata is not None)
 
-    def add_file(self, file):
-        self.files.append(file)
-        file.set_parent(self)
-        self.add(file)
 
-    def remove_file(self, file):
-        self.files.remove(file)
-        file.set_parent(None)
-        self.remove(file)
+def _traces_astype(traces, dtype):
+    if dtype is not None:
+        for tr in traces:
+            if tr.ydata is not None:
+                tr.set_ydata(tr.ydata.astype(dtype, copy=False))
 
-    def remove_files(self, files):
-        for file in files:
-            self.files.remove(file)
-            file.set_parent(None)
-        self.remove(files)
+    return traces
 
-    def gather_keys(self, gather, selector=None):
-        keys = set()
-        for file in self.files:
-            keys |= file.gather_keys(gather, selector)
 
-        return keys
+class DataCache(object):
+    '''
+    Keeps decoded file data in memory, up to a given number of bytes.
 
-    def iter_traces(
-            self,
-            load_data=False,
-            return_abspath=False,
-            group_selector=None,
-            trace_selector=None):
+    The cache holds a data use (see :py:meth:`TracesFile.use_data`) on every
+    file it contains, so that the data of recently used files survives when
+    the files are released by :py:meth:`Pile.chopper`. When the budget is
+    exceeded, the least recently used files are released by the cache.
 
-        for file in self.files:
+    :param nbytes_max: memory budget in bytes
 
-            if group_selector and not group_selector(file):
-                continue
+    Usage statistics are available in the attributes ``nhits``, ``nmisses``
+    and ``nevictions``.
+    '''
 
-            must_drop = False
-            if load_data:
-                file.load_data()
-                file.use_data()
-                must_drop = True
+    def __init__(self, nbytes_max):
+        self.nbytes_max = nbytes_max
+        self._files = OrderedDict()
+        self.nbytes = 0
+        self.nhits = 0
+        self.nmisses = 0
+        self.nevictions = 0
 
-            for tr in file.iter_traces():
-                if trace_selector and not trace_selector(tr):
-                    continue
+    def __contains__(self, file):
+        return file in self._files
 
-                if return_abspath:
-                    yield file.abspath, tr
-                else:
-                    yield tr
+    def __len__(self):
+        return len(self._files)
 
-            if must_drop:
-                file.drop_data()
+    def files(self):
+        '''Get list of files in the cache, least recently used first.'''
+        return list(self._files.keys())
 
-    def iter_files(self):
-        for file in self.files:
-            yield file
+    def count(self, hit):
+        '''Count cache hit or miss.'''
 
-    def reload_modified(self):
-        modified = False
-        for file in self.files:
-            modified |= file.reload_if_modified()
+        if hit:
+            self.nhits += 1
+        else:
+            self.nmisses += 1
 
-        return modified
+    def put(self, file):
+        '''Insert or refresh file with loaded data.'''
 
-    def __str__(self):
-        s = 'SubPile\n'
-        s += 'number of files: %i\n' % len(self.files)
-        s += 'timerange: %s - %s\n' % (
-            util.time_to_str(self.tmin), util.time_to_str(self.tmax))
-        s += 'networks: %s\n' % ', '.join(sl(self.networks.keys()))
-        s += 'stations: %s\n' % ', '.join(sl(self.stations.keys()))
-        s += 'locations: %s\n' % ', '.join(sl(self.locations.keys()))
-        s += 'channels: %s\n' % ', '.join(sl(self.channels.keys()))
-        s += 'deltats: %s\n' % ', '.join(sl(self.deltats.keys()))
-        return s
+        if file in self._files:
+            # move to end
+            self._files[file] = self._files.pop(file)
+            return
 
+        nbytes = _traces_nbytes(file.traces)
+        file.use_data()
+        self._files[file] = nbytes
+        self.nbytes += nbytes
+        self._evict()
 
-class Pile(TracesGroup):
+    def discard(self, file):
+        '''Release file, if it is in the cache.'''
+
+        if file in self._files:
+            self.nbytes -= self._files.pop(file)
+            file.drop_data()
+
+    def _evict(self):
+        while self.nbytes > self.nbytes_max and self._files:
+            file, nbytes = self._files.popitem(last=False)
+            self.nbytes -= nbytes
+            self.nevictions += 1
+            file.drop_data()
+
+    def clear(self):
+        '''Release all files.'''
+
+        while self._files:
+            file, _ = self._files.popitem(last=False)
+            file.drop_data()
+
+        self.nbytes = 0
+
+    def get_hit_rate(self):
+        n = self.nhits + self.nmisses
+        if n == 0:
+            return None
+
+        return self.nhits / n
+
+    def __str__(self):
+        return '''DataCache
+  files: %i
+  size: %s (max: %s)
+  hits: %i
+  misses: %i
+  evictions: %i
+''' % (
+            len(self._files),
+            util.human_bytesize(self.nbytes),
+            util.human_bytesize(self.nbytes_max),
+            self.nhits, self.nmisses, self.nevictions)
+
+
+class Prefetcher(object):
+    '''
+    Reads file data in a background thread.
+
+    Used by :py:meth:`Pile.chopper` to read the files needed for upcoming
+    windows while the current window is being processed.
+
+    :param nbytes_max: memory budget; reading is paused while the
+        prefetched but not yet consumed data exceeds this number of bytes
+    '''
+
+    def __init__(self, nbytes_max=256*1024**2):
+        self.nbytes_max = nbytes_max
+        self._cond = threading.Condition()
+        self._todo = []
+        self._loading = None
+        self._done = {}
+        self._nbytes = 0
+        self._stop = False
+        self._thread = None
+
+    def request(self, files):
+        '''Queue files for reading (in given order).'''
+
+        with self._cond:
+            for file in files:
+                if not (file.data_loaded or file in self._done
+                        or file is self._loading or file in self._todo):
+
+                    self._todo.append(file)
+
+            self._cond.notify_all()
+
+        if self._thread is None and self._todo:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def retain(self, files):
+        '''
+        Forget queued and prefetched files which are not in ``files``.
+
+        Files which have been loaded by other means in the meantime (e.g.
+        when they are kept in a :py:class:`DataCache`) are also forgotten, so
+        that their prefetched data does not count against the memory budget.
+        '''
+
+        with self._cond:
+            self._todo = [
+                file for file in self._todo
+                if file in files and not file.data_loaded]
+
+            for file in list(self._done.keys()):
+                if file not in files or file.data_loaded:
+                    traces, _ = self._done.pop(file)
+                    if traces is not None:
+                        self._nbytes -= _traces_nbytes(traces)
+
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop and (
+                        not self._todo or self._nbytes >= self.nbytes_max):
+                    self._cond.wait()
+
+                if self._stop:
+                    return
+
+                file = self._loading = self._todo.pop(0)
+
+            traces, exception = None, None
+            try:
+                traces = file.read_data()
+            except Exception as e:
+                exception = e
+
+            with self._cond:
+                self._loading = None
+                self._done[file] = traces, exception
+                if traces is not None:
+                    self._nbytes += _traces_nbytes(traces)
+
+                self._cond.notify_all()
+
+    def take(self, file):
+        '''
+        Get prefetched traces of a file.
+
+        Waits if the file is being read at the moment. Returns ``None`` if the
+        file has not been prefetched.
+        '''
+
+        with self._cond:
+            if file in self._todo:
+                self._todo.remove(file)
+                return None
+
+            while file is self._loading:
+                self._cond.wait()
+
+            if file not in self._done:
+                return None
+
+            traces, exception = self._done.pop(file)
+            if traces is not None:
+                self._nbytes -= _traces_nbytes(traces)
+
+            self._cond.notify_all()
+
+        if exception is not None:
+            raise exception
+
+        return traces
+
+    def stop(self):
+        '''Stop background thread and forget prefetched data.'''
+
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self._todo = []
+        self._done = {}
+        self._nbytes = 0
+
+
+class SubPile(TracesGroup):
+    def __init__(self, parent):
+        TracesGroup.__init__(self, parent)
+        self.files = []
+        self.empty()
+
+    def add_file(self, file):
+        self.files.append(file)
+        file.set_parent(self)
+        self.add(file)
+
+    def remove_file(self, file):
+        self.files.remove(file)
+        file.set_parent(None)
+        self.remove(file)
+
+    def remove_files(self, files):
+        for file in files:
+            self.files.remove(file)
+            file.set_parent(None)
+        self.remove(files)
+
+    def gather_keys(self, gather, selector=None):
+        keys = set()
+        for file in self.files:
+            keys |= file.gather_keys(gather, selector)
+
+        return keys
+
+    def iter_traces(
+            self,
+            load_data=False,
+            return_abspath=False,
+            group_selector=None,
+            trace_selector=None):
+
+        for file in self.files:
+
+            if group_selector and not group_selector(file):
+                continue
+
+            must_drop = False
+            if load_data:
+                file.load_data()
+                file.use_data()
+                must_drop = True
+
+            for tr in file.iter_traces():
+                if trace_selector and not trace_selector(tr):
+                    continue
+
+                if return_abspath:
+                    yield file.abspath, tr
+                else:
+                    yield tr
+
+            if must_drop:
+                file.drop_data()
+
+    def iter_files(self):
+        for file in self.files:
+            yield file
+
+    def reload_modified(self):
+        modified = False
+        for file in self.files:
+            modified |= file.reload_if_modified()
+
+        return modified
+
+    def __str__(self):
+        s = 'SubPile\n'
+        s += 'number of files: %i\n' % len(self.files)
+        s += 'timerange: %s - %s\n' % (
+            util.time_to_str(self.tmin), util.time_to_str(self.tmax))
+        s += 'networks: %s\n' % ', '.join(sl(self.networks.keys()))
+        s += 'stations: %s\n' % ', '.join(sl(self.stations.keys()))
+        s += 'locations: %s\n' % ', '.join(sl(self.locations.keys()))
+        s += 'channels: %s\n' % ', '.join(sl(self.channels.keys()))
+        s += 'deltats: %s\n' % ', '.join(sl(self.deltats.keys()))
+        return s
+
+
+def _thread_imap_groups(function, n, nworkers, ordered, nbuffer=4):
+    '''
+    Consume the iterators ``function(0)``, ..., ``function(n-1)`` in worker
+    threads.
+
+    Yields tuples ``(i, False, result)`` for each item produced by iterator
+    ``i`` and ``(i, True, None)`` when iterator ``i`` is exhausted. If
+    ``ordered`` is ``True``, the items are yielded in the same order as in
+    sequential processing. In that case, each iterator gets its own queue,
+    holding at most ``nbuffer`` items, and only the queue of the group
+    currently due is read, so that workers running ahead on later groups
+    block instead of piling up results.
+    '''
+
+    if nworkers == 1:
+        for i in range(n):
+            for result in function(i):
+                yield i, False, result
+
+            yield i, True, None
+
+        return
+
+    q_in = queue.Queue()
+    for i in range(n):
+        q_in.put(i)
+
+    if ordered:
+        q_outs = [queue.Queue(nbuffer) for i in range(n)]
+    else:
+        q_outs = [queue.Queue(max(2*nworkers, nbuffer))] * n
+
+    stop = threading.Event()
+
+    def put(q_out, item):
+        while not stop.is_set():
+            try:
+                q_out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def work():
+        while not stop.is_set():
+            try:
+                i = q_in.get_nowait()
+            except queue.Empty:
+                break
+
+            q_out = q_outs[i]
+            try:
+                it = function(i)
+                try:
+                    for result in it:
+                        if not put(q_out, (i, False, result, None)):
+                            break
+                finally:
+                    it.close()
+
+                put(q_out, (i, True, None, None))
+
+            except Exception as e:
+                put(q_out, (i, True, None, e))
+
+        if not ordered:
+            put(q_outs[0], (None, True, None, None))
+
+    threads = []
+    for iworker in range(min(nworkers, n)):
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    try:
+        if ordered:
+            # every group ends with a done marker or an exception, groups
+            # are handed out in order, so group inext is always being or
+            # has been processed by some worker
+            for inext in range(n):
+                while True:
+                    i, is_done, result, exception = q_outs[inext].get()
+                    if exception is not None:
+                        raise exception
+
+                    yield i, is_done, result
+                    if is_done:
+                        break
+
+        else:
+            nrunning = len(threads)
+            while nrunning:
+                i, is_done, result, exception = q_outs[0].get()
+                if i is None:
+                    nrunning -= 1
+                    continue
+
+                if exception is not None:
+                    raise exception
+
+                yield i, is_done, result
+
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+class Pile(TracesGroup):
     '''Waveform archive lookup, data loading and caching infrastructure.'''
 
+    # memory budget for the record indices kept for partial loading (see
+    # chopper), those of the least recently used files are released first
+    records_nbytes_max = 64*1024**2
+
     def __init__(self):
         TracesGroup.__init__(self, None)
         self.subpiles = {}
         self.open_files = {}
         self.listeners = []
         self.abspaths = set()
+        self.data_cache = None
+        self._data_lock = threading.RLock()
+        self._records_files = OrderedDict()
+        self._records_nbytes = 0
+
+    def set_data_cache_size(self, nbytes_max):
+        '''
+        Set memory budget for keeping decoded file data between requests.
+
+        With a data cache, data of recently used files is kept in memory (up
+        to the given number of bytes) after it has been released by
+        :py:meth:`chopper`, so that subsequent :py:meth:`chop` and
+        :py:meth:`chopper` calls from any accessor do not have to decode the
+        files again. The cache is shared by all accessors.
+
+        :param nbytes_max: memory budget in bytes, or ``None`` to disable
+            caching (default)
+        '''
+
+        with self._data_lock:
+            if nbytes_max is None:
+                if self.data_cache is not None:
+                    self.data_cache.clear()
+                    self.data_cache = None
+
+            elif self.data_cache is None:
+                self.data_cache = DataCache(nbytes_max)
+
+            else:
+                self.data_cache.nbytes_max = nbytes_max
+                self.data_cache._evict()
+
+    def get_data_cache(self):
+        '''
+        Get data cache object, e.g. to query usage statistics.
+
+        :returns: :py:class:`DataCache` object or ``None``
+        '''
+
+        return self.data_cache
 
     def add_listener(self, obj):
         self.listeners.append(weakref.ref(obj))
@@ -967,12 +2077,33 @@ class Pile(TracesGroup):
             fileformat='mseed',
             cache=None,
             show_progress=True,
-            update_progress=None):
+            update_progress=None,
+            nworkers=1,
+            mmap=False):
+
+        '''Add files to the pile.
+
+        :param filenames: list of paths to the files to be added
+        :param filename_attributes: regular expression with named groups
+            (``network``, ``station``, ``location``, ``channel``) to extract
+            trace codes from the file paths
+        :param fileformat: format of the files
+        :param cache: trace metainformation cache (see :py:func:`get_cache`)
+        :param show_progress: show progress bar
+        :param update_progress: progress callback
+        :param nworkers: number of processes to use for the extraction of
+            trace headers from new or modified files (``None``: one per CPU)
+        :param mmap: whether to access the data of uncompressed formats
+            through read-only memory maps instead of reading whole files (see
+            :py:func:`pyrocko.io.load`)
+        '''
 
         load = loader(
             filenames, fileformat, cache, filename_attributes,
             show_progress=show_progress,
-            update_progress=update_progress)
+            update_progress=update_progress,
+            nworkers=nworkers,
+            mmap=mmap)
 
         self.add_files(load)
 
@@ -1001,6 +2132,11 @@ class Pile(TracesGroup):
         if file.abspath is not None:
             self.abspaths.remove(file.abspath)
 
+        if self.data_cache is not None:
+            self.data_cache.discard(file)
+
+        self._release_records(file)
+
     def remove_files(self, files):
         subpile_files = {}
         for file in files:
@@ -1016,6 +2152,11 @@ class Pile(TracesGroup):
                 if file.abspath is not None:
                     self.abspaths.remove(file.abspath)
 
+                if self.data_cache is not None:
+                    self.data_cache.discard(file)
+
+                self._release_records(file)
+
     def dispatch_key(self, file):
         dt = int(math.floor(math.log(file.deltatmin)))
         return dt
@@ -1036,25 +2177,57 @@ class Pile(TracesGroup):
             trace_selector=None,
             snap=(round, round),
             include_last=False,
-            load_data=True):
+            load_data=True,
+            prefetcher=None,
+            load_partial=False,
+            dtype=None):
+
+        return self._chop(
+            tmin, tmax, group_selector, trace_selector, snap, include_last,
+            load_data, prefetcher, load_partial, pin=False, dtype=dtype)
+
+    def _chop(
+            self, tmin, tmax, group_selector, trace_selector, snap,
+            include_last, load_data, prefetcher, load_partial, pin,
+            dtype=None):
+
+        # With pin=True, the data use count of every returned file is
+        # incremented, so that the data cannot be released by a concurrent
+        # chopper before the caller has registered its own use.
+        #
+        # Lookups in the trace trees and the index are done under the data
+        # lock, because loading of file data may modify the trees when files
+        # have changed, and concurrent choppers may run in other threads.
 
         chopped = []
         used_files = set()
 
-        traces = self.relevant(tmin, tmax, group_selector, trace_selector)
+        with self._data_lock:
+            traces = self.relevant(
+                tmin, tmax, group_selector, trace_selector)
+
+        if load_data and load_partial:
+            # traces of files which cannot be read partially are returned
+            # and loaded as usual
+            chopped, traces = self._chop_partial(
+                traces, tmin, tmax, trace_selector, snap, include_last)
+
         if load_data:
             files_changed = False
             for tr in traces:
                 if tr.file and tr.file not in used_files:
-                    if tr.file.load_data():
+                    if self._load_file_data(tr.file, prefetcher, pin):
                         files_changed = True
 
-                    if tr.file is not None:
-                        used_files.add(tr.file)
+                    used_files.add(tr.file)
 
             if files_changed:
-                traces = self.relevant(
-                    tmin, tmax, group_selector, trace_selector)
+                with self._data_lock:
+                    traces = self.relevant(
+                        tmin, tmax, group_selector, trace_selector)
+
+                if load_partial:
+                    traces = [tr for tr in traces if tr.file in used_files]
 
         for tr in traces:
             if not load_data and tr.ydata is not None:
@@ -1071,7 +2244,118 @@ class Pile(TracesGroup):
             except trace.NoData:
                 pass
 
-        return chopped, used_files
+        return _traces_astype(chopped, dtype), used_files
+
+    def _load_file_data(self, file, prefetcher, pin):
+        with self._data_lock:
+            was_loaded = file.data_loaded
+
+        traces = None
+        if not was_loaded and isinstance(file, TracesFile):
+            # decode outside of the lock, so that different files can be
+            # read concurrently
+            if prefetcher is not None:
+                traces = prefetcher.take(file)
+
+            if traces is None:
+                logger.debug('loading data from file: %s' % file.abspath)
+                traces = file.read_data()
+
+        with self._data_lock:
+            file_changed = file.load_data(traces=traces)
+            if pin:
+                file.use_data()
+
+            if self.data_cache is not None and isinstance(file, TracesFile):
+                self.data_cache.count(was_loaded)
+                self.data_cache.put(file)
+
+        return file_changed
+
+    def _chop_partial(
+            self, traces, tmin, tmax, trace_selector, snap, include_last):
+
+        traces_by_file = {}
+        for tr in traces:
+            traces_by_file.setdefault(tr.file, []).append(tr)
+
+        chopped = []
+        unread = []
+        for file, file_traces in traces_by_file.items():
+            with self._data_lock:
+                if file is None or file.data_loaded:
+                    # data is already in memory
+                    for tr in file_traces:
+                        try:
+                            chopped.append(tr.chop(
+                                tmin, tmax,
+                                inplace=False,
+                                snap=snap,
+                                include_last=include_last))
+
+                        except trace.NoData:
+                            pass
+
+                    continue
+
+            if not file.is_partially_readable():
+                unread.extend(file_traces)
+                continue
+
+            nslc_ids = set(tr.nslc_id for tr in file_traces)
+            had_records = file.records is not None
+            partial_traces = [
+                tr for tr in file.read_data(tmin, tmax, nslc_ids)
+                if tr.nslc_id in nslc_ids and (
+                    trace_selector is None or trace_selector(tr))]
+
+            if file.records is not None:
+                if not had_records:
+                    self._records_updated(file)
+
+                self._keep_records(file)
+
+            for tr in partial_traces:
+                try:
+                    chopped.append(tr.chop(
+                        tmin, tmax,
+                        inplace=True,
+                        snap=snap,
+                        include_last=include_last))
+
+                except trace.NoData:
+                    pass
+
+        return chopped, unread
+
+    def _records_updated(self, file):
+        pass
+
+    def _keep_records(self, file):
+        with self._data_lock:
+            if file.records is None:
+                return
+
+            if file in self._records_files:
+                # move to end
+                self._records_files[file] = self._records_files.pop(file)
+                return
+
+            nbytes = file.records.nbytes
+            self._records_files[file] = nbytes
+            self._records_nbytes += nbytes
+            while self._records_nbytes > self.records_nbytes_max \
+                    and len(self._records_files) > 1:
+
+                old, nbytes = self._records_files.popitem(last=False)
+                self._records_nbytes -= nbytes
+                old.records = None
+
+    def _release_records(self, file):
+        with self._data_lock:
+            if file in self._records_files:
+                self._records_nbytes -= self._records_files.pop(file)
+                file.records = None
 
     def _process_chopped(
             self, chopped, degap, maxgap, maxlap, want_incomplete, wmax, wmin,
@@ -1114,7 +2398,9 @@ class Pile(TracesGroup):
             group_selector=None, trace_selector=None,
             want_incomplete=True, degap=True, maxgap=5, maxlap=None,
             keep_current_files_open=False, accessor_id=None,
-            snap=(round, round), include_last=False, load_data=True):
+            snap=(round, round), include_last=False, load_data=True,
+            prefetch=0, prefetch_nbytes_max=256*1024**2, load_partial=False,
+            dtype=None):
 
         '''
         Get iterator for shifting window wise data extraction from waveform
@@ -1150,6 +2436,22 @@ class Pile(TracesGroup):
         :param load_data: whether to load the waveform data. If set to
             ``False``, traces with no data samples, but with correct
             meta-information are returned
+        :param prefetch: number of upcoming windows for which the data files
+            are read in a background thread while the current window is
+            processed (``0`` disables prefetching)
+        :param prefetch_nbytes_max: maximum number of bytes of decoded data
+            to be held ahead by the prefetcher
+        :param load_partial: if ``True``, only the Mini-SEED records
+            overlapping with each window are decoded, instead of loading
+            complete files and keeping them in memory while they are needed.
+            This is faster when the windows are short compared to the file
+            lengths. Files in other formats are loaded completely. The record
+            indices needed are kept up to :py:attr:`records_nbytes_max`
+            bytes. Prefetching is not available in this mode.
+        :param dtype: if given, the sample data of the extracted traces is
+            converted to this data type (e.g. ``numpy.float32``), so that
+            subsequent processing can run in reduced precision without an
+            intermediate conversion to ``float64``
         :returns: itererator yielding a list of :py:class:`pyrocko.trace.Trace`
             objects for every extracted time window
         '''
@@ -1168,51 +2470,89 @@ class Pile(TracesGroup):
         if tinc is None:
             tinc = tmax - tmin
 
-        if not self.is_relevant(tmin-tpad, tmax+tpad, group_selector):
-            return
+        with self._data_lock:
+            if not self.is_relevant(tmin-tpad, tmax+tpad, group_selector):
+                return
 
         if accessor_id not in self.open_files:
             self.open_files[accessor_id] = set()
 
         open_files = self.open_files[accessor_id]
 
-        iwin = 0
-        while True:
-            chopped = []
-            wmin, wmax = tmin+iwin*tinc, min(tmin+(iwin+1)*tinc, tmax)
-            eps = tinc*1e-6
-            if wmin >= tmax-eps:
-                break
-
-            chopped, used_files = self.chop(
-                wmin-tpad, wmax+tpad, group_selector, trace_selector, snap,
-                include_last, load_data)
-
-            for file in used_files - open_files:
-                # increment datause counter on newly opened files
-                file.use_data()
-
-            open_files.update(used_files)
+        def window(iwin):
+            return tmin+iwin*tinc, min(tmin+(iwin+1)*tinc, tmax)
 
-            processed = self._process_chopped(
-                chopped, degap, maxgap, maxlap, want_incomplete, wmax, wmin,
-                tpad)
+        eps = tinc*1e-6
 
-            yield processed
+        prefetcher = None
+        if load_data and prefetch > 0 and not load_partial:
+            prefetcher = Prefetcher(prefetch_nbytes_max)
 
-            unused_files = open_files - used_files
-
-            while unused_files:
-                file = unused_files.pop()
-                file.drop_data()
-                open_files.remove(file)
-
-            iwin += 1
+        iwin = 0
+        try:
+            while True:
+                chopped = []
+                wmin, wmax = window(iwin)
+                if wmin >= tmax-eps:
+                    break
+
+                chopped, used_files = self._chop(
+                    wmin-tpad, wmax+tpad, group_selector, trace_selector,
+                    snap, include_last, load_data, prefetcher, load_partial,
+                    pin=True, dtype=dtype)
+
+                with self._data_lock:
+                    for file in used_files & open_files:
+                        # already in use by this accessor, release the
+                        # additional use acquired by _chop
+                        file.drop_data()
+
+                    open_files.update(used_files)
+
+                if prefetcher is not None:
+                    # files needed by the upcoming windows, in the order in
+                    # which they will be needed
+                    amin = window(iwin+1)[0]
+                    amax = window(iwin+prefetch)[1]
+                    ahead = set()
+                    if amin < tmax-eps:
+                        with self._data_lock:
+                            ahead = set(
+                                tr.file for tr in self.relevant(
+                                    amin-tpad, amax+tpad,
+                                    group_selector, trace_selector)
+                                if tr.file is not None)
+
+                    prefetcher.retain(ahead)
+                    prefetcher.request(sorted(
+                        ahead,
+                        key=lambda file: (file.tmin, file.abspath or '')))
+
+                processed = self._process_chopped(
+                    chopped, degap, maxgap, maxlap, want_incomplete, wmax,
+                    wmin, tpad)
+
+                yield processed
+
+                unused_files = open_files - used_files
+
+                with self._data_lock:
+                    while unused_files:
+                        file = unused_files.pop()
+                        file.drop_data()
+                        open_files.remove(file)
+
+                iwin += 1
+
+        finally:
+            if prefetcher is not None:
+                prefetcher.stop()
 
         if not keep_current_files_open:
-            while open_files:
-                file = open_files.pop()
-                file.drop_data()
+            with self._data_lock:
+                while open_files:
+                    file = open_files.pop()
+                    file.drop_data()
 
     def all(self, *args, **kwargs):
         '''
@@ -1231,6 +2571,40 @@ class Pile(TracesGroup):
                 yield tr
 
     def chopper_grouped(self, gather, progress=None, *args, **kwargs):
+        '''
+        Get iterator for window wise data extraction, separately for each
+        group of traces.
+
+        For each key returned by ``gather``, a complete :py:meth:`chopper`
+        pass is done over the traces belonging to that group. Additional
+        arguments are passed to :py:meth:`chopper`.
+
+        :param gather: callback taking :py:class:`pyrocko.trace.Trace`
+            objects and returning the group key, e.g. ``lambda tr:
+            tr.nslc_id[:2]`` for station-wise processing
+        :param progress: label for progress bar (``None`` to disable)
+        :param nworkers: number of groups to be processed concurrently in
+            worker threads (default: ``1``, sequential processing). With
+            more than one worker, data of each group is released when the
+            group is finished, regardless of ``keep_current_files_open``.
+        :param ordered: if ``True`` (default), results are yielded in the
+            same order as in sequential processing, otherwise they are
+            yielded as soon as they become available
+        :param process: optional callback taking the list of traces of a
+            window; its return value is yielded instead of the traces
+        :param nprocs: number of processes to run ``process`` in (default:
+            ``1``, run in worker threads). ``process`` must be picklable if
+            ``nprocs`` is not ``1``.
+        :returns: iterator yielding a list of :py:class:`pyrocko.trace.Trace`
+            objects (or the result of ``process``) for every extracted time
+            window of every group
+        '''
+
+        nworkers = kwargs.pop('nworkers', 1)
+        ordered = kwargs.pop('ordered', True)
+        process = kwargs.pop('process', None)
+        nprocs = kwargs.pop('nprocs', 1)
+
         keys = self.gather_keys(gather)
         if len(keys) == 0:
             return
@@ -1250,7 +2624,7 @@ class Pile(TracesGroup):
         if progress is not None:
             pbar = util.progressbar(progress, len(keys))
 
-        for ikey, key in enumerate(keys):
+        def make_group_kwargs(key):
             def tsel(tr):
                 return gather(tr) == key and (outer_trace_selector is None or
                                               outer_trace_selector(tr))
@@ -1262,17 +2636,144 @@ class Pile(TracesGroup):
                 return key in gather_cache[gr] and (
                     outer_group_selector is None or outer_group_selector(gr))
 
-            kwargs['trace_selector'] = tsel
-            kwargs['group_selector'] = gsel
+            group_kwargs = dict(kwargs)
+            group_kwargs['trace_selector'] = tsel
+            group_kwargs['group_selector'] = gsel
+            return group_kwargs
+
+        if process is not None and nprocs == 1:
+            # run callback in the worker threads
+            group_process = process
+            process = None
+        else:
+            group_process = None
+
+        def chop_group(ikey):
+            group_kwargs = make_group_kwargs(keys[ikey])
+            if nworkers != 1:
+                # each worker needs its own accessor to keep track of the
+                # files it uses
+                group_kwargs['accessor_id'] = (
+                    'chopper_grouped', kwargs.get('accessor_id', None), ikey)
 
-            for traces in self.chopper(*args, **kwargs):
-                yield traces
+            try:
+                for traces in self.chopper(*args, **group_kwargs):
+                    if group_process is not None:
+                        yield group_process(traces)
+                    else:
+                        yield traces
+
+            finally:
+                if nworkers != 1:
+                    with self._data_lock:
+                        for file in self.open_files.pop(
+                                group_kwargs['accessor_id'], ()):
+                            file.drop_data()
+
+        def iter_chopped():
+            ndone = 0
+            for ikey, done, result in _thread_imap_groups(
+                    chop_group, len(keys), nworkers, ordered):
+
+                if done:
+                    ndone += 1
+                    if pbar:
+                        pbar.update(ndone)
+                else:
+                    yield result
 
+        try:
+            if process is not None:
+                for result in parimap(process, iter_chopped(), nprocs=nprocs):
+                    yield result
+            else:
+                for result in iter_chopped():
+                    yield result
+
+        finally:
             if pbar:
-                pbar.update(ikey+1)
+                pbar.finish()
+
+    def match_templates(
+            self, templates, threshold, tmin=None, tmax=None, tinc=None,
+            tsearch=None, nbytes_max=64*1024**2, **kwargs):
+
+        '''
+        Get iterator over template matching detections in the waveforms.
+
+        :param templates: list of templates, each given as a list of
+            :py:class:`pyrocko.trace.Trace` objects (one per channel)
+        :param threshold: detection threshold for the mean correlation
+            coefficient
+        :param tmin: start time (default uses start time of available data)
+        :param tmax: end time (default uses end time of available data)
+        :param tinc: length of the processing windows [s] (default uses
+            ``tmax-tmin``)
+        :param tsearch: search length for peaks after the detection function
+            rises above ``threshold``, see
+            :py:meth:`pyrocko.trace.Trace.peaks` (default uses the duration
+            of the template)
+        :param nbytes_max: passed to
+            :py:func:`pyrocko.trace.correlate_normalized_many`
+        :returns: iterator yielding tuples ``(itemplate, time, value)`` in
+            order of time within each processing window
+
+        The data is extracted with :py:meth:`chopper`, with padding chosen so
+        that detections with reference times in every window are found. Only
+        the channels used by the templates are loaded. Additional keyword
+        arguments are passed to :py:meth:`chopper`. See
+        :py:func:`pyrocko.trace.match_templates` for the definition of the
+        detection function. If gaps split the data of a channel within a
+        window, only its longest piece is used.
+        '''
+
+        nslc_ids = set(tr.nslc_id for template in templates for tr in template)
+        tdurations = [
+            max(tr.tmax for tr in template) - min(tr.tmin for tr in template)
+            for template in templates]
+
+        tpad = max(tdurations) + max(
+            tr.deltat for template in templates for tr in template)
+
+        trace_selector_user = kwargs.pop('trace_selector', None)
+
+        def trace_selector(tr):
+            return tr.nslc_id in nslc_ids and (
+                trace_selector_user is None or trace_selector_user(tr))
+
+        for traces in self.chopper(
+                tmin=tmin, tmax=tmax, tinc=tinc, tpad=tpad,
+                trace_selector=trace_selector, **kwargs):
+
+            if not traces:
+                continue
+
+            longest = {}
+            for tr in traces:
+                if tr.nslc_id not in longest \
+                        or tr.data_len() > longest[tr.nslc_id].data_len():
+                    longest[tr.nslc_id] = tr
+
+            wmin, wmax = traces[0].wmin, traces[0].wmax
+            detections = []
+            for itemplate, cc in enumerate(trace.match_templates(
+                    templates, list(longest.values()),
+                    nbytes_max=nbytes_max)):
+
+                if cc is None:
+                    continue
+
+                tpeaks, apeaks = cc.peaks(
+                    threshold,
+                    tsearch if tsearch is not None else tdurations[itemplate])
+
+                for t, value in zip(tpeaks, apeaks):
+                    if wmin <= t < wmax:
+                        detections.append((t, itemplate, value))
 
-        if pbar:
-            pbar.finish()
+            detections.sort()
+            for t, itemplate, value in detections:
+                yield itemplate, t, value
 
     def gather_keys(self, gather, selector=None):
         keys = set()
@@ -1319,6 +2820,33 @@ class Pile(TracesGroup):
             for file in subpile.iter_files():
                 yield file
 
+    def get_trace_table(
+            self, tmin=None, tmax=None, group_selector=None,
+            trace_selector=None):
+
+        '''Get headers of the traces in the pile in columnar form.
+
+        :param tmin: start time of query interval or ``None``
+        :param tmax: end time of query interval or ``None``
+        :param group_selector: filter callback taking :py:class:`TracesGroup`
+            objects
+        :param trace_selector: filter callback taking
+            :py:class:`pyrocko.trace.Trace` objects
+
+        :returns: :py:class:`pyrocko.trace.TraceTable` object
+        '''
+
+        if self.tmin is None or (tmin is None and tmax is None):
+            traces = self.iter_traces(
+                group_selector=group_selector, trace_selector=trace_selector)
+        else:
+            traces = self.relevant(
+                tmin if tmin is not None else self.tmin,
+                tmax if tmax is not None else self.tmax,
+                group_selector, trace_selector)
+
+        return trace.TraceTable.from_traces(traces)
+
     def reload_modified(self):
         modified = False
         for subpile in self.subpiles.values():
@@ -1378,10 +2906,335 @@ class Pile(TracesGroup):
         snuffle(self, **kwargs)
 
 
+class LazyPile(Pile):
+    '''Waveform archive access driven by queries to a trace header index.
+
+    In contrast to :py:class:`Pile`, the trace headers of the archive are not
+    held in memory. Only the files overlapping with the time window of a
+    request are looked up in the :py:class:`SQLiteTracesFileCache` and
+    instantiated, so that memory usage depends on the window length rather
+    than on the size of the archive. Files are accessed through the usual
+    :py:meth:`chop`, :py:meth:`chopper` and :py:meth:`iter_traces` methods.
+
+    Files which are not in the index, e.g. :py:class:`MemTracesFile` objects,
+    can still be added with :py:meth:`add_file`. They are kept in memory,
+    like in :py:class:`Pile`, and are merged into the query results.
+
+    :param cache: :py:class:`SQLiteTracesFileCache` object holding the trace
+        header index
+    :param mmap: whether to access the data of uncompressed formats through
+        read-only memory maps (see :py:func:`pyrocko.io.load`)
+    '''
+
+    def __init__(self, cache, mmap=False):
+        Pile.__init__(self)
+        self._cache = cache
+        self._mmap = mmap
+        self._selection = cache.new_selection()
+        self._tfiles = weakref.WeakValueDictionary()
+        self._memfiles = SubPile(None)
+        self.nfiles = 0
+        self.tlenmax = None
+
+    def __del__(self):
+        self._cache.delete_selection(self._selection)
+
+    def load_files(
+            self, filenames,
+            fileformat='mseed',
+            show_progress=True,
+            update_progress=None,
+            nworkers=1):
+
+        '''Add files to the pile, indexing new or modified files.
+
+        See :py:meth:`Pile.load_files` for a description of the arguments.
+
+        :returns: number of files which had to be (re)indexed
+        '''
+
+        abspaths = [os.path.abspath(fn) for fn in filenames]
+        nindexed = 0
+        for tfile in loader(
+                filenames, fileformat, self._cache, None,
+                show_progress=show_progress,
+                update_progress=update_progress,
+                yield_unchanged=False,
+                nworkers=nworkers):
+
+            nindexed += 1
+
+        self._cache.add_to_selection(self._selection, abspaths)
+        self.update_from_index()
+        return nindexed
+
+    def remove_files(self, abspaths):
+        '''Remove files from the pile (they are kept in the index).'''
+
+        self._cache.remove_from_selection(self._selection, abspaths)
+        for abspath in abspaths:
+            self._tfiles.pop(abspath, None)
+
+        abspaths = set(abspaths)
+        memfiles = [
+            file for file in self._memfiles.files if file.abspath in abspaths]
+
+        if memfiles:
+            Pile.remove_files(self, memfiles)
+
+        for file in list(self._records_files.keys()):
+            if file.abspath in abspaths:
+                self._release_records(file)
+
+        if self.data_cache is not None:
+            for file in self.data_cache.files():
+                if file.abspath in abspaths:
+                    self.data_cache.discard(file)
+
+        self.update_from_index()
+
+    def add_files(self, files):
+        for file in files:
+            self._add_file(file)
+
+        self.update_from_index()
+
+    def add_file(self, file):
+        '''Add a file which is not held in the trace header index.'''
+
+        self._add_file(file)
+        self.update_from_index()
+
+    def _add_file(self, file):
+        if file.abspath is not None and file.abspath in self.abspaths:
+            logger.warning('File already in pile: %s' % file.abspath)
+            return
+
+        if file.deltatmin is None:
+            logger.warning('Sampling rate of all traces are zero in file: %s' %
+                           file.abspath)
+            return
+
+        self._memfiles.add_file(file)
+        if file.abspath is not None:
+            self.abspaths.add(file.abspath)
+
+    def remove_file(self, file):
+        if file.get_parent() is self._memfiles:
+            Pile.remove_file(self, file)
+            self.update_from_index()
+        else:
+            self.remove_files([file.abspath])
+
+    def update_from_index(self):
+        '''Update summary information from the trace header index.'''
+
+        self.empty()
+        self.nfiles = len(self._cache.query_files(selection=self._selection))
+        tmins, tmaxs, tlenmaxs, mtimes = [], [], [], []
+        for (nslc, deltat, count, tmin, tmax, tlenmax, mtime) \
+                in self._cache.query_summary(selection=self._selection):
+
+            for counter, k in zip(
+                    (self.networks, self.stations, self.locations,
+                     self.channels),
+                    nslc):
+
+                counter[k] += count
+
+            self.nslc_ids[nslc] += count
+            self.deltats[deltat] += count
+            tmins.append(tmin)
+            tmaxs.append(tmax)
+            tlenmaxs.append(tlenmax)
+            mtimes.append(mtime)
+
+        mem = self._memfiles
+        if mem.tmin is not None:
+            for counter, mem_counter in zip(
+                    (self.networks, self.stations, self.locations,
+                     self.channels, self.nslc_ids, self.deltats),
+                    (mem.networks, mem.stations, mem.locations,
+                     mem.channels, mem.nslc_ids, mem.deltats)):
+
+                counter.update(mem_counter)
+
+            tmins.append(mem.tmin)
+            tmaxs.append(mem.tmax)
+            tlenmaxs.append(mem.tlenmax)
+            mtimes.append(mem.mtime)
+
+        self.nfiles += len(mem.files)
+
+        if tmins:
+            self.tmin = min(tmins)
+            self.tmax = max(tmaxs)
+            self.tlenmax = max(tlenmaxs)
+            self.mtime = max(mtimes)
+            self.deltatmin = min(self.deltats.keys())
+            self.deltatmax = max(self.deltats.keys())
+        else:
+            self.tlenmax = None
+            self.mtime = None
+
+        self.nupdates += 1
+        self.notify_listeners('add')
+
+    def _get_tfile(self, abspath, format, mtime):
+        tfile = self._tfiles.get(abspath, None)
+        if tfile is None or tfile.mtime != mtime:
+            tfile = self._cache.get(abspath)
+            tfile.mmap = self._mmap
+            self._tfiles[abspath] = tfile
+
+        return tfile
+
+    def _iter_files(self, tmin=None, tmax=None):
+        for (abspath, format, mtime) in self._cache.query_files(
+                tmin, tmax, selection=self._selection):
+
+            yield self._get_tfile(abspath, format, mtime)
+
+    def relevant(self, tmin, tmax, group_selector=None, trace_selector=None):
+        if not self.is_relevant(tmin, tmax, group_selector):
+            return []
+
+        traces = []
+        for tfile in self._iter_files(tmin, tmax):
+            traces.extend(tfile.relevant(tmin, tmax, None, trace_selector))
+
+        traces.extend(
+            self._memfiles.relevant(tmin, tmax, None, trace_selector))
+
+        return traces
+
+    def _records_updated(self, file):
+        # store newly created record index
+        self._cache.put(file.abspath, file)
+
+    def gather_keys(self, gather, selector=None):
+        '''Get sorted gather keys.
+
+        The ``gather`` and ``selector`` functions are called with a data-less
+        representative trace for each combination of codes and sampling
+        interval in the index.
+        '''
+
+        keys = set()
+        for (nslc, deltat, _, tmin, tmax, _, mtime) \
+                in self._cache.query_summary(selection=self._selection):
+
+            tr = trace.Trace(
+                *nslc, tmin=tmin, tmax=tmax, deltat=deltat, mtime=mtime)
+
+            if selector is None or selector(tr):
+                keys.add(gather(tr))
+
+        keys |= self._memfiles.gather_keys(gather, selector)
+
+        return sorted(keys)
+
+    def iter_traces(
+            self,
+            load_data=False,
+            return_abspath=False,
+            group_selector=None,
+            trace_selector=None):
+
+        for file in self.iter_files():
+            if group_selector and not group_selector(file):
+                continue
+
+            must_drop = False
+            if load_data:
+                file.load_data()
+                file.use_data()
+                must_drop = True
+
+            for tr in file.iter_traces():
+                if trace_selector and not trace_selector(tr):
+                    continue
+
+                if return_abspath:
+                    yield file.abspath, tr
+                else:
+                    yield tr
+
+            if must_drop:
+                file.drop_data()
+
+    def iter_files(self):
+        for file in self._iter_files():
+            yield file
+
+        for file in self._memfiles.iter_files():
+            yield file
+
+    def get_trace_table(
+            self, tmin=None, tmax=None, group_selector=None,
+            trace_selector=None):
+
+        if group_selector is not None or trace_selector is not None \
+                or self._memfiles.files:
+
+            return Pile.get_trace_table(
+                self, tmin, tmax, group_selector, trace_selector)
+
+        # build the table directly from the index
+        return self._cache.query_trace_table(
+            tmin, tmax, selection=self._selection).select(tmin, tmax)
+
+    def reload_modified(self):
+        by_format = {}
+        missing = []
+        for (abspath, format, _) in self._cache.query_files(
+                selection=self._selection):
+
+            if os.path.isfile(abspath):
+                by_format.setdefault(format, []).append(abspath)
+            else:
+                missing.append(abspath)
+
+        modified = bool(missing)
+        if missing:
+            self._cache.remove(missing)
+
+        for format, abspaths in by_format.items():
+            modified |= self.load_files(
+                abspaths, fileformat=format, show_progress=False) > 0
+
+        memfiles_modified = self._memfiles.reload_modified()
+        modified |= memfiles_modified
+
+        if missing or memfiles_modified:
+            self.update_from_index()
+
+        return modified
+
+    def __str__(self):
+        if self.tmin is not None and self.tmax is not None:
+            tmin = util.time_to_str(self.tmin)
+            tmax = util.time_to_str(self.tmax)
+            s = 'LazyPile\n'
+            s += 'number of files: %i\n' % self.nfiles
+            s += 'timerange: %s - %s\n' % (tmin, tmax)
+            s += 'networks: %s\n' % ', '.join(sl(self.networks.keys()))
+            s += 'stations: %s\n' % ', '.join(sl(self.stations.keys()))
+            s += 'locations: %s\n' % ', '.join(sl(self.locations.keys()))
+            s += 'channels: %s\n' % ', '.join(sl(self.channels.keys()))
+            s += 'deltats: %s\n' % ', '.join(sl(self.deltats.keys()))
+
+        else:
+            s = 'empty LazyPile'
+
+        return s
+
+
 def make_pile(
         paths=None, selector=None, regex=None,
         fileformat='mseed',
-        cachedirname=None, show_progress=True):
+        cachedirname=None, show_progress=True, lazy=False, nworkers=1,
+        mmap=False):
 
     '''Create pile from given file and directory names.
 
@@ -1396,6 +3249,13 @@ def make_pile(
     :param cachedirname: loader cache is stored under this directory. It is
         created as neccessary.
     :param show_progress: show progress bar and other progress information
+    :param lazy: if ``True``, a :py:class:`LazyPile` is returned, which does
+        not keep the trace headers of the archive in memory
+    :param nworkers: number of processes to use for the extraction of trace
+        headers from new or modified files (``None``: one per CPU)
+    :param mmap: whether to access the data of uncompressed formats through
+        read-only memory maps instead of reading whole files (see
+        :py:func:`pyrocko.io.load`)
     '''
 
     if show_progress_force_off:
@@ -1414,12 +3274,23 @@ def make_pile(
         paths, selector, regex, show_progress=show_progress)
 
     cache = get_cache(cachedirname)
-    p = Pile()
-    p.load_files(
-        sorted(fns),
-        cache=cache,
-        fileformat=fileformat,
-        show_progress=show_progress)
+    if lazy:
+        p = LazyPile(cache, mmap=mmap)
+        p.load_files(
+            sorted(fns),
+            fileformat=fileformat,
+            show_progress=show_progress,
+            nworkers=nworkers)
+
+    else:
+        p = Pile()
+        p.load_files(
+            sorted(fns),
+            cache=cache,
+            fileformat=fileformat,
+            show_progress=show_progress,
+            nworkers=nworkers,
+            mmap=mmap)
 
     return p
 
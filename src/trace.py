@@ -10,10 +10,15 @@ from builtins import map
 from builtins import range
 from builtins import str as newstr
 
+import os
 import time
 import math
 import copy
+import hashlib
 import logging
+import fractions
+from collections import defaultdict, OrderedDict
+from itertools import product
 
 import numpy as num
 from scipy import signal
@@ -32,6 +37,119 @@ guts_prefix = 'pf'
 logger = logging.getLogger('pyrocko.trace')
 
 
+class GlobalVars(object):
+    processing_dtype = num.dtype(num.float64)
+
+
+def set_processing_dtype(dtype):
+    '''
+    Set floating point type used for processing of trace data.
+
+    :param dtype: ``numpy.float64`` (default) or ``numpy.float32``
+
+    Filtering, FFT-based operations, resampling and tapering of
+    :py:class:`Trace` objects convert the data to this type and produce
+    output of this type. With ``numpy.float32``, memory use and bandwidth of
+    these operations are halved. Spectra are still computed in double
+    precision internally. Recursive (Butterworth) filters are also evaluated
+    in double precision, only their output is stored in single precision:
+    in single precision, the filter recursion is inaccurate for corner
+    frequencies far below the Nyquist frequency. Results then differ from
+    double precision processing by roughly ``1e-7`` relative to the peak
+    amplitude.
+    '''
+
+    dtype = num.dtype(dtype)
+    if dtype not in (num.float32, num.float64):
+        raise ValueError(
+            'processing dtype must be float32 or float64, not %s' % dtype)
+
+    GlobalVars.processing_dtype = dtype
+
+
+def get_processing_dtype():
+    '''
+    Get floating point type used for processing of trace data.
+
+    See :py:func:`set_processing_dtype`.
+    '''
+
+    return GlobalVars.processing_dtype
+
+
+def _to_processing_dtype(ydata, copy=True):
+    return ydata.astype(GlobalVars.processing_dtype, copy=copy)
+
+
+class Workspace(object):
+    '''
+    Reusable scratch arrays for repeated trace processing.
+
+    Processing methods of :py:class:`Trace` which accept a ``workspace``
+    argument put their results (and temporary arrays) into buffers taken
+    from the workspace instead of allocating fresh arrays on each call.
+    Buffers are identified by a key and a dtype and only grow, so that in a
+    loop over windows of similar length, memory is allocated only once.
+
+    The data of a trace produced with a workspace is a view into a buffer of
+    the workspace. It is overwritten by the next call using the same buffer,
+    so results must be consumed (or copied) before the workspace is used
+    again. Use separate workspaces for results needed at the same time, e.g.
+    one per channel.
+    '''
+
+    def __init__(self):
+        self._buffers = {}
+
+    def empty(self, key, n, dtype=num.float64):
+        '''
+        Get uninitialized 1D array of length ``n``.
+        '''
+
+        dtype = num.dtype(dtype)
+        buf = self._buffers.get((key, dtype))
+        if buf is None or buf.size < n:
+            buf = num.empty(n, dtype=dtype)
+            self._buffers[key, dtype] = buf
+
+        return buf[:n]
+
+    def child(self, key):
+        '''
+        Get sub-workspace, e.g. to keep per-channel results apart.
+        '''
+
+        if (key, None) not in self._buffers:
+            self._buffers[key, None] = Workspace()
+
+        return self._buffers[key, None]
+
+    def zeros(self, key, n, dtype=num.float64):
+        '''
+        Get zero-filled 1D array of length ``n``.
+        '''
+
+        a = self.empty(key, n, dtype)
+        a.fill(0)
+        return a
+
+    def copy(self, key, array):
+        '''
+        Get copy of 1D array ``array``.
+        '''
+
+        a = self.empty(key, array.size, array.dtype)
+        a[:] = array
+        return a
+
+    @property
+    def nbytes(self):
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def clear(self):
+        self._buffers.clear()
+
+
 class Trace(object):
 
     '''
@@ -63,7 +181,7 @@ class Trace(object):
     silently truncated when the trace is stored
     '''
 
-    cached_frequencies = {}
+    cached_frequencies = util.LRUCache(nbytes_max=32*1024**2)
 
     def __init__(self, network='', station='STA', location='', channel='',
                  tmin=0., tmax=None, deltat=1., ydata=None, mtime=None,
@@ -440,16 +558,25 @@ class Trace(object):
         self._growbuffer = None
         self._pchain = None
 
-    def copy(self, data=True):
+    def copy(self, data=True, workspace=None):
         '''
         Make a deep copy of the trace.
+
+        :param data: whether to copy the data samples
+        :param workspace: :py:class:`Workspace` to take the data array from
         '''
 
         tracecopy = copy.copy(self)
         tracecopy.drop_growbuffer()
         if data:
-            tracecopy.ydata = self.ydata.copy()
-        tracecopy.meta = copy.deepcopy(self.meta)
+            if workspace is None:
+                tracecopy.ydata = self.ydata.copy()
+            else:
+                tracecopy.ydata = workspace.copy('copy', self.ydata)
+
+        if self.meta is not None:
+            tracecopy.meta = copy.deepcopy(self.meta)
+
         return tracecopy
 
     def crop_zeros(self):
@@ -493,7 +620,7 @@ class Trace(object):
 
     def chop(
             self, tmin, tmax, inplace=True, include_last=False,
-            snap=(round, round), want_incomplete=True):
+            snap=(round, round), want_incomplete=True, workspace=None):
 
         '''
         Cut the trace to given time span.
@@ -511,7 +638,8 @@ class Trace(object):
         unless ``want_incomplete`` is set to False - in that case, a
         :py:exc:`NoData` exception is raised. This exception is always raised,
         when the requested time span does dot overlap with the trace's time
-        span.
+        span. If a :py:class:`Workspace` is given, the cut data is put into
+        one of its buffers.
         '''
 
         if want_incomplete:
@@ -539,7 +667,10 @@ class Trace(object):
 
         self.drop_growbuffer()
         if self.ydata is not None:
-            obj.ydata = self.ydata[ibeg:iend].copy()
+            if workspace is None:
+                obj.ydata = self.ydata[ibeg:iend].copy()
+            else:
+                obj.ydata = workspace.copy('chop', self.ydata[ibeg:iend])
         else:
             obj.ydata = None
 
@@ -573,10 +704,10 @@ class Trace(object):
             ilag = 0
 
         if snap and ilag > 0 and ilag < self.ydata.size:
-            data = self.ydata.astype(num.float64)
+            data = _to_processing_dtype(self.ydata)
             self.tmin += ilag*self.deltat
         else:
-            data = self.ydata.astype(num.float64)
+            data = _to_processing_dtype(self.ydata)
 
         if demean:
             data -= num.mean(data)
@@ -589,6 +720,7 @@ class Trace(object):
         else:
             self.ydata, finals = result
 
+        self.ydata = _to_processing_dtype(self.ydata, copy=False)
         self.deltat = reuse(self.deltat*ndecimate)
         self.tmax = self.tmin+(len(self.ydata)-1)*self.deltat
         self._update_ids()
@@ -596,7 +728,7 @@ class Trace(object):
         return finals
 
     def downsample_to(self, deltat, snap=False, allow_upsample_max=1,
-                      initials=None, demean=False):
+                      initials=None, demean=False, allow_polyphase=False):
 
         '''
         Downsample to given sampling rate.
@@ -607,6 +739,13 @@ class Trace(object):
         intermediate upsampling steps are allowed, in order to increase the
         number of possible downsampling ratios.
 
+        If ``allow_polyphase`` is ``True`` and the ratio cannot be realized
+        with integer decimation steps, the trace is resampled with
+        :py:meth:`Trace.resample_polyphase` instead, which supports arbitrary
+        rational ratios (e.g. 100 Hz to 40 Hz). The fallback is only used
+        for actual downsampling, i.e. when ``deltat`` is larger than the
+        current sampling interval.
+
         If the requested ratio is not supported, an exception of type
         :py:exc:`pyrocko.util.UnavailableDecimation` is raised.
         '''
@@ -624,6 +763,10 @@ class Trace(object):
                 break
 
         if not ok:
+            if allow_polyphase and initials is None and ratio > 1.:
+                self.resample_polyphase(deltat, snap=snap, demean=demean)
+                return
+
             raise util.UnavailableDecimation('ratio = %g' % ratio)
 
         if upsratio > 1:
@@ -654,13 +797,20 @@ class Trace(object):
         if initials is not None:
             return finals
 
-    def resample(self, deltat):
+    def resample(self, deltat, method='fft'):
         '''
         Resample to given sampling rate ``deltat``.
 
-        Resampling is performed in the frequency domain.
+        :param method: ``'fft'``: resampling is performed in the frequency
+            domain, ``'polyphase'``: use :py:meth:`resample_polyphase`.
         '''
 
+        if method == 'polyphase':
+            return self.resample_polyphase(deltat)
+
+        elif method != 'fft':
+            raise ValueError('unknown resampling method: %s' % method)
+
         ndata = self.ydata.size
         ntrans = nextpow2(ndata)
         fntrans2 = ntrans * self.deltat/deltat
@@ -673,7 +823,7 @@ class Trace(object):
                 '%g' % (deltat, deltat2))
 
         data = self.ydata
-        data_pad = num.zeros(ntrans, dtype=num.float)
+        data_pad = num.zeros(ntrans, dtype=get_processing_dtype())
         data_pad[:ndata] = data
         fdata = num.fft.rfft(data_pad)
         fdata2 = num.zeros((ntrans2+1)//2, dtype=fdata.dtype)
@@ -683,7 +833,57 @@ class Trace(object):
         data2 = data2[:ndata2]
         data2 *= float(ntrans2) / float(ntrans)
         self.deltat = deltat2
-        self.set_ydata(data2)
+        self.set_ydata(_to_processing_dtype(data2, copy=False))
+
+    def resample_polyphase(self, deltat, snap=False, demean=False):
+        '''
+        Resample to given sampling rate with a polyphase FIR filter.
+
+        The ratio between old and new sampling interval must be
+        (approximately) rational, ``deltat / self.deltat == down / up`` with
+        ``up, down <= 1000``. The anti-aliasing filter is the same as used by
+        :py:func:`scipy.signal.resample_poly`; the filter banks are cached.
+        Only output samples are computed, so the cost does not depend on
+        ``up``.
+
+        :param deltat: new sampling interval
+        :param snap: whether to put the new sampling instances closest to
+            multiples of the sampling rate.
+        :param demean: whether to demean the signal before filtering.
+
+        If the requested ratio is not supported, an exception of type
+        :py:exc:`pyrocko.util.UnavailableDecimation` is raised.
+        '''
+
+        up, down = _rational_ratio(self.deltat, deltat)
+        if up == down:
+            return
+
+        hpoly, delay = _get_cached_polyphase_filter(up, down)
+
+        data = _to_processing_dtype(self.ydata)
+        if demean:
+            data -= num.mean(data)
+
+        if snap:
+            newdeltat = self.deltat * down / up
+            ioffset = int(round(
+                (math.ceil(self.tmin / newdeltat) * newdeltat - self.tmin)
+                / (self.deltat / up)))
+        else:
+            ioffset = 0
+
+        nout = ((data.size-1)*up - ioffset) // down + 1
+        if nout < 1:
+            raise TraceTooShort(
+                'trace too short for resampling: %s' % self.name())
+
+        self.drop_growbuffer()
+        self.tmin += ioffset * self.deltat / up
+        self.deltat = reuse(deltat)
+        self.set_ydata(_to_processing_dtype(
+            _polyphase(data, hpoly, up, down, ioffset + delay, nout),
+            copy=False))
 
     def resample_simple(self, deltat):
         tyear = 3600*24*365.
@@ -797,98 +997,108 @@ class Trace(object):
                 raise AboveNyquist(message)
 
     def lowpass(self, order, corner, nyquist_warn=True,
-                nyquist_exception=False, demean=True):
+                nyquist_exception=False, demean=True, zerophase=False):
 
         '''
         Apply Butterworth lowpass to the trace.
 
         :param order: order of the filter
         :param corner: corner frequency of the filter
+        :param zerophase: apply filter forward and backward (see
+            :py:func:`scipy.signal.sosfiltfilt`), doubling its effective order
 
-        Mean is removed before filtering.
+        Mean is removed before filtering. The filter is applied in
+        second-order sections form.
         '''
 
         self.nyquist_check(
             corner, 'Corner frequency of lowpass', nyquist_warn,
             nyquist_exception)
 
-        (b, a) = _get_cached_filter_coefs(
-            order, [corner*2.0*self.deltat], btype='low')
+        sos = _get_cached_filter_coefs(
+            order, [corner*2.0*self.deltat], btype='low', output='sos')
 
-        if len(a) != order+1 or len(b) != order+1:
-            logger.warning(
-                'Erroneous filter coefficients returned by '
-                'scipy.signal.butter(). You may need to downsample the '
-                'signal before filtering.')
-
-        data = self.ydata.astype(num.float64)
-        if demean:
-            data -= num.mean(data)
-        self.drop_growbuffer()
-        self.ydata = signal.lfilter(b, a, data)
+        self._sosfilter(sos, demean, zerophase)
 
     def highpass(self, order, corner, nyquist_warn=True,
-                 nyquist_exception=False, demean=True):
+                 nyquist_exception=False, demean=True, zerophase=False):
 
         '''
         Apply butterworth highpass to the trace.
 
         :param order: order of the filter
         :param corner: corner frequency of the filter
+        :param zerophase: apply filter forward and backward (see
+            :py:func:`scipy.signal.sosfiltfilt`), doubling its effective order
 
-        Mean is removed before filtering.
+        Mean is removed before filtering. The filter is applied in
+        second-order sections form.
         '''
 
         self.nyquist_check(
             corner, 'Corner frequency of highpass', nyquist_warn,
             nyquist_exception)
 
-        (b, a) = _get_cached_filter_coefs(
-            order, [corner*2.0*self.deltat], btype='high')
+        sos = _get_cached_filter_coefs(
+            order, [corner*2.0*self.deltat], btype='high', output='sos')
 
-        data = self.ydata.astype(num.float64)
-        if len(a) != order+1 or len(b) != order+1:
-            logger.warning(
-                'Erroneous filter coefficients returned by '
-                'scipy.signal.butter(). You may need to downsample the '
-                'signal before filtering.')
-        if demean:
-            data -= num.mean(data)
-        self.drop_growbuffer()
-        self.ydata = signal.lfilter(b, a, data)
+        self._sosfilter(sos, demean, zerophase)
 
-    def bandpass(self, order, corner_hp, corner_lp, demean=True):
+    def bandpass(self, order, corner_hp, corner_lp, demean=True,
+                 zerophase=False):
         '''
         Apply butterworth bandpass to the trace.
 
         :param order: order of the filter
         :param corner_hp: lower corner frequency of the filter
         :param corner_lp: upper corner frequency of the filter
+        :param zerophase: apply filter forward and backward (see
+            :py:func:`scipy.signal.sosfiltfilt`), doubling its effective order
 
-        Mean is removed before filtering.
+        Mean is removed before filtering. The filter is applied in
+        second-order sections form.
         '''
 
         self.nyquist_check(corner_hp, 'Lower corner frequency of bandpass')
         self.nyquist_check(corner_lp, 'Higher corner frequency of bandpass')
-        (b, a) = _get_cached_filter_coefs(
+        sos = _get_cached_filter_coefs(
             order,
             [corner*2.0*self.deltat for corner in (corner_hp, corner_lp)],
-            btype='band')
-        data = self.ydata.astype(num.float64)
+            btype='band', output='sos')
+
+        self._sosfilter(sos, demean, zerophase)
+
+    def _sosfilter(self, sos, demean, zerophase):
+        # the coefficients are kept in double precision, so that the filter
+        # recursion runs in double precision, also when the processing dtype
+        # is float32; only the output is converted
+        data = _to_processing_dtype(self.ydata)
         if demean:
             data -= num.mean(data)
+
+        if zerophase:
+            try:
+                ydata = signal.sosfiltfilt(sos, data)
+            except ValueError:
+                raise TraceTooShort(
+                    'Trace %s.%s.%s.%s too short for zero-phase filtering.'
+                    % self.nslc_id)
+        else:
+            ydata = signal.sosfilt(sos, data)
+
         self.drop_growbuffer()
-        self.ydata = signal.lfilter(b, a, data)
+        self.ydata = _to_processing_dtype(ydata, copy=False)
 
     def abshilbert(self):
         self.drop_growbuffer()
         self.ydata = num.abs(hilbert(self.ydata))
 
-    def envelope(self, inplace=True):
+    def envelope(self, inplace=True, workspace=None):
         '''
         Calculate the envelope of the trace.
 
         :param inplace: calculate envelope in place
+        :param workspace: :py:class:`Workspace` for temporary arrays
 
         The calculation follows:
 
@@ -899,15 +1109,27 @@ class Trace(object):
         where H is the Hilbert-Transform of the signal Y.
         '''
 
+        if workspace is None:
+            ydata = num.sqrt(self.ydata**2 + hilbert(self.ydata)**2)
+        else:
+            ydata = hilbert(self.ydata)
+            ydata **= 2
+            ydata += num.multiply(
+                self.ydata, self.ydata,
+                out=workspace.empty(
+                    'envelope', self.ydata.size,
+                    num.result_type(self.ydata, num.float32)))
+            num.sqrt(ydata, out=ydata)
+
         if inplace:
             self.drop_growbuffer()
-            self.ydata = num.sqrt(self.ydata**2 + hilbert(self.ydata)**2)
+            self.ydata = ydata
         else:
             tr = self.copy(data=False)
-            tr.ydata = num.sqrt(self.ydata**2 + hilbert(self.ydata)**2)
+            tr.ydata = ydata
             return tr
 
-    def taper(self, taperer, inplace=True, chop=False):
+    def taper(self, taperer, inplace=True, chop=False, workspace=None):
         '''
         Apply a :py:class:`Taper` to the trace.
 
@@ -915,13 +1137,18 @@ class Trace(object):
         :param inplace: apply taper inplace
         :param chop: if ``True``: exclude tapered parts from the resulting
             trace
+        :param workspace: :py:class:`Workspace` to take the data array of
+            the new trace from, if ``inplace`` is ``False``
         '''
 
         if not inplace:
-            tr = self.copy()
+            tr = self.copy(workspace=workspace)
         else:
             tr = self
 
+        if not num.issubdtype(tr.ydata.dtype, num.floating):
+            tr.set_ydata(_to_processing_dtype(tr.ydata))
+
         if chop:
             i, n = taperer.span(tr.ydata, tr.tmin, tr.deltat)
             tr.shift(i*tr.deltat)
@@ -1002,7 +1229,7 @@ class Trace(object):
         if td_taper:
             self.taper(td_taper)
 
-        ydata = self.get_ydata().astype(num.float)
+        ydata = _to_processing_dtype(self.get_ydata())
         if demean:
             ydata -= ydata.mean()
 
@@ -1031,15 +1258,15 @@ class Trace(object):
             fd_taper(spec, 0., df)
 
         ydata = num.fft.irfft(spec)
-        self.set_ydata(ydata[:ndata])
+        self.set_ydata(_to_processing_dtype(ydata[:ndata]))
 
     def _get_cached_freqs(self, nf, deltaf):
-        ck = (nf, deltaf)
-        if ck not in Trace.cached_frequencies:
-            Trace.cached_frequencies[ck] = deltaf * num.arange(
-                nf, dtype=num.float)
+        def make():
+            freqs = deltaf * num.arange(nf, dtype=num.float)
+            freqs.setflags(write=False)
+            return freqs
 
-        return Trace.cached_frequencies[ck]
+        return Trace.cached_frequencies.get_or_set((nf, deltaf), make)
 
     def bandpass_fft(self, corner_hp, corner_lp):
         '''
@@ -1048,7 +1275,7 @@ class Trace(object):
 
         n = len(self.ydata)
         n2 = nextpow2(n)
-        data = num.zeros(n2, dtype=num.float64)
+        data = num.zeros(n2, dtype=get_processing_dtype())
         data[:n] = self.ydata
         fdata = num.fft.rfft(data)
         freqs = self._get_cached_freqs(len(fdata), 1./(self.deltat*n2))
@@ -1056,7 +1283,7 @@ class Trace(object):
         fdata *= num.logical_and(corner_hp < freqs, freqs < corner_lp)
         data = num.fft.irfft(fdata)
         self.drop_growbuffer()
-        self.ydata = data[:n]
+        self.ydata = _to_processing_dtype(data[:n])
 
     def shift(self, tshift):
         '''
@@ -1363,7 +1590,8 @@ class Trace(object):
                  freqlimits=None,
                  transfer_function=None,
                  cut_off_fading=True,
-                 invert=False):
+                 invert=False,
+                 workspace=None):
 
         '''
         Return new trace with transfer function applied (convolution).
@@ -1377,6 +1605,8 @@ class Trace(object):
         :param cut_off_fading: whether to cut off rise/fall interval in output
             trace.
         :param invert: set to True to do a deconvolution
+        :param workspace: :py:class:`Workspace` for the padded input and the
+            output data
         '''
 
         if transfer_function is None:
@@ -1394,8 +1624,16 @@ class Trace(object):
             ntrans, freqlimits, transfer_function, invert=invert)
 
         data = self.ydata
-        data_pad = num.zeros(ntrans, dtype=num.float)
-        data_pad[:ndata] = data - data.mean()
+        dtype = get_processing_dtype()
+        if workspace is None:
+            data_pad = num.zeros(ntrans, dtype=dtype)
+            data_pad[:ndata] = data - data.mean()
+        else:
+            workspace = workspace.child('transfer')
+            data_pad = workspace.zeros('pad', ntrans, dtype)
+            data_pad[:ndata] = data
+            data_pad[:ndata] -= data.mean()
+
         if tfade != 0.0:
             data_pad[:ndata] *= costaper(
                 0., tfade, self.deltat*(ndata-1)-tfade, self.deltat*ndata,
@@ -1403,19 +1641,22 @@ class Trace(object):
 
         fdata = num.fft.rfft(data_pad)
         fdata *= coefs
-        ddata = num.fft.irfft(fdata)
-        output = self.copy()
+        ddata = _to_processing_dtype(num.fft.irfft(fdata), copy=False)
+        output = self.copy(data=False)
         output.ydata = ddata[:ndata]
         if cut_off_fading and tfade != 0.0:
             try:
-                output.chop(output.tmin+tfade, output.tmax-tfade, inplace=True)
+                output.chop(output.tmin+tfade, output.tmax-tfade, inplace=True,
+                            workspace=workspace)
             except NoData:
                 raise TraceTooShort(
                     'Trace %s.%s.%s.%s too short for fading length setting. '
                     'trace length = %g, fading length = %g'
                     % (self.nslc_id + (self.tmax-self.tmin, tfade)))
-        else:
+        elif workspace is None:
             output.ydata = output.ydata.copy()
+        else:
+            output.ydata = workspace.copy('chop', output.ydata)
 
         return output
 
@@ -1430,7 +1671,8 @@ class Trace(object):
             do_pre_taper,
             do_fft,
             do_filter,
-            do_ifft)
+            do_ifft,
+            cache=cached_misfit_chain)
 
     def run_chain(self, tmin, tmax, deltat, setup, nocache):
         if setup.domain == 'frequency_domain':
@@ -1461,7 +1703,10 @@ class Trace(object):
                 processed = processed.envelope(inplace=False)
 
             elif setup.domain == 'absolute':
-                processed.set_ydata(num.abs(processed.get_ydata()))
+                # processed may be a cached result, do not modify it
+                ydata = num.abs(processed.get_ydata())
+                processed = processed.copy(data=False)
+                processed.set_ydata(ydata)
 
             return processed.get_ydata(), processed
 
@@ -1476,6 +1721,10 @@ class Trace(object):
 
         If the sampling rates of ``self`` and ``candidate`` differ, the trace
         with the higher sampling rate will be downsampled.
+
+        Intermediate processing results are kept in a shared, size-limited
+        cache (see :py:func:`get_cache_stats`). To compare one trace against
+        many candidates, :py:func:`misfit_many` is more efficient.
         """
 
         a = self
@@ -1580,6 +1829,26 @@ class Trace(object):
     def _get_tapered_coefs(
             self, ntrans, freqlimits, transfer_function, invert=False):
 
+        response_key = _response_key(transfer_function)
+        if response_key is None:
+            return self._make_tapered_coefs(
+                ntrans, freqlimits, transfer_function, invert)
+
+        if freqlimits is not None:
+            freqlimits = tuple(freqlimits)
+
+        def make():
+            coefs = self._make_tapered_coefs(
+                ntrans, freqlimits, transfer_function, invert)
+            coefs.setflags(write=False)
+            return coefs
+
+        return cached_transfer_coefs.get_or_set(
+            (response_key, ntrans, self.deltat, freqlimits, invert), make)
+
+    def _make_tapered_coefs(
+            self, ntrans, freqlimits, transfer_function, invert=False):
+
         deltaf = 1./(self.deltat*ntrans)
         nfreqs = ntrans//2 + 1
         transfer = num.ones(nfreqs, dtype=num.complex)
@@ -1741,6 +2010,359 @@ class ResamplingFailed(Exception):
     pass
 
 
+class TraceTable(object):
+    '''
+    Columnar representation of the headers of many traces.
+
+    Start times, end times, sampling intervals and modification times of the
+    traces are held in NumPy arrays and the network, station, location and
+    channel codes are stored as integer indices into a list of unique code
+    tuples. Operations on the table are vectorised; :py:class:`Trace` objects
+    are only created on demand, with :py:meth:`get_trace`,
+    :py:meth:`iter_traces` or :py:meth:`to_traces`.
+
+    Times are held as 64-bit floats, i.e. sub-microsecond precision of
+    high-precision time values is lost.
+
+    :param codes: list of ``(network, station, location, channel)`` tuples
+    :param icodes: index into ``codes`` for each trace
+    :param tmin: start times
+    :param tmax: end times
+    :param deltat: sampling intervals
+    :param mtime: modification times (default: zeros)
+    :param ydata: optional list with the data sample arrays of the traces
+    '''
+
+    def __init__(
+            self, codes, icodes, tmin, tmax, deltat, mtime=None, ydata=None):
+
+        self.codes = list(codes)
+        self.icodes = num.asarray(icodes, dtype=num.int64)
+        self.tmin = num.asarray(tmin, dtype=num.float64)
+        self.tmax = num.asarray(tmax, dtype=num.float64)
+        self.deltat = num.asarray(deltat, dtype=num.float64)
+        if mtime is None:
+            mtime = num.zeros(self.icodes.size)
+
+        self.mtime = num.asarray(mtime, dtype=num.float64)
+        self.ydata = ydata
+
+        assert all(
+            a.shape == self.icodes.shape
+            for a in (self.tmin, self.tmax, self.deltat, self.mtime))
+
+        assert ydata is None or len(ydata) == self.icodes.size
+
+    @classmethod
+    def from_traces(cls, traces):
+        '''
+        Create table from :py:class:`Trace` objects.
+
+        The data samples are included if all traces have data.
+        '''
+
+        traces = list(traces)
+        n = len(traces)
+        code_index = {}
+        icodes = num.empty(n, dtype=num.int64)
+        for i, tr in enumerate(traces):
+            icodes[i] = code_index.setdefault(tr.nslc_id, len(code_index))
+
+        codes = sorted(code_index, key=code_index.__getitem__)
+
+        def column(attr):
+            return num.fromiter(
+                (float(getattr(tr, attr)) for tr in traces),
+                dtype=num.float64, count=n)
+
+        ydata = None
+        if n and all(tr.ydata is not None for tr in traces):
+            ydata = [tr.ydata for tr in traces]
+
+        return cls(
+            codes, icodes,
+            column('tmin'), column('tmax'), column('deltat'),
+            num.fromiter(
+                (tr.mtime or 0.0 for tr in traces),
+                dtype=num.float64, count=n),
+            ydata)
+
+    @classmethod
+    def concatenate(cls, tables):
+        '''
+        Combine several tables into one.
+        '''
+
+        code_index = {}
+        icodes = []
+        for table in tables:
+            mapping = num.array(
+                [code_index.setdefault(nslc, len(code_index))
+                 for nslc in table.codes], dtype=num.int64)
+
+            icodes.append(mapping[table.icodes])
+
+        codes = sorted(code_index, key=code_index.__getitem__)
+
+        ydata = None
+        if tables and all(table.ydata is not None for table in tables):
+            ydata = []
+            for table in tables:
+                ydata.extend(table.ydata)
+
+        def cat(arrays):
+            if arrays:
+                return num.concatenate(arrays)
+            else:
+                return num.zeros(0)
+
+        return cls(
+            codes,
+            cat(icodes),
+            cat([table.tmin for table in tables]),
+            cat([table.tmax for table in tables]),
+            cat([table.deltat for table in tables]),
+            cat([table.mtime for table in tables]),
+            ydata)
+
+    def __len__(self):
+        return self.icodes.size
+
+    def __str__(self):
+        s = 'TraceTable\n'
+        s += '  number of traces: %i\n' % len(self)
+        s += '  number of channels: %i\n' % num.unique(self.icodes).size
+        if len(self):
+            s += '  timerange: %s - %s\n' % (
+                util.time_to_str(self.tmin.min()),
+                util.time_to_str(self.tmax.max()))
+
+        return s
+
+    def get_nslc_id(self, i):
+        return self.codes[self.icodes[i]]
+
+    def get_trace(self, i):
+        '''
+        Create :py:class:`Trace` object for row ``i`` of the table.
+        '''
+
+        ydata = None
+        if self.ydata is not None:
+            ydata = self.ydata[i]
+
+        return Trace(
+            *self.codes[self.icodes[i]],
+            tmin=self.tmin[i],
+            tmax=self.tmax[i],
+            deltat=self.deltat[i],
+            ydata=ydata,
+            mtime=self.mtime[i])
+
+    def iter_traces(self):
+        for i in range(len(self)):
+            yield self.get_trace(i)
+
+    def to_traces(self):
+        return list(self.iter_traces())
+
+    def take(self, indices):
+        '''
+        Get new table with the given rows.
+
+        :param indices: integer indices or boolean mask
+        '''
+
+        indices = num.asarray(indices)
+        if indices.dtype == num.bool_:
+            indices = num.nonzero(indices)[0]
+
+        indices = indices.astype(num.int64)
+
+        ydata = None
+        if self.ydata is not None:
+            ydata = [self.ydata[i] for i in indices]
+
+        return TraceTable(
+            self.codes,
+            self.icodes[indices],
+            self.tmin[indices],
+            self.tmax[indices],
+            self.deltat[indices],
+            self.mtime[indices],
+            ydata)
+
+    def _code_ranks(self):
+        order = sorted(range(len(self.codes)), key=self.codes.__getitem__)
+        ranks = num.empty(len(self.codes), dtype=num.int64)
+        ranks[order] = num.arange(len(self.codes))
+        return ranks
+
+    def argsort(self):
+        '''
+        Get indices which sort the table like :py:attr:`Trace.full_id`.
+        '''
+
+        return num.lexsort((self.tmin, self._code_ranks()[self.icodes]))
+
+    def sorted(self):
+        '''
+        Get copy of the table sorted like :py:attr:`Trace.full_id`.
+        '''
+
+        return self.take(self.argsort())
+
+    def select(self, tmin=None, tmax=None, codes=None):
+        '''
+        Get table with the traces matching given constraints.
+
+        :param tmin: start time of query interval or ``None``
+        :param tmax: end time of query interval or ``None``
+        :param codes: pattern or list of patterns to be matched against
+            network-station-location-channel codes (see
+            :py:func:`pyrocko.util.match_nslc`)
+
+        The time span test is the same as in :py:meth:`Trace.is_relevant`.
+        '''
+
+        mask = num.ones(len(self), dtype=num.bool_)
+        if tmin is not None:
+            mask &= self.tmax >= tmin
+
+        if tmax is not None:
+            mask &= self.tmin < tmax
+
+        if codes is not None:
+            code_mask = num.array(
+                [util.match_nslc(codes, nslc) for nslc in self.codes],
+                dtype=num.bool_)
+
+            mask &= code_mask[self.icodes]
+
+        return self.take(mask)
+
+    def minmaxtime(self):
+        '''
+        Get time range for each combination of codes.
+
+        :returns: dict with ``(network, station, location, channel)`` tuples
+            as keys and ``(tmin, tmax)`` tuples as values
+        '''
+
+        ncodes = len(self.codes)
+        tmins = num.full(ncodes, num.inf)
+        tmaxs = num.full(ncodes, -num.inf)
+        num.minimum.at(tmins, self.icodes, self.tmin)
+        num.maximum.at(tmaxs, self.icodes, self.tmax)
+
+        return dict(
+            (self.codes[i], (tmins[i], tmaxs[i]))
+            for i in num.unique(self.icodes))
+
+    def degap(
+            self, maxgap=5, fillmethod='interpolate', deoverlap='use_second',
+            maxlap=None):
+
+        '''
+        Connect adjacent traces with matching codes and sampling interval.
+
+        Follows the rules of :py:func:`degapper` and returns a new, sorted
+        table. For tables without data samples, the connection of traces is
+        computed in vectorised form, otherwise :py:func:`degapper` is used.
+        See :py:func:`degapper` for a description of the arguments.
+        '''
+
+        if self.ydata is not None:
+            return TraceTable.from_traces(degapper(
+                self.sorted().to_traces(), maxgap=maxgap,
+                fillmethod=fillmethod, deoverlap=deoverlap, maxlap=maxlap))
+
+        n = len(self)
+        order = num.lexsort(
+            (self.tmin, self.deltat, self._code_ranks()[self.icodes]))
+
+        icodes = self.icodes[order]
+        tmin = self.tmin[order]
+        tmax = self.tmax[order]
+        deltat = self.deltat[order]
+        mtime = self.mtime[order]
+
+        new_group = num.ones(n, dtype=num.bool_)
+        new_group[1:] = num.logical_or(
+            icodes[1:] != icodes[:-1], deltat[1:] != deltat[:-1])
+
+        igroup_begins = num.nonzero(new_group)[0]
+        igroup_ends = num.append(igroup_begins[1:], n)
+
+        keep = num.zeros(n, dtype=num.bool_)
+        tmax_out = tmax.copy()
+        mtime_out = mtime.copy()
+        for ia, ib in zip(igroup_begins, igroup_ends):
+            ibegins, tmaxs = _degap_spans(
+                tmin[ia:ib], tmax[ia:ib], deltat[ia], maxgap, maxlap)
+
+            keep[ia+ibegins] = True
+            tmax_out[ia+ibegins] = tmaxs
+            mtime_out[ia+ibegins] = num.maximum.reduceat(
+                mtime[ia:ib], ibegins)
+
+        return TraceTable(
+            self.codes,
+            icodes[keep],
+            tmin[keep],
+            tmax_out[keep],
+            deltat[keep],
+            mtime_out[keep])
+
+
+def _degap_join(dist, idist, maxgap, maxlap):
+    # connection rules of degapper(), vectorised
+    misaligned = num.logical_and(num.abs(dist - idist) > 0.05, idist <= maxgap)
+    overlap_ok = idist <= 0
+    if maxlap is not None:
+        overlap_ok = num.logical_and(overlap_ok, -maxlap < idist)
+
+    return num.logical_and(
+        ~misaligned,
+        num.logical_or(
+            num.logical_and(1 <= idist, idist <= max(1, maxgap)),
+            overlap_ok))
+
+
+def _degap_spans(tmin, tmax, deltat, maxgap, maxlap):
+    '''
+    Get indices of the first traces of the connected spans and the span end
+    times, for traces of a single channel sorted by tmin.
+    '''
+
+    tmax_run = num.maximum.accumulate(tmax)
+    dist = (tmin[1:] - tmax_run[:-1]) / deltat
+    idist = num.round(dist)
+    join = _degap_join(dist, idist, maxgap, maxlap)
+
+    ibreaks = num.nonzero(~join)[0]
+    if num.all(tmin[ibreaks+1] > tmax_run[ibreaks]):
+        # no trace starting a new span overlaps with the previous ones, so the
+        # running maximum of tmax is the end time of the current span
+        ibegins = num.concatenate(([0], ibreaks+1))
+        iends = num.append(ibegins[1:], tmin.size) - 1
+        return ibegins, tmax_run[iends]
+
+    # the result depends on the sequence of connections, fall back to
+    # connecting traces one by one
+    ibegins = [0]
+    tmaxs = [tmax[0]]
+    for i in range(1, tmin.size):
+        dist = (tmin[i] - tmaxs[-1]) / deltat
+        if _degap_join(dist, num.round(dist), maxgap, maxlap):
+            tmaxs[-1] = max(tmaxs[-1], tmax[i])
+        else:
+            ibegins.append(i)
+            tmaxs.append(tmax[i])
+
+    return num.array(ibegins, dtype=num.int64), num.array(tmaxs)
+
+
 def minmax(traces, key=None, mode='minmax'):
 
     '''
@@ -1803,8 +2425,17 @@ def minmaxtime(traces, key=None):
         used.
 
     :returns: a dict with the combined data ranges.
+
+    If ``traces`` is a :py:class:`TraceTable` and no ``key`` is given, the
+    ranges are computed in vectorised form.
     '''
 
+    if isinstance(traces, TraceTable):
+        if key is None:
+            return traces.minmaxtime()
+
+        traces = traces.iter_traces()
+
     if key is None:
         key = _default_key
 
@@ -1845,7 +2476,216 @@ def degapper(
     :param maxlap:      maximum number of samples of overlap which are removed
 
     :returns:           list of traces
+
+    If ``traces`` is a :py:class:`TraceTable`, a degapped
+    :py:class:`TraceTable` is returned (see :py:meth:`TraceTable.degap`).
+    '''
+
+    if isinstance(traces, TraceTable):
+        return traces.degap(
+            maxgap=maxgap, fillmethod=fillmethod, deoverlap=deoverlap,
+            maxlap=maxlap)
+
+    in_traces = traces
+    out_traces = []
+    if not in_traces:
+        return out_traces
+
+    virtual = in_traces[0].ydata is None
+    assert all((tr.ydata is None) == virtual for tr in in_traces), \
+        'traces given to degapper() must either all have data or have ' \
+        'no data.'
+
+    def run_key(tr):
+        return (tr.nslc_id, tr.deltat, None if virtual else tr.ydata.dtype)
+
+    # Split into runs of consecutive traces which may be connected. Empty
+    # traces are dropped, except for a leading one, which is kept as is.
+    runs = []
+    for itr, tr in enumerate(in_traces):
+        if tr.data_len() < 1:
+            if itr == 0:
+                out_traces.append(tr)
+
+            continue
+
+        if not runs or run_key(runs[-1][0]) != run_key(tr):
+            runs.append([])
+
+        runs[-1].append(tr)
+
+    # input list is consumed, as in previous versions
+    del in_traces[:]
+
+    for run in runs:
+        out_run = _degap_run(
+            run, maxgap, fillmethod, deoverlap, maxlap, virtual)
+
+        if out_run is None:
+            # connection of traces depends on the sequence of the
+            # operations, fall back to connecting traces one by one
+            out_run = _degapper_pairwise(
+                run, maxgap, fillmethod, deoverlap, maxlap)
+
+        out_traces.extend(out_run)
+
+    for tr in out_traces:
+        tr._update_ids()
+
+    return out_traces
+
+
+def _grouped_cummax(values, ibegins):
+    # running maximum, restarting at given indices
+    cummax = num.maximum.accumulate(values)
+    if num.all(values[ibegins[1:]] >= cummax[ibegins[1:]-1]):
+        return cummax
+
+    iends = num.append(ibegins[1:], values.size)
+    for ib, ie in zip(ibegins, iends):
+        cummax[ib:ie] = num.maximum.accumulate(values[ib:ie])
+
+    return cummax
+
+
+def _degap_run(traces, maxgap, fillmethod, deoverlap, maxlap, virtual):
     '''
+    Connect traces with matching codes, sampling interval and dtype.
+
+    The connections are determined for all traces at once. Returns ``None``
+    if the result cannot be determined this way.
+    '''
+
+    ntraces = len(traces)
+    if ntraces == 1:
+        return traces
+
+    deltat = traces[0].deltat
+    tmin = num.array([tr.tmin for tr in traces])
+    tmax = num.array([tr.tmax for tr in traces])
+    nsamples = num.array([tr.data_len() for tr in traces], dtype=num.int64)
+
+    # Find segmentation into connected spans by fixed-point iteration,
+    # starting with a single span. Traces are placed on the sampling grid of
+    # the first trace of their span.
+    new_span = num.zeros(ntraces, dtype=num.bool_)
+    new_span[0] = True
+    for iteration in range(5):
+        ispan = num.cumsum(new_span) - 1
+        ibegins = num.nonzero(new_span)[0]
+        tref = tmin[ibegins[ispan]]
+
+        ioffset = num.round((tmin - tref) / deltat).astype(num.int64)
+        nlen = ioffset + nsamples
+        nlen_max = nlen.max() + 1
+        nlen_run = num.maximum.accumulate(nlen + ispan * nlen_max) \
+            - ispan * nlen_max
+
+        tmax_run = _grouped_cummax(tmax, ibegins)
+
+        # relation of each trace to the span of its predecessor
+        x = (tmin[1:] - tref[:-1]) / deltat
+        ioffset_b = num.round(x)
+        idist = ioffset_b - (nlen_run[:-1] - 1)
+        join = _degap_join(idist + (x - ioffset_b), idist, maxgap, maxlap)
+
+        new_span_updated = num.concatenate(([True], ~join))
+        if num.all(new_span_updated == new_span):
+            break
+
+        new_span = new_span_updated
+
+    else:
+        return None
+
+    extend = tmax[1:] > tmax_run[:-1]
+    consistent = num.logical_and(
+        ioffset_b >= 0,
+        extend == (ioffset_b + nsamples[1:] > nlen_run[:-1]))
+
+    if not num.all(consistent[join]):
+        return None
+
+    use = num.concatenate(([False], num.logical_and(join, extend)))
+
+    out_traces = []
+    iends = num.append(ibegins[1:], ntraces)
+    for ib, ie in zip(ibegins, iends):
+        a = traces[ib]
+        iuse = ib + 1 + num.nonzero(use[ib+1:ie])[0]
+        if iuse.size == 0:
+            out_traces.append(a)
+            continue
+
+        if not virtual:
+            ydata = num.empty(nlen_run[ie-1], dtype=a.ydata.dtype)
+            ydata[:a.ydata.size] = a.ydata
+            n = a.ydata.size
+            for i in iuse:
+                _degap_place(
+                    ydata, n, traces[i].ydata, ioffset[i], fillmethod,
+                    deoverlap)
+
+                n = ioffset[i] + nsamples[i]
+
+            a.ydata = ydata
+
+        for i in iuse:
+            b = traces[i]
+            a.tmax = b.tmax
+            if a.mtime and b.mtime:
+                a.mtime = max(a.mtime, b.mtime)
+
+        out_traces.append(a)
+
+    return out_traces
+
+
+def _degap_place(ydata, n, ydata_b, ioffset, fillmethod, deoverlap):
+    # insert samples of a trace into the preallocated output of degapper,
+    # where the first n samples are already filled
+    nb = ydata_b.size
+    if ioffset >= n:
+        ngap = ioffset - n
+        if ngap > 0:
+            if fillmethod == 'interpolate':
+                ydata[n:ioffset] = ydata[n-1] + (
+                    ((1.0 + num.arange(ngap, dtype=num.float)) / (ngap + 1))
+                    * (ydata_b[0] - ydata[n-1])).astype(ydata.dtype)
+
+            elif fillmethod == 'zeros':
+                ydata[n:ioffset] = 0
+
+            else:
+                assert False, 'unknown fillmethod'
+
+        ydata[ioffset:ioffset+nb] = ydata_b
+
+    else:
+        nlap = n - ioffset
+        if deoverlap == 'use_second':
+            ydata[ioffset:ioffset+nb] = ydata_b
+        elif deoverlap in ('use_first', 'crossfade_cos'):
+            ydata[n:ioffset+nb] = ydata_b[nlap:]
+        elif deoverlap == 'add':
+            ydata[ioffset:n] += ydata_b[:nlap]
+            ydata[n:ioffset+nb] = ydata_b[nlap:]
+        else:
+            assert False, 'unknown deoverlap method'
+
+        if deoverlap == 'crossfade_cos':
+            taper = 0.5-0.5*num.cos(
+                (1.+num.arange(nlap))/(1.+nlap)*num.pi)
+            ydata[n-nlap:n] *= 1.-taper
+            ydata[n-nlap:n] += ydata_b[:nlap] * taper
+
+
+def _degapper_pairwise(
+        traces,
+        maxgap=5,
+        fillmethod='interpolate',
+        deoverlap='use_second',
+        maxlap=None):
 
     in_traces = traces
     out_traces = []
@@ -1883,7 +2723,7 @@ def degapper(
                                  / idist) * (b.ydata[0]-a.ydata[-1])
                             ).astype(a.ydata.dtype)
                         elif fillmethod == 'zeros':
-                            filler = num.zeros(idist-1, dtype=a.ydist.dtype)
+                            filler = num.zeros(idist-1, dtype=a.ydata.dtype)
                         a.ydata = num.concatenate((a.ydata, filler, b.ydata))
                     a.tmax = b.tmax
                     if a.mtime and b.mtime:
@@ -1955,37 +2795,11 @@ def rotate(traces, azimuth, in_channels, out_channels):
     phi = azimuth/180.*math.pi
     cphi = math.cos(phi)
     sphi = math.sin(phi)
-    rotated = []
+    matrix = num.array([[cphi, sphi], [-sphi, cphi]])
     in_channels = tuple(_channels_to_names(in_channels))
     out_channels = tuple(_channels_to_names(out_channels))
-    for a in traces:
-        for b in traces:
-            if ((a.channel, b.channel) == in_channels and
-                    a.nslc_id[:3] == b.nslc_id[:3] and
-                    abs(a.deltat-b.deltat) < a.deltat*0.001):
-                tmin = max(a.tmin, b.tmin)
-                tmax = min(a.tmax, b.tmax)
-
-                if tmin < tmax:
-                    ac = a.chop(tmin, tmax, inplace=False, include_last=True)
-                    bc = b.chop(tmin, tmax, inplace=False, include_last=True)
-                    if abs(ac.tmin - bc.tmin) > ac.deltat*0.01:
-                        logger.warning(
-                            'Cannot rotate traces with displaced sampling '
-                            '(%s, %s, %s, %s)' % a.nslc_id)
-                        continue
-
-                    acydata = ac.get_ydata()*cphi+bc.get_ydata()*sphi
-                    bcydata = -ac.get_ydata()*sphi+bc.get_ydata()*cphi
-                    ac.set_ydata(acydata)
-                    bc.set_ydata(bcydata)
-
-                    ac.set_codes(channel=out_channels[0])
-                    bc.set_codes(channel=out_channels[1])
-                    rotated.append(ac)
-                    rotated.append(bc)
-
-    return rotated
+    return _project_stacked(
+        traces, matrix, in_channels, out_channels, operation='rotate')
 
 
 def rotate_to_rt(n, e, source, receiver, out_channels=('R', 'T')):
@@ -2114,18 +2928,15 @@ def project(traces, matrix, in_channels, out_channels):
     # fallback to full matrix if some are not quadratic
     for iins, iouts, submatrix in systems:
         if submatrix.shape[0] != submatrix.shape[1]:
-            return _project3(traces, matrix, in_channels, out_channels)
+            return _project_stacked(
+                traces, num.asarray(matrix), in_channels, out_channels)
 
     projected = []
     for iins, iouts, submatrix in systems:
         in_cha = tuple([in_channels[iin] for iin in iins])
         out_cha = tuple([out_channels[iout] for iout in iouts])
-        if submatrix.shape[0] == 1:
-            projected.extend(_project1(traces, submatrix, in_cha, out_cha))
-        elif submatrix.shape[1] == 2:
-            projected.extend(_project2(traces, submatrix, in_cha, out_cha))
-        else:
-            projected.extend(_project3(traces, submatrix, in_cha, out_cha))
+        projected.extend(
+            _project_stacked(traces, submatrix, in_cha, out_cha))
 
     return projected
 
@@ -2162,119 +2973,94 @@ def project_dependencies(matrix, in_channels, out_channels):
     return deps
 
 
-def _project1(traces, matrix, in_channels, out_channels):
-    assert len(in_channels) == 1
-    assert len(out_channels) == 1
-    assert matrix.shape == (1, 1)
-
-    projected = []
-    for a in traces:
-        if not (a.channel,) == in_channels:
-            continue
+def _project_stacked(
+        traces, matrix, in_channels, out_channels, operation='project'):
 
-        ac = a.copy()
-        ac.set_ydata(matrix[0, 0]*a.get_ydata())
-        ac.set_codes(channel=out_channels[0])
-        projected.append(ac)
+    '''
+    Apply matrix to all matching combinations of traces.
+
+    Traces are grouped by station, so that matching combinations of input
+    channels are found without testing all combinations of traces. The
+    overlapping parts of the traces of each combination are written into one
+    array of shape ``(ncombinations, nin, nsamples)`` per distinct time span
+    and the transform is applied to it with a single matrix product. The
+    output traces hold views into the result array.
+    '''
 
-    return projected
+    nin = len(in_channels)
+    nout = len(out_channels)
+    assert matrix.shape == (nout, nin)
 
+    by_station = defaultdict(lambda: [[] for _ in range(nin)])
+    for tr in traces:
+        for iin, channel in enumerate(in_channels):
+            if tr.channel == channel:
+                by_station[tr.nslc_id[:3]][iin].append(tr)
 
-def _project2(traces, matrix, in_channels, out_channels):
-    assert len(in_channels) == 2
-    assert len(out_channels) == 2
-    assert matrix.shape == (2, 2)
-    projected = []
+    groups = OrderedDict()
     for a in traces:
-        for b in traces:
-            if not ((a.channel, b.channel) == in_channels and
-                    a.nslc_id[:3] == b.nslc_id[:3] and
-                    abs(a.deltat-b.deltat) < a.deltat*0.001):
+        if a.channel != in_channels[0]:
+            continue
+
+        for others in product(*by_station[a.nslc_id[:3]][1:]):
+            combination = (a,) + others
+            if not all(
+                    abs(x.deltat-y.deltat) < x.deltat*0.001
+                    for (x, y) in zip(combination[:-1], combination[1:])):
                 continue
 
-            tmin = max(a.tmin, b.tmin)
-            tmax = min(a.tmax, b.tmax)
+            tmin = max(tr.tmin for tr in combination)
+            tmax = min(tr.tmax for tr in combination)
 
             if tmin > tmax:
                 continue
 
-            ac = a.chop(tmin, tmax, inplace=False, include_last=True)
-            bc = b.chop(tmin, tmax, inplace=False, include_last=True)
-            if abs(ac.tmin - bc.tmin) > ac.deltat*0.01:
-                logger.warning(
-                    'Cannot project traces with displaced sampling '
-                    '(%s, %s, %s, %s)' % a.nslc_id)
-                continue
+            ibegs = []
+            nsamples = None
+            for tr in combination:
+                ibeg = max(0, t2ind(tmin-tr.tmin, tr.deltat, round))
+                iend = min(
+                    tr.data_len(), t2ind(tmax-tr.tmin, tr.deltat, round)+1)
 
-            acydata = num.dot(matrix[0], (ac.get_ydata(), bc.get_ydata()))
-            bcydata = num.dot(matrix[1], (ac.get_ydata(), bc.get_ydata()))
+                ibegs.append(ibeg)
+                nsamples = iend - ibeg if nsamples is None \
+                    else min(nsamples, iend - ibeg)
 
-            ac.set_ydata(acydata)
-            bc.set_ydata(bcydata)
+            tmins = [tr.tmin + ibeg*tr.deltat
+                     for (tr, ibeg) in zip(combination, ibegs)]
 
-            ac.set_codes(channel=out_channels[0])
-            bc.set_codes(channel=out_channels[1])
-
-            projected.append(ac)
-            projected.append(bc)
-
-    return projected
+            if any(abs(tmins[0] - t) > a.deltat*0.01 for t in tmins[1:]):
+                logger.warning(
+                    'Cannot %s traces with displaced sampling '
+                    '(%s, %s, %s, %s)' % ((operation,) + a.nslc_id))
+                continue
 
+            groups.setdefault((a.deltat, tmins[0], nsamples), []).append(
+                (combination, ibegs, tmins))
 
-def _project3(traces, matrix, in_channels, out_channels):
-    assert len(in_channels) == 3
-    assert len(out_channels) == 3
-    assert matrix.shape == (3, 3)
     projected = []
-    for a in traces:
-        for b in traces:
-            for c in traces:
-                if not ((a.channel, b.channel, c.channel) == in_channels
-                        and a.nslc_id[:3] == b.nslc_id[:3]
-                        and b.nslc_id[:3] == c.nslc_id[:3]
-                        and abs(a.deltat-b.deltat) < a.deltat*0.001
-                        and abs(b.deltat-c.deltat) < b.deltat*0.001):
-
-                    continue
+    for (_, _, nsamples), members in groups.items():
 
-                tmin = max(a.tmin, b.tmin, c.tmin)
-                tmax = min(a.tmax, b.tmax, c.tmax)
+        stack = num.empty(
+            (len(members), nin, nsamples),
+            dtype=num.result_type(*[
+                tr.ydata.dtype for (combination, _, _) in members
+                for tr in combination]))
 
-                if tmin >= tmax:
-                    continue
-
-                ac = a.chop(tmin, tmax, inplace=False, include_last=True)
-                bc = b.chop(tmin, tmax, inplace=False, include_last=True)
-                cc = c.chop(tmin, tmax, inplace=False, include_last=True)
-                if (abs(ac.tmin - bc.tmin) > ac.deltat*0.01
-                        or abs(bc.tmin - cc.tmin) > bc.deltat*0.01):
-
-                    logger.warning(
-                        'Cannot project traces with displaced sampling '
-                        '(%s, %s, %s, %s)' % a.nslc_id)
-                    continue
+        for imember, (combination, ibegs, _) in enumerate(members):
+            for iin, (tr, ibeg) in enumerate(zip(combination, ibegs)):
+                stack[imember, iin, :] = tr.ydata[ibeg:ibeg+nsamples]
 
-                acydata = num.dot(
-                    matrix[0],
-                    (ac.get_ydata(), bc.get_ydata(), cc.get_ydata()))
-                bcydata = num.dot(
-                    matrix[1],
-                    (ac.get_ydata(), bc.get_ydata(), cc.get_ydata()))
-                ccydata = num.dot(
-                    matrix[2],
-                    (ac.get_ydata(), bc.get_ydata(), cc.get_ydata()))
+        result = num.matmul(matrix, stack)
 
-                ac.set_ydata(acydata)
-                bc.set_ydata(bcydata)
-                cc.set_ydata(ccydata)
-
-                ac.set_codes(channel=out_channels[0])
-                bc.set_codes(channel=out_channels[1])
-                cc.set_codes(channel=out_channels[2])
-
-                projected.append(ac)
-                projected.append(bc)
-                projected.append(cc)
+        for imember, (combination, _, tmins) in enumerate(members):
+            for iout in range(nout):
+                iin = iout if iout < nin else 0
+                tr = combination[iin].copy(data=False)
+                tr.tmin = tmins[iin]
+                tr.set_ydata(result[imember, iout])
+                tr.set_codes(channel=out_channels[iout])
+                projected.append(tr)
 
     return projected
 
@@ -2356,6 +3142,151 @@ def correlate(a, b, mode='valid', normalization=None, use_fft=False):
     return c
 
 
+def correlate_normalized_many(ytemplates, ydata, nbytes_max=64*1024**2):
+    '''
+    Normalized cross correlation of several templates with a data array.
+
+    :param ytemplates: 2D array with one template per row, all templates
+        have the same length ``m``
+    :param ydata: 1D data array of length ``n >= m``
+    :param nbytes_max: limit for the size of the intermediate spectra,
+        templates are processed in chunks to meet it
+    :returns: 2D array of shape ``(ntemplates, n-m+1)``, element ``[i, k]``
+        is the correlation coefficient between template ``i`` and
+        ``ydata[k:k+m]``
+
+    The correlation coefficients are computed as in 'valid' mode of
+    :py:func:`correlate` with 'gliding' normalization, but both the
+    templates and the sliding data windows are demeaned (Pearson correlation
+    coefficient). The spectrum of the data is computed once and shared by
+    all templates. Sums over the sliding windows are computed with
+    :py:func:`moving_sum`. Coefficients of data windows with (numerically)
+    zero variance are set to zero.
+    '''
+
+    ytemplates = num.atleast_2d(num.asarray(ytemplates, dtype=num.float))
+    ydata = num.asarray(ydata, dtype=num.float)
+    ntemplates, m = ytemplates.shape
+    n = ydata.size
+    if n < m:
+        return num.zeros((ntemplates, 0))
+
+    ydata = ydata - num.mean(ydata)
+    ytemplates = ytemplates - num.mean(ytemplates, axis=1)[:, num.newaxis]
+    templates_norm = num.sqrt(num.sum(ytemplates**2, axis=1))
+
+    s1 = moving_sum(ydata, m, mode='valid')
+    s2 = moving_sum(ydata**2, m, mode='valid')
+    data_var = s2 - s1**2 / m
+    data_var_min = num.sum(ydata**2) / n * m * 1e-12
+    data_norm = num.sqrt(num.maximum(data_var, 0.0))
+
+    ntrans = nextpow2(n + m - 1)
+    fdata = num.fft.rfft(ydata, ntrans)
+
+    result = num.zeros((ntemplates, n-m+1))
+    nchunk = max(1, int(nbytes_max // (fdata.nbytes * 2)))
+    for ichunk in range(0, ntemplates, nchunk):
+        ytemp = ytemplates[ichunk:ichunk+nchunk, ::-1]
+        fcorr = num.fft.rfft(ytemp, ntrans, axis=1)
+        fcorr *= fdata[num.newaxis, :]
+        result[ichunk:ichunk+nchunk, :] = num.fft.irfft(
+            fcorr, ntrans, axis=1)[:, m-1:n]
+
+    denom = templates_norm[:, num.newaxis] * data_norm[num.newaxis, :]
+    mask = num.logical_and(
+        data_var[num.newaxis, :] > data_var_min,
+        templates_norm[:, num.newaxis] > 0.0)
+
+    result[mask] /= denom[mask]
+    result[~mask] = 0.0
+    return result
+
+
+def match_templates(templates, traces, nbytes_max=64*1024**2):
+    '''
+    Multi-channel template matching.
+
+    :param templates: list of templates, each given as a list of
+        :py:class:`Trace` objects (one per channel)
+    :param traces: list of :py:class:`Trace` objects with continuous data
+        (at most one per channel)
+    :param nbytes_max: passed to :py:func:`correlate_normalized_many`
+    :returns: list with one :py:class:`Trace` (or ``None``, if none of its
+        channels is available in ``traces``) per template, containing the
+        average of the normalized cross correlation over the template's
+        channels
+
+    The reference time of a template is the earliest start time of its
+    traces. Relative time shifts between the channels of a template (e.g.
+    moveouts) are preserved: the value of the output trace at time ``t`` is
+    the mean correlation coefficient obtained when the template is placed
+    with its reference time at ``t``. The output covers the time span for
+    which all available channels contribute.
+
+    All template traces of one channel, which have the same length, are
+    correlated in one batch by :py:func:`correlate_normalized_many`.
+    '''
+
+    by_nslc = {}
+    for tr in traces:
+        if tr.nslc_id in by_nslc:
+            raise ValueError(
+                'match_templates: multiple traces for channel %s'
+                % '.'.join(tr.nslc_id))
+
+        by_nslc[tr.nslc_id] = tr
+
+    trefs = [min(tr.tmin for tr in template) for template in templates]
+
+    batches = defaultdict(list)
+    for itemplate, template in enumerate(templates):
+        for ttr in template:
+            if ttr.nslc_id in by_nslc:
+                assert_same_sampling_rate(ttr, by_nslc[ttr.nslc_id])
+                batches[ttr.nslc_id, ttr.data_len()].append((itemplate, ttr))
+
+    # correlation functions per template: list of (torigin_first, ydata)
+    ccs = defaultdict(list)
+    for (nslc_id, m), items in batches.items():
+        tr = by_nslc[nslc_id]
+        yccs = correlate_normalized_many(
+            num.vstack([ttr.ydata for (_, ttr) in items]), tr.ydata,
+            nbytes_max=nbytes_max)
+
+        for (itemplate, ttr), ycc in zip(items, yccs):
+            if ycc.size != 0:
+                ccs[itemplate].append(
+                    (tr.tmin - (ttr.tmin - trefs[itemplate]), ycc))
+
+    out = []
+    for itemplate, template in enumerate(templates):
+        if not ccs[itemplate]:
+            out.append(None)
+            continue
+
+        deltat = template[0].deltat
+        tmin = max(t for (t, _) in ccs[itemplate])
+        ioffs = [int(round((tmin - t) / deltat)) for (t, _) in ccs[itemplate]]
+        nsamples = min(
+            ycc.size - ioff for (ioff, (_, ycc)) in zip(ioffs, ccs[itemplate]))
+
+        if nsamples <= 0:
+            out.append(None)
+            continue
+
+        ystack = num.zeros(nsamples)
+        for ioff, (_, ycc) in zip(ioffs, ccs[itemplate]):
+            ystack += ycc[ioff:ioff+nsamples]
+
+        ystack /= len(ccs[itemplate])
+        out.append(Trace(
+            station='T%i' % itemplate, channel='CC',
+            tmin=tmin, deltat=deltat, ydata=ystack))
+
+    return out
+
+
 def deconvolve(
         a, b, waterlevel,
         tshift=0.,
@@ -2397,6 +3328,165 @@ def deconvolve(
     return c
 
 
+def _response_fingerprint(val):
+    if isinstance(val, Object):
+        fp = [val.__class__]
+        for name, v in val.T.inamevals(val):
+            fp.append(_response_fingerprint(v))
+            if name == 'respfile' and v is not None:
+                # coefficients of file based responses depend on the file
+                fp.append(os.stat(v).st_mtime)
+
+        return tuple(fp)
+
+    elif isinstance(val, (list, tuple)):
+        return tuple(_response_fingerprint(v) for v in val)
+
+    elif isinstance(val, num.ndarray):
+        return val.dtype.str, val.shape, \
+            hashlib.sha1(num.ascontiguousarray(val).data).digest()
+
+    else:
+        hash(val)
+        return val
+
+
+def _response_key(response):
+    # responses with identical content share their coefficients; the key is
+    # built from the property values of the response, which is much cheaper
+    # than serializing it; objects with unhashable content or missing
+    # response files are not cached
+    if not isinstance(response, Object):
+        return None
+
+    try:
+        return _response_fingerprint(response)
+    except (TypeError, OSError):
+        return None
+
+
+def transfer_many(
+        traces,
+        transfer_functions=None,
+        tfade=0.,
+        freqlimits=None,
+        cut_off_fading=True,
+        invert=False,
+        nbytes_max=64*1024**2):
+
+    '''
+    Apply transfer functions to many traces at once.
+
+    Gives the same results as calling :py:meth:`Trace.transfer` on each
+    trace, but traces with the same FFT length and sampling interval are
+    processed together with a single multi-row FFT and the response
+    coefficients are evaluated only once for each distinct response, FFT
+    length and sampling interval.
+
+    :param traces: list of :py:class:`Trace` objects
+    :param transfer_functions: :py:class:`FrequencyResponse` object to be
+        applied to all traces or list with one response per trace
+    :param tfade: rise/fall time in seconds of taper applied in timedomain
+        at both ends of trace.
+    :param freqlimits: 4-tuple with corner frequencies in Hz.
+    :param cut_off_fading: whether to cut off rise/fall interval in output
+        trace.
+    :param invert: set to True to do a deconvolution
+    :param nbytes_max: approximate memory limit for the spectra of the traces
+        processed together
+
+    :returns: list of new :py:class:`Trace` objects, in the order of the
+        input traces
+    '''
+
+    traces = list(traces)
+    if transfer_functions is None \
+            or isinstance(transfer_functions, FrequencyResponse):
+
+        transfer_functions = [transfer_functions] * len(traces)
+
+    transfer_functions = [
+        tf if tf is not None else FrequencyResponse()
+        for tf in transfer_functions]
+
+    assert len(transfer_functions) == len(traces)
+
+    if freqlimits is not None:
+        freqlimits = tuple(freqlimits)
+
+    groups = {}
+    for itr, tr in enumerate(traces):
+        if tr.tmax - tr.tmin <= tfade*2.:
+            raise TraceTooShort(
+                'Trace %s.%s.%s.%s too short for fading length setting. '
+                'trace length = %g, fading length = %g'
+                % (tr.nslc_id + (tr.tmax-tr.tmin, tfade)))
+
+        ntrans = nextpow2(tr.ydata.size*1.2)
+        groups.setdefault((ntrans, tr.deltat), []).append(itr)
+
+    response_keys = {}
+    coefs_cache = {}
+    tapers = {}
+    outputs = [None] * len(traces)
+    for (ntrans, deltat), itrs in groups.items():
+        nrows_max = max(1, int(nbytes_max // (ntrans * 16)))
+        for ichunk in range(0, len(itrs), nrows_max):
+            itrs_chunk = itrs[ichunk:ichunk+nrows_max]
+
+            data_pad = num.zeros(
+                (len(itrs_chunk), ntrans), dtype=get_processing_dtype())
+            coefs = num.empty(
+                (len(itrs_chunk), ntrans//2 + 1), dtype=num.complex)
+
+            for irow, itr in enumerate(itrs_chunk):
+                tr = traces[itr]
+                ndata = tr.ydata.size
+                data_pad[irow, :ndata] = tr.ydata - tr.ydata.mean()
+                if tfade != 0.0:
+                    if (ndata, deltat) not in tapers:
+                        tapers[ndata, deltat] = costaper(
+                            0., tfade, deltat*(ndata-1)-tfade, deltat*ndata,
+                            ndata, deltat)
+
+                    data_pad[irow, :ndata] *= tapers[ndata, deltat]
+
+                tf = transfer_functions[itr]
+                if id(tf) not in response_keys:
+                    response_keys[id(tf)] = _response_key(tf) \
+                        or (tf.__class__, id(tf))
+
+                ck = (response_keys[id(tf)], ntrans, deltat)
+                if ck not in coefs_cache:
+                    coefs_cache[ck] = tr._get_tapered_coefs(
+                        ntrans, freqlimits, tf, invert=invert)
+
+                coefs[irow, :] = coefs_cache[ck]
+
+            fdata = num.fft.rfft(data_pad, axis=1)
+            fdata *= coefs
+            ddata = num.fft.irfft(fdata, axis=1)
+
+            for irow, itr in enumerate(itrs_chunk):
+                tr = traces[itr]
+                output = tr.copy(data=False)
+                output.ydata = _to_processing_dtype(
+                    ddata[irow, :tr.ydata.size])
+                if cut_off_fading and tfade != 0.0:
+                    try:
+                        output.chop(
+                            output.tmin+tfade, output.tmax-tfade, inplace=True)
+                    except NoData:
+                        raise TraceTooShort(
+                            'Trace %s.%s.%s.%s too short for fading length '
+                            'setting. trace length = %g, fading length = %g'
+                            % (tr.nslc_id + (tr.tmax-tr.tmin, tfade)))
+
+                outputs[itr] = output
+
+    return outputs
+
+
 def assert_same_sampling_rate(a, b, eps=1.0e-6):
     assert same_sampling_rate(a, b, eps), \
         'Sampling rates differ: %g != %g' % (a.deltat, b.deltat)
@@ -2871,20 +3961,194 @@ def asarray_1d(x, dtype):
         return a
 
 
-cached_coefficients = {}
+cached_coefficients = util.LRUCache(nmax=1000)
+
+cached_transfer_coefs = util.LRUCache(nbytes_max=128*1024**2)
+
+
+def _misfit_chain_nbytes(value):
+    if isinstance(value, Trace):
+        return value.ydata.nbytes if value.ydata is not None else 0
+    elif isinstance(value, (tuple, list)):
+        return sum(_misfit_chain_nbytes(x) for x in value)
+    elif isinstance(value, num.ndarray):
+        return value.nbytes
+    else:
+        return 0
+
+
+cached_misfit_chain = util.LRUCache(
+    nbytes_max=256*1024**2, sizeof=_misfit_chain_nbytes)
+
+
+def get_cache_stats():
+    '''
+    Get statistics of the caches for filter coefficients, frequency grids,
+    evaluated frequency responses and intermediate misfit processing results.
+
+    :returns: dict with cache names as keys and statistics, as returned by
+        :py:meth:`pyrocko.util.LRUCache.get_stats`, as values
+    '''
+
+    return dict(
+        filter_coefficients=cached_coefficients.get_stats(),
+        frequencies=Trace.cached_frequencies.get_stats(),
+        transfer_coefficients=cached_transfer_coefs.get_stats(),
+        misfit_chain=cached_misfit_chain.get_stats())
+
 
+def _get_cached_filter_coefs(order, corners, btype, output='ba'):
+    ck = (order, tuple(corners), btype, output)
 
-def _get_cached_filter_coefs(order, corners, btype):
-    ck = (order, tuple(corners), btype)
-    if ck not in cached_coefficients:
+    def make():
         if len(corners) == 0:
-            cached_coefficients[ck] = signal.butter(
-                order, corners[0], btype=btype)
+            return signal.butter(
+                order, corners[0], btype=btype, output=output)
+        else:
+            return signal.butter(order, corners, btype=btype, output=output)
+
+    return cached_coefficients.get_or_set(ck, make)
+
+
+def _get_cached_decimate_sos(q, n):
+    ck = ('decimate_iir', q, n)
+
+    def make():
+        return signal.cheby1(n, 0.05, 0.8/q, output='sos')
+
+    return cached_coefficients.get_or_set(ck, make)
+
+
+def _rational_ratio(deltat_in, deltat_out, nmax=1000, eps=1e-6):
+    # find up, down with deltat_out / deltat_in == down / up
+    ratio = fractions.Fraction(deltat_out / deltat_in).limit_denominator(nmax)
+    down, up = ratio.numerator, ratio.denominator
+    if down == 0 or down > nmax or abs(
+            float(ratio) * deltat_in - deltat_out) > eps * deltat_out:
+
+        raise UnavailableDecimation(
+            'no rational approximation for ratio = %g'
+            % (deltat_out / deltat_in))
+
+    return up, down
+
+
+def _get_cached_polyphase_filter(up, down):
+    '''
+    Get anti-aliasing filter for rational resampling as polyphase matrix.
+
+    The filter is the same as used by :py:func:`scipy.signal.resample_poly`.
+    Returns the matrix with one row per phase and the filter delay in samples
+    at the upsampled rate.
+    '''
+
+    ck = ('polyphase', up, down)
+
+    def make():
+        max_rate = max(up, down)
+        half_len = 10 * max_rate
+        h = signal.firwin(
+            2*half_len + 1, 1.0/max_rate, window=('kaiser', 5.0)) * up
+
+        ntaps = (h.size - 1) // up + 1
+        h_pad = num.zeros(ntaps*up)
+        h_pad[:h.size] = h
+        hpoly = h_pad.reshape(ntaps, up).T.copy()
+        hpoly.setflags(write=False)
+        return hpoly, half_len
+
+    return cached_coefficients.get_or_set(ck, make)
+
+
+def _polyphase(x, hpoly, up, down, c0, nout, nrows_max=2**16):
+    '''
+    Apply polyphase filter.
+
+    Computes ``y[k] = sum_j h[c_k - i*up] * x[i]`` with ``c_k = c0 +
+    k*down``, i.e. output sample ``k`` is at position ``c_k - delay`` on the
+    upsampled time axis of the input. Samples outside of ``x`` are taken to
+    be zero.
+    '''
+
+    ntaps = hpoly.shape[1]
+    ilast = (c0 + (nout-1)*down) // up
+    ifirst = c0 // up - (ntaps-1)
+    npad_left = max(0, -ifirst)
+    npad_right = max(0, ilast - (x.size-1))
+
+    xpad = num.zeros(npad_left + x.size + npad_right)
+    xpad[npad_left:npad_left+x.size] = x
+    stride = xpad.strides[0]
+
+    y = num.empty(nout)
+    for iphase in range(min(up, nout)):
+        c = c0 + iphase*down
+        hrev = hpoly[c % up, ::-1]
+        istart = npad_left + c // up - (ntaps-1)
+        nrows = (nout - iphase - 1) // up + 1
+        for irow in range(0, nrows, nrows_max):
+            nrows_chunk = min(nrows_max, nrows - irow)
+            # rows are input windows for successive outputs of this phase
+            windows = num.lib.stride_tricks.as_strided(
+                xpad[istart + irow*down:],
+                shape=(nrows_chunk, ntaps),
+                strides=(down*stride, stride))
+
+            y[iphase + irow*up:iphase + (irow+nrows_chunk)*up:up] = \
+                windows.dot(hrev)
+
+    return y
+
+
+class _PolyphaseStreamState(object):
+    def __init__(self, tmin, deltat, deltat_out, snap):
+        self.up, self.down = up, down = _rational_ratio(deltat, deltat_out)
+        self.hpoly, self.delay = _get_cached_polyphase_filter(up, down)
+        self.deltat = deltat
+        self.deltat_out = deltat_out
+        self.tmin = tmin
+        if snap:
+            tfirst = math.ceil(tmin / self.deltat_out) * self.deltat_out
+            self.ioffset = int(round((tfirst - tmin) / (deltat / up)))
         else:
-            cached_coefficients[ck] = signal.butter(
-                order, corners, btype=btype)
+            self.ioffset = 0
+
+        self.buffer = num.zeros(0)
+        self.ibuffer = 0
+        self.kout = 0
+
+    def process(self, ydata):
+        '''
+        Feed samples and get new output samples with time of the first one.
+        '''
+
+        up, down = self.up, self.down
+        ntaps = self.hpoly.shape[1]
+        self.buffer = num.concatenate(
+            (self.buffer, ydata.astype(num.float64)))
+
+        navail = self.ibuffer + self.buffer.size
+        c0 = self.ioffset + self.delay
+        klast = (navail*up - 1 - c0) // down
+        if klast < self.kout:
+            return None, None
+
+        nout = klast - self.kout + 1
+        ydata_out = _polyphase(
+            self.buffer, self.hpoly, up, down,
+            c0 + self.kout*down - self.ibuffer*up, nout)
 
-    return cached_coefficients[ck]
+        tmin_out = self.tmin + (self.ioffset + self.kout*down) \
+            * self.deltat / up
+
+        self.kout = klast + 1
+
+        ineeded = (c0 + self.kout*down) // up - (ntaps-1)
+        if ineeded > self.ibuffer:
+            self.buffer = self.buffer[ineeded - self.ibuffer:]
+            self.ibuffer = ineeded
+
+        return tmin_out, ydata_out
 
 
 class _globals(object):
@@ -3154,7 +4418,7 @@ def hilbert(x, N=None):
 
     if len(x.shape) > 1:
         h = h[:, num.newaxis]
-    x = num.fft.ifft(Xf*h)
+    x = num.fft.ifft(Xf*h, axis=0)
     return x
 
 
@@ -3263,9 +4527,115 @@ def co_lfilter(target, b, a):
         target.close()
 
 
+@coroutine
+def co_sosfilter(target, sos):
+    '''
+    Successively filter broken continuous trace data with second-order
+    sections (coroutine).
+
+    Like :py:func:`co_lfilter` but the filter is given in second-order
+    sections form and is applied with :py:func:`scipy.signal.sosfilt`, which
+    is numerically stable also for high filter orders and low corner
+    frequencies. Filter states are kept per channel and are reset when gaps
+    occur.
+
+    :param sos: array of second-order filter coefficients, shape
+        ``(nsections, 6)``, or a callable which takes the sampling interval
+        and returns such an array
+
+    Use it like this::
+
+      from pyrocko.trace import co_sosfilter, co_list_append
+
+      filtered_traces = []
+      pipe = co_sosfilter(co_list_append(filtered_traces), sos)
+      for trace in traces:
+           pipe.send(trace)
+
+      pipe.close()
+    '''
+
+    try:
+        states = States()
+        while True:
+            input = (yield)
+
+            if callable(sos):
+                sos_input = sos(input.deltat)
+            else:
+                sos_input = sos
+
+            zi = states.get(input)
+            if zi is None:
+                zi = num.zeros((len(sos_input), 2), dtype=num.float)
+
+            output = input.copy(data=False)
+            ydata, zf = signal.sosfilt(sos_input, input.get_ydata(), zi=zi)
+            output.set_ydata(ydata)
+            states.set(input, zf)
+            target.send(output)
+
+    except GeneratorExit:
+        target.close()
+
+
+def co_lowpass(target, order, corner):
+    '''
+    Successively apply Butterworth lowpass to broken continuous trace data
+    (coroutine).
+
+    Gives the same result as :py:meth:`Trace.lowpass` on the unbroken trace
+    (without demeaning). See :py:func:`co_sosfilter`.
+    '''
+
+    def sos(deltat):
+        return _get_cached_filter_coefs(
+            order, [corner*2.0*deltat], btype='low', output='sos')
+
+    return co_sosfilter(target, sos)
+
+
+def co_highpass(target, order, corner):
+    '''
+    Successively apply Butterworth highpass to broken continuous trace data
+    (coroutine).
+
+    Gives the same result as :py:meth:`Trace.highpass` on the unbroken trace
+    (without demeaning). See :py:func:`co_sosfilter`.
+    '''
+
+    def sos(deltat):
+        return _get_cached_filter_coefs(
+            order, [corner*2.0*deltat], btype='high', output='sos')
+
+    return co_sosfilter(target, sos)
+
+
+def co_bandpass(target, order, corner_hp, corner_lp):
+    '''
+    Successively apply Butterworth bandpass to broken continuous trace data
+    (coroutine).
+
+    Gives the same result as :py:meth:`Trace.bandpass` on the unbroken trace
+    (without demeaning). See :py:func:`co_sosfilter`.
+    '''
+
+    def sos(deltat):
+        return _get_cached_filter_coefs(
+            order,
+            [corner*2.0*deltat for corner in (corner_hp, corner_lp)],
+            btype='band', output='sos')
+
+    return co_sosfilter(target, sos)
+
+
 def co_antialias(target, q, n=None, ftype='fir'):
     b, a, n = util.decimate_coeffs(q, n, ftype)
-    anti = co_lfilter(target, b, a)
+    if ftype == 'fir':
+        anti = co_lfilter(target, b, a)
+    else:
+        anti = co_sosfilter(target, _get_cached_decimate_sos(q, n))
+
     return anti
 
 
@@ -3329,7 +4699,58 @@ def co_downsample(target, q, n=None, ftype='fir'):
 
 
 @coroutine
-def co_downsample_to(target, deltat):
+def co_resample(target, deltat, snap=True):
+    '''
+    Successively resample broken continuous trace data (coroutine).
+
+    Like :py:func:`co_downsample`, but uses the polyphase FIR resampler of
+    :py:meth:`Trace.resample_polyphase`, so that arbitrary rational ratios
+    between input and output sampling rate are supported. Filter states and
+    pending input samples are kept per channel and are reset when gaps
+    occur. Output traces are delayed by at most the filter length; the tail
+    of the data is flushed only as far as it can be computed exactly.
+
+    :param deltat: output sampling interval
+    :param snap: whether to put the new sampling instances at multiples of
+        the output sampling interval (based on system time).
+    '''
+
+    try:
+        states = States()
+        while True:
+            input = (yield)
+
+            state = states.get(input)
+            if state is None:
+                state = _PolyphaseStreamState(
+                    input.tmin, input.deltat, deltat, snap)
+
+            tmin, ydata = state.process(input.get_ydata())
+            states.set(input, state)
+            if ydata is not None:
+                output = input.copy(data=False)
+                output.tmin = tmin
+                output.deltat = deltat
+                output.set_ydata(ydata)
+                target.send(output)
+
+    except GeneratorExit:
+        target.close()
+
+
+@coroutine
+def co_downsample_to(target, deltat, allow_polyphase=False):
+    '''
+    Successively downsample broken continuous trace data to given sampling
+    interval (coroutine).
+
+    Integer ratios are realized through a chain of :py:func:`co_downsample`
+    steps. Other ratios raise
+    :py:exc:`pyrocko.util.UnavailableDecimation`, unless ``allow_polyphase``
+    is ``True``, in which case :py:func:`co_resample` is used. Requests to
+    increase the sampling rate always raise
+    :py:exc:`pyrocko.util.UnavailableDecimation`.
+    '''
 
     decimators = {}
     try:
@@ -3337,14 +4758,26 @@ def co_downsample_to(target, deltat):
             tr = (yield)
             ratio = deltat / tr.deltat
             rratio = round(ratio)
-            if abs(rratio - ratio)/ratio > 0.0001:
-                raise util.UnavailableDecimation('ratio = %g' % ratio)
+            try:
+                if rratio < 1 or abs(rratio - ratio)/ratio > 0.0001:
+                    raise util.UnavailableDecimation('ratio = %g' % ratio)
+
+                deci_seq = tuple(
+                    x for x in util.decitab(int(rratio)) if x != 1)
+
+            except util.UnavailableDecimation:
+                if not allow_polyphase or ratio < 1.:
+                    raise
+
+                deci_seq = None
 
-            deci_seq = tuple(x for x in util.decitab(int(rratio)) if x != 1)
             if deci_seq not in decimators:
-                pipe = target
-                for q in deci_seq[::-1]:
-                    pipe = co_downsample(pipe, q)
+                if deci_seq is None:
+                    pipe = co_resample(target, deltat)
+                else:
+                    pipe = target
+                    for q in deci_seq[::-1]:
+                        pipe = co_downsample(pipe, q)
 
                 decimators[deci_seq] = pipe
 
@@ -3426,23 +4859,120 @@ def Lx_norm(u, v, norm=2):
     :param v: :py:class:`numpy.array`
     :param norm: (default = 2)
 
-    ``u`` and ``v`` must be of same size.
+    ``u`` and ``v`` must be of same size. Multi-dimensional arrays are reduced
+    along their last axis.
     '''
 
     if norm == 1:
         return (
-            num.sum(num.abs(v-u)),
-            num.sum(num.abs(v)))
+            num.sum(num.abs(v-u), axis=-1),
+            num.sum(num.abs(v), axis=-1))
 
     elif norm == 2:
         return (
-            num.sqrt(num.sum((v-u)**2)),
-            num.sqrt(num.sum(v**2)))
+            num.sqrt(num.sum((v-u)**2, axis=-1)),
+            num.sqrt(num.sum(v**2, axis=-1)))
 
     else:
         return (
-            num.power(num.sum(num.abs(num.power(v - u, norm))), 1./norm),
-            num.power(num.sum(num.abs(num.power(v, norm))), 1./norm))
+            num.power(num.sum(
+                num.abs(num.power(v - u, norm)), axis=-1), 1./norm),
+            num.power(num.sum(
+                num.abs(num.power(v, norm)), axis=-1), 1./norm))
+
+
+def misfit_many(observed, candidates, setups):
+    '''
+    Calculate misfits of many candidate traces against one observed trace.
+
+    Gives the same results as calling :py:meth:`Trace.misfit` for each
+    combination of candidate and setup, but the processing of the observed
+    trace is shared and the candidates are processed in batches: candidates
+    covering the same time span are stacked and filtered with one
+    multi-row FFT. Intermediate results of the candidates are not put into
+    the shared processing cache.
+
+    :param observed: :py:class:`Trace` object
+    :param candidates: list of :py:class:`Trace` objects
+    :param setups: list of :py:class:`MisfitSetup` objects
+    :returns: array of shape ``(len(candidates), len(setups), 2)`` with the
+        misfit values ``m`` and normalization divisors ``n``
+    '''
+
+    if not observed._pchain:
+        observed.init_chain()
+
+    groups = defaultdict(list)
+    for icand, cand in enumerate(candidates):
+        deltat = max(observed.deltat, cand.deltat)
+        tmin = min(observed.tmin, cand.tmin) - deltat
+        tmax = max(observed.tmax, cand.tmax) + deltat
+        groups[deltat, tmin, tmax].append(icand)
+
+    result = num.zeros((len(candidates), len(setups), 2))
+    for (deltat, tmin, tmax), icands in groups.items():
+        extended = [
+            do_extend(do_downsample(candidates[icand], deltat), tmin, tmax)
+            for icand in icands]
+
+        for isetup, setup in enumerate(setups):
+            adata, aproc = observed.run_chain(
+                tmin, tmax, deltat, setup, False)
+
+            tapered = [do_pre_taper(tr, setup.taper) for tr in extended]
+            if any(tr.ydata.size != tapered[0].ydata.size
+                   for tr in tapered):
+
+                # no common sampling, process one by one
+                for icand in icands:
+                    result[icand, isetup, :] = observed.misfit(
+                        candidates[icand], setup, nocache=True)
+
+                continue
+
+            bdata = _misfit_process_many(
+                num.vstack([tr.ydata for tr in tapered]), deltat, setup)
+
+            if setup.domain != 'cc_max_norm':
+                m, n = Lx_norm(bdata, adata, norm=setup.norm)
+                # envelopes are complex valued, see Trace.envelope
+                result[icands, isetup, 0] = num.real(m)
+                result[icands, isetup, 1] = num.real(n)
+
+            else:
+                for icand, tr, ydata in zip(icands, tapered, bdata):
+                    bproc = tr.copy(data=False)
+                    bproc.set_ydata(ydata)
+                    ctr = correlate(
+                        aproc, bproc, mode='full', normalization='normal')
+
+                    result[icand, isetup, 0] = 0.5 - 0.5 * ctr.max()[1]
+                    result[icand, isetup, 1] = 0.5
+
+    return result
+
+
+def _misfit_process_many(ydata, deltat, setup):
+    # batched equivalent of stages do_fft, do_filter, do_ifft and the domain
+    # specific post-processing in Trace.run_chain, one trace per row
+    if setup.filter is not None:
+        ndata = ydata.shape[1]
+        nfft = nextpow2(ndata)
+        spectra = num.fft.rfft(ydata, nfft, axis=1)
+        frequencies = num.arange(spectra.shape[1]) / (deltat * nfft)
+        spectra *= setup.filter.evaluate(frequencies)
+        if setup.domain == 'frequency_domain':
+            return num.abs(spectra)
+
+        ydata = num.fft.irfft(spectra, axis=1)[:, :ndata]
+
+    if setup.domain == 'envelope':
+        ydata = num.sqrt(ydata**2 + hilbert(ydata.T).T**2)
+
+    elif setup.domain == 'absolute':
+        ydata = num.abs(ydata)
+
+    return ydata
 
 
 def do_downsample(tr, deltat):
@@ -3487,7 +5017,8 @@ def do_filter(inp, filter):
         return inp
     else:
         tr, frequencies, spectrum = inp
-        spectrum *= filter.evaluate(frequencies)
+        # no in-place multiplication: the input may be a cached result
+        spectrum = spectrum * filter.evaluate(frequencies)
         return [tr, frequencies, spectrum]
 
 
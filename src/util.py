@@ -21,6 +21,8 @@ import shlex
 import optparse
 import os.path as op
 import platform
+import threading
+from collections import OrderedDict
 
 import numpy as num
 from scipy import signal
@@ -1842,6 +1844,157 @@ class defaultzerodict(dict):
         return 0
 
 
+def _nbytes(value):
+    if isinstance(value, num.ndarray):
+        return value.nbytes
+    elif isinstance(value, (tuple, list)):
+        return sum(_nbytes(x) for x in value)
+    else:
+        return 0
+
+
+class LRUCache(object):
+    '''
+    Dict-like container which keeps a limited number of items.
+
+    When one of the limits is exceeded, the least recently used items are
+    discarded. Access is thread-safe. Hits, misses and evictions are counted,
+    see :py:meth:`get_stats`.
+
+    :param nmax: maximum number of items (``None`` for no limit)
+    :param nbytes_max: maximum combined size of the items in bytes (``None``
+        for no limit)
+    :param sizeof: callable returning the size of an item in bytes; by
+        default, the sizes of NumPy arrays (also within tuples and lists) are
+        counted
+    '''
+
+    def __init__(self, nmax=None, nbytes_max=None, sizeof=_nbytes):
+        self.nmax = nmax
+        self.nbytes_max = nbytes_max
+        self._sizeof = sizeof
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+        self.nbytes = 0
+        self.nhits = 0
+        self.nmisses = 0
+        self.nevictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                value, nbytes = self._items.pop(key)
+            except KeyError:
+                self.nmisses += 1
+                raise
+
+            self._items[key] = value, nbytes
+            self.nhits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+
+            nbytes = self._sizeof(value) if self.nbytes_max is not None else 0
+            self._items[key] = value, nbytes
+            self.nbytes += nbytes
+            self._evict()
+
+    def __delitem__(self, key):
+        with self._lock:
+            self.nbytes -= self._items.pop(key)[1]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        '''
+        Get list of the keys currently in the cache.
+        '''
+
+        with self._lock:
+            return list(self._items.keys())
+
+    def get_or_set(self, key, make):
+        '''
+        Get item, create it with ``make()`` if it is not in the cache.
+        '''
+
+        try:
+            return self[key]
+        except KeyError:
+            value = make()
+            self[key] = value
+            return value
+
+    def _evict(self):
+        while self._items and (
+                (self.nmax is not None and len(self._items) > self.nmax) or
+                (self.nbytes_max is not None
+                 and self.nbytes > self.nbytes_max)):
+
+            _, (_, nbytes) = self._items.popitem(last=False)
+            self.nbytes -= nbytes
+            self.nevictions += 1
+
+    def set_limits(self, nmax=None, nbytes_max=None):
+        '''
+        Change size limits, discarding items if necessary.
+        '''
+
+        with self._lock:
+            if nbytes_max is not None and self.nbytes_max is None:
+                self.nbytes = 0
+                for key, (value, _) in list(self._items.items()):
+                    nbytes = self._sizeof(value)
+                    self._items[key] = value, nbytes
+                    self.nbytes += nbytes
+
+            self.nmax = nmax
+            self.nbytes_max = nbytes_max
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def get_stats(self):
+        '''
+        Get cache statistics.
+
+        :returns: dict with entries ``size``, ``nbytes``, ``nhits``,
+            ``nmisses``, ``nevictions`` and ``hit_rate``
+        '''
+
+        with self._lock:
+            nrequests = self.nhits + self.nmisses
+            return dict(
+                size=len(self._items),
+                nbytes=self.nbytes,
+                nhits=self.nhits,
+                nmisses=self.nmisses,
+                nevictions=self.nevictions,
+                hit_rate=self.nhits / nrequests if nrequests else 0.0)
+
+    def __str__(self):
+        stats = self.get_stats()
+        return 'LRUCache: %i items, %s, hit rate: %.1f%%, %i evictions' % (
+            stats['size'], human_bytesize(stats['nbytes']),
+            stats['hit_rate'] * 100., stats['nevictions'])
+
+
 def mostfrequent(x):
     c = defaultzerodict()
     for e in x:
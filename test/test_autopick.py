@@ -0,0 +1,71 @@
+from __future__ import division, print_function, absolute_import
+import unittest
+import numpy as num
+
+from pyrocko import util, trace, autopick, pile
+
+
+class AutopickTestCase(unittest.TestCase):
+
+    def testStreamingStaLta(self):
+        deltat = 0.01
+        tmin = util.str_to_time('2020-01-01 00:00:00')
+        n = 30000
+        ievents = [5000, 15000, 25000]
+
+        traces = []
+        for channel in ['BHZ', 'BHN']:
+            ydata = num.random.normal(size=n)
+            for ievent in ievents:
+                ydata[ievent:ievent+300] += num.random.normal(size=300) * 10.
+
+            traces.append(trace.Trace(
+                'XX', 'STA', '', channel, tmin=tmin, deltat=deltat,
+                ydata=ydata))
+
+        def run(chunks):
+            detector = autopick.StreamingStaLta(
+                1., 20., 1., 1., 1., threshold_on=5., threshold_off=2.)
+
+            cf_traces = []
+            markers = []
+            for chunk in chunks:
+                cf_traces_chunk, markers_chunk = detector.process(chunk)
+                cf_traces.extend(cf_traces_chunk)
+                markers.extend(markers_chunk)
+
+            markers.extend(detector.close())
+            ydata = num.concatenate(
+                [tr.ydata for tr in cf_traces if tr.channel == 'BHZ'])
+
+            return ydata, markers
+
+        ydata_ref, markers_ref = run([traces])
+        assert ydata_ref.size == n
+        assert len(markers_ref) == 2*len(ievents)
+        for marker, ievent in zip(markers_ref[::2], ievents):
+            assert 0. <= marker.tmin - (tmin + ievent*deltat) < 1.
+
+        chunks = [
+            [tr.chop(tmin + i*deltat, tmin + (i+777)*deltat,
+                     inplace=False, include_last=False) for tr in traces]
+            for i in range(0, n, 777)]
+
+        ydata, markers = run(chunks)
+        assert num.all(ydata == ydata_ref)
+        assert len(markers) == len(markers_ref)
+        for marker, marker_ref in zip(markers, markers_ref):
+            assert marker.nslc_ids == marker_ref.nslc_ids
+            assert abs(marker.tmin - marker_ref.tmin) < deltat * 0.01
+            assert abs(marker.tmax - marker_ref.tmax) < deltat * 0.01
+
+        p = pile.Pile()
+        p.add_file(pile.MemTracesFile(None, traces))
+        ydata, markers = run(p.chopper(tinc=33., tpad=5.))
+        assert num.all(ydata == ydata_ref[:ydata.size])
+        assert len(markers) == len(markers_ref)
+
+
+if __name__ == '__main__':
+    util.setup_logging('test_autopick', 'warning')
+    unittest.main()
@@ -709,6 +709,178 @@ class GFTestCase(unittest.TestCase):
             self.assertEqual(tr1.tmin, tr2.tmin)
             self.assertTrue(numeq(tr1.ydata, tr2.ydata, 0.0001))
 
+    def test_process_nprocs(self):
+        store_dir = self.get_pulse_store_dir()
+        engine = gf.LocalEngine(store_dirs=[store_dir])
+
+        sources = [
+            gf.ExplosionSource(
+                time=0.0,
+                depth=depth,
+                moment=1.0)
+
+            for depth in [100., 200., 300., 400.]
+        ]
+
+        targets = [
+            gf.Target(
+                codes=('', 'STA%i' % i, '', component),
+                north_shift=500.,
+                east_shift=i*100.,
+                interpolation=interpolation)
+
+            for component in 'ZNE'
+            for (i, interpolation) in enumerate(
+                ['nearest_neighbor', 'multilinear'])
+        ]
+
+        resp1 = engine.process(sources, targets)
+
+        status = []
+        resp2 = engine.process(
+            sources, targets, nprocs=2,
+            status_callback=lambda isub, nsub: status.append((isub, nsub)))
+
+        assert resp1.stats.n_procs == 1
+        assert not resp1.stats.workers
+        assert resp2.stats.n_procs == 2
+        assert 1 <= len(resp2.stats.workers) <= 2
+        assert sum(w.n_subrequests for w in resp2.stats.workers) \
+            == len(resp2.request.subrequest_map())
+        assert status[-1][0] == status[-1][1]
+
+        iters = [resp.iter_results() for resp in (resp1, resp2)]
+        for i in range(len(sources) * len(targets)):
+            s1, t1, tr1 = next(iters[0])
+            s2, t2, tr2 = next(iters[1])
+            self.assertEqual(s1, s2)
+            self.assertEqual(t1, t2)
+            self.assertEqual(tr1.tmin, tr2.tmin)
+            self.assertTrue(numeq(tr1.ydata, tr2.ydata, 1e-6))
+
+        # the stores of the parent process must still be usable
+        resp3 = engine.process(sources, targets)
+        for (_, _, tr1), (_, _, tr3) in zip(
+                resp1.iter_results(), resp3.iter_results()):
+            self.assertTrue(numeq(tr1.ydata, tr3.ydata, 1e-6))
+
+    def test_dsource_cache(self):
+        store_dir = self.get_pulse_store_dir()
+        engine = gf.LocalEngine(store_dirs=[store_dir])
+
+        sources = [
+            gf.ExplosionSource(time=0.0, depth=depth, moment=moment)
+            for moment in (1.0, 2.0) for depth in (100., 200.)]
+
+        targets = [
+            gf.Target(
+                codes=('', 'STA', '', component),
+                north_shift=500.,
+                east_shift=0.)
+            for component in 'ZNE']
+
+        resp1 = engine.process(sources, targets)
+        assert resp1.stats.n_dsource_cache_misses == len(sources)
+        assert resp1.stats.n_dsource_cache_hits == \
+            len(sources) * (len(targets) - 1)
+
+        resp2 = engine.process(sources, targets)
+        assert resp2.stats.n_dsource_cache_misses == 0
+        assert resp2.stats.n_dsource_cache_hits == \
+            len(sources) * len(targets)
+
+        for (_, _, tr1), (_, _, tr2) in zip(
+                resp1.iter_results(), resp2.iter_results()):
+            assert num.all(tr1.ydata == tr2.ydata)
+
+        # sources differing in moment must not share the discretization
+        trs = resp2.pyrocko_traces()
+        n = len(targets) * 2
+        for tr_a, tr_b in zip(trs[:n], trs[n:]):
+            assert num.allclose(2.0 * tr_a.ydata, tr_b.ydata, rtol=1e-5)
+
+        assert engine.get_dsource_cache_stats()['size'] == len(sources)
+        engine.clear_dsource_cache('pulse')
+        assert engine.get_dsource_cache_stats()['size'] == 0
+
+        resp3 = engine.process(sources, targets, nprocs=2)
+        assert resp3.stats.n_dsource_cache_misses > 0
+        assert engine.get_dsource_cache_stats()['size'] == 0
+
+        engine.process(sources[:1], targets)
+        assert engine.get_dsource_cache_stats()['size'] == 1
+        engine.clear_dsource_cache()
+        assert engine.get_dsource_cache_stats()['size'] == 0
+
+    def test_seismograms_batched(self):
+        store_dir = self.get_pulse_store_dir()
+        engine = gf.LocalEngine(store_dirs=[store_dir])
+        store = engine.get_store('pulse')
+
+        sources = [
+            gf.RectangularExplosionSource(
+                time=0.0025,
+                depth=depth,
+                moment=1.0,
+                length=100.,
+                width=0.,
+                nucleation_x=-1)
+            for depth in [100., 200., 300.]
+        ] + [
+            gf.ExplosionSource(time=0.01, depth=150., moment=2.0)]
+
+        targets = [
+            gf.Target(
+                codes=('', 'STA', '', component),
+                north_shift=500.,
+                east_shift=east_shift,
+                depth=5.)
+            for component in 'ZN' for east_shift in [0., 125., 250.]]
+
+        receivers = [target.receiver(store) for target in targets]
+        dsources = [
+            source.discretize_basesource(store, targets[0])
+            for source in sources]
+
+        components = ['displacement.n', 'displacement.d']
+        for interpolation in ['nearest_neighbor', 'multilinear']:
+            for optimization in ['enable', 'disable']:
+                for (itmin, nsamples) in [(None, None), (-10, 200)]:
+                    seismograms = store.seismograms(
+                        dsources, receivers, components,
+                        itmin=itmin, nsamples=nsamples,
+                        interpolation=interpolation,
+                        optimization=optimization)
+
+                    assert len(seismograms) == len(dsources)
+                    for dsource, seismograms_source in zip(
+                            dsources, seismograms):
+
+                        assert len(seismograms_source) == len(receivers)
+                        for receiver, seis in zip(
+                                receivers, seismograms_source):
+
+                            assert set(seis.keys()) == set(components)
+                            for comp in components:
+                                gtr = seis[comp]
+                                if nsamples is not None:
+                                    assert gtr.itmin == itmin
+                                    assert gtr.data.size == nsamples
+
+                                gtr_ref = store.seismogram(
+                                    dsource, receiver, [comp],
+                                    itmin=gtr.itmin,
+                                    nsamples=gtr.data.size,
+                                    interpolation=interpolation,
+                                    optimization=optimization)[comp]
+
+                                assert gtr.itmin == gtr_ref.itmin
+                                assert numeq(
+                                    gtr.data, gtr_ref.data,
+                                    1e-5 * num.max(num.abs(gtr_ref.data)))
+
+        assert store.seismograms([], receivers, components) == []
+
     def test_timing_defs(self):
 
         for s, d in [
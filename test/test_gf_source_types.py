@@ -25,6 +25,44 @@ class GFSourceTypesTestCase(unittest.TestCase):
                 slip=1.)
             rect_sources.append(src)
 
+    def test_discretize_rect_source(self):
+        from pyrocko.gf.seismosizer import discretize_rect_source
+
+        stf = gf.HalfSinusoidSTF(duration=0.5)
+        args = (
+            num.array([200., 200.]), 0.1, 30., 60., 8.*km, 4.*km, 'top',
+            3500.)
+
+        points, times, amplitudes, dl, dw = discretize_rect_source(
+            *args, stf=stf, nucleation_x=0.2, nucleation_y=-0.5)
+
+        assert points.shape == (times.size, 3)
+        assert amplitudes.size == times.size
+        assert points.flags.writeable
+
+        ntau = stf.discretize_t(0.1, 0.0)[0].size
+        npoints = times.size // ntau
+        num.testing.assert_allclose(
+            amplitudes.reshape((npoints, ntau)).sum(axis=1), 1.0)
+
+        assert num.all(points[:, 2] >= 0.)
+        assert abs(dl * dw * npoints - 8.*km * 4.*km) < 1e-6 * 8.*km * 4.*km
+
+        # second call served from geometry cache must give same result
+        points2, times2, amplitudes2, _, _ = discretize_rect_source(
+            *args, stf=stf, nucleation_x=0.2, nucleation_y=-0.5)
+
+        num.testing.assert_equal(points, points2)
+        num.testing.assert_equal(times, times2)
+        num.testing.assert_equal(amplitudes, amplitudes2)
+
+        # results handed out must not alias the cached arrays
+        points[:] = 0.
+        points3, _, _, _, _ = discretize_rect_source(
+            *args, stf=stf, nucleation_x=0.2, nucleation_y=-0.5)
+
+        num.testing.assert_equal(points2, points3)
+
     @staticmethod
     def plot_rectangular_source(src, store):
         from matplotlib import pyplot as plt
@@ -96,6 +96,26 @@ class GFSTFTestCase(unittest.TestCase):
             d2 = stf.effective_duration
             assert abs(d2 - d1) < 1e-4
 
+    def test_apply_stf(self):
+        from pyrocko.gf.seismosizer import apply_stf
+
+        for ndata in [1, 10, 1000, 20000]:
+            data = num.random.normal(size=ndata).astype(num.float32)
+            for duration in [0., 0.5, 3., 30.]:
+                stf = gf.BoxcarSTF(duration=duration, anchor=0.)
+                _, amplitudes = stf.discretize_t(deltat=0.01, tref=0.)
+
+                padded_data = num.empty(data.size + amplitudes.size)
+                padded_data[:data.size] = data
+                padded_data[data.size:] = data[-1]
+                expect = num.convolve(
+                    amplitudes, padded_data)[:-amplitudes.size]
+
+                for _ in range(2):
+                    result = apply_stf(amplitudes, data)
+                    assert result.dtype == num.float64
+                    assert numeq(result, expect, 1e-5)
+
 
 if __name__ == '__main__':
     plot = True
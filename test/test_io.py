@@ -71,6 +71,46 @@ class IOTestCase(unittest.TestCase):
             for fn in fns:
                 os.remove(fn)
 
+    def testReadMmap(self):
+        tr1 = trace.Trace(
+            'xx', 'abcd', '', 'BHZ', tmin=time.time(), deltat=0.1,
+            ydata=num.arange(1000, dtype=num.float32))
+
+        fn = io.save(tr1, pjoin(self.tmpdir, 'test.sac'), format='sac')[0]
+        tr2, = io.load(fn, format='sac', mmap=True)
+        assert isinstance(tr2.ydata, num.memmap)
+        assert not tr2.ydata.flags.writeable
+        assert tr2.ydata.dtype.itemsize == 4
+        assert tr1 == tr2
+        assert num.all(tr1.ydata == tr2.chop(
+            tr1.tmin, tr1.tmax, inplace=False, include_last=True).ydata)
+
+        # no effect for compressed formats
+        fn = io.save(tr1, pjoin(self.tmpdir, 'test.mseed'))[0]
+        tr3, = io.load(fn, mmap=True)
+        assert not isinstance(tr3.ydata, num.memmap)
+
+        # KAN files, also with empty data section
+        for n in (10, 0):
+            header = bytearray(b' ' * 512)
+            for (i, j), v in [
+                    ((0, 8), 1), ((8, 20), n), ((20, 28), 1), ((28, 36), 2),
+                    ((36, 50), 10.), ((50, 64), 0.), ((382, 390), 0),
+                    ((393, 405), '2010-01-01'), ((405, 415), '12:00:00'),
+                    ((415, 423), 0)]:
+
+                header[i:j] = str(v).rjust(j-i).encode('ascii')
+
+            fn = pjoin(self.tmpdir, 'test.kan')
+            with open(fn, 'wb') as f:
+                f.write(header)
+                f.write(num.arange(n, dtype='<i4').tobytes())
+
+            for mmap in (False, True):
+                tr4, = io.load(fn, format='kan', mmap=mmap)
+                assert num.all(tr4.ydata == num.arange(n))
+                assert tr4.deltat == 0.1
+
     def testWriteText(self):
         networks = [rn(2) for i in range(5)]
         deltat = 0.1
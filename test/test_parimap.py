@@ -89,6 +89,31 @@ class ParimapTestCase(unittest.TestCase):
                 if end1 or end2:
                     break
 
+    def test_abort(self):
+        import multiprocessing
+
+        def work(x):
+            if x == 50:
+                raise Crash(str(x))
+
+            return 'x' * 100000
+
+        procs_before = set(multiprocessing.active_children())
+
+        it = parimap(work, range(100), nprocs=4, eprintignore=Crash)
+        for i, x in enumerate(it):
+            if i == 3:
+                break
+
+        it.close()
+        assert set(multiprocessing.active_children()) == procs_before
+
+        with self.assertRaises(Crash):
+            for x in parimap(work, range(100), nprocs=4, eprintignore=Crash):
+                pass
+
+        assert set(multiprocessing.active_children()) == procs_before
+
     def test_locks(self):
 
         def work(x):
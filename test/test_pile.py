@@ -15,6 +15,10 @@ def numeq(a, b, eps):
     return num.all(num.abs(num.array(a) - num.array(b)) < eps)
 
 
+def count_samples(traces):
+    return sum(tr.data_len() for tr in traces)
+
+
 def makeManyFiles(nfiles, nsamples, networks, stations, channels, tmin):
 
     datadir = tempfile.mkdtemp()
@@ -109,6 +113,568 @@ class PileTestCase(unittest.TestCase):
         pile.get_cache(cachedir).clean()
         shutil.rmtree(datadir)
 
+    def testSQLiteCache(self):
+        import shutil
+        nfiles = 20
+        nsamples = 100
+        tmin = 1234567890
+        datadir = makeManyFiles(
+            nfiles, nsamples, ['xx'], ['aaaa', 'bbbb'], ['BHZ'], tmin)
+        filenames = util.select_files([datadir], show_progress=False)
+        cachedir = pjoin(datadir, '_cache_')
+
+        piles = []
+        for backend in ('pickle', 'sqlite', 'sqlite'):
+            cache = pile.get_cache(cachedir, backend=backend)
+            p = pile.Pile()
+            p.load_files(filenames=filenames, cache=cache, show_progress=False)
+            piles.append(p)
+
+        for p in piles[1:]:
+            assert p.tmin == piles[0].tmin
+            assert p.tmax == piles[0].tmax
+            assert set(p.nslc_ids) == set(piles[0].nslc_ids)
+
+        cache = pile.get_cache(cachedir)
+        assert len(cache.query_files()) == nfiles
+        assert len(cache.query_files(tmin=tmin, tmax=tmin+50.)) == 1
+        assert len(cache.query_files(
+            tmin=tmin, tmax=tmin+nsamples*nfiles)) == nfiles
+
+        rows = cache.query_traces(codes='*.aaaa.*.*')
+        assert all(tr.station == 'aaaa' for (_, _, tr) in rows)
+        assert len(rows) + len(cache.query_traces(codes='*.bbbb.*.*')) \
+            == nfiles
+
+        abspath, _, tr = cache.query_traces(tmin=tmin, tmax=tmin+50.)[0]
+        assert tr.tmin == tmin
+        assert tr.tmax == tmin + (nsamples-1)
+
+        os.unlink(abspath)
+        cache.clean()
+        assert len(cache.query_files()) == nfiles - 1
+        assert cache.get(abspath) is None
+
+        # connection is shared with other threads
+        import threading
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(len(cache.query_files())))
+        thread.start()
+        thread.join()
+        assert results == [nfiles - 1]
+
+        cache.close()
+
+        # index with outdated schema is rebuilt
+        import sqlite3
+        conn = sqlite3.connect(cache.database_path)
+        conn.execute('PRAGMA user_version = 999')
+        conn.close()
+        cache2 = pile.SQLiteTracesFileCache(cachedir)
+        assert len(cache2.query_files()) == 0
+        cache2.close()
+
+        shutil.rmtree(datadir)
+
+    def testLazyPile(self):
+        import shutil
+        nfiles = 50
+        nsamples = 100
+        tmin = 1234567890
+        datadir = makeManyFiles(
+            nfiles, nsamples, ['xx'], ['aaaa', 'bbbb'], ['BHZ', 'BHN'], tmin)
+        otherdir = makeManyFiles(
+            5, nsamples, ['yy'], ['cccc'], ['BHZ'], tmin)
+
+        filenames = util.select_files([datadir], show_progress=False)
+        cachedir = pjoin(datadir, '_cache_')
+        cache = pile.get_cache(cachedir)
+
+        p_other = pile.LazyPile(cache)
+        p_other.load_files(
+            util.select_files([otherdir], show_progress=False),
+            show_progress=False)
+
+        p = pile.Pile()
+        p.load_files(filenames=filenames, cache=cache, show_progress=False)
+
+        lp = pile.LazyPile(cache)
+        assert lp.load_files(filenames, show_progress=False) == 0
+        assert lp.nfiles == nfiles
+        assert 'yy' not in lp.networks
+        assert lp.tmin == p.tmin and lp.tmax == p.tmax
+        assert set(lp.nslc_ids) == set(p.nslc_ids)
+        assert lp.gather_keys(lambda tr: tr.station) \
+            == p.gather_keys(lambda tr: tr.station)
+
+        for kwargs in [
+                dict(tinc=122., degap=False),
+                dict(tinc=1000.,
+                     trace_selector=lambda tr: tr.channel == 'BHZ'),
+                dict(tmin=tmin+1000., tmax=tmin+3000., tinc=300., tpad=10.)]:
+
+            wins1 = list(p.chopper(**kwargs))
+            wins2 = list(lp.chopper(**kwargs))
+            assert len(wins1) == len(wins2) > 1
+            for trs1, trs2 in zip(wins1, wins2):
+                assert len(trs1) == len(trs2)
+                for tr1, tr2 in zip(trs1, trs2):
+                    assert tr1.nslc_id == tr2.nslc_id
+                    assert tr1.tmin == tr2.tmin
+                    assert num.all(tr1.ydata == tr2.ydata)
+
+        assert len(list(lp.iter_traces())) == nfiles
+
+        ttab = lp.get_trace_table()
+        assert len(ttab) == nfiles
+        assert ttab.minmaxtime() == trace.minmaxtime(p.iter_traces())
+        assert len(lp.get_trace_table(tmin+1000., tmin+3000.)) \
+            == len(p.get_trace_table(tmin+1000., tmin+3000.)) > 0
+
+        for fn in filenames[:3]:
+            os.utime(fn, (0, 0))
+
+        assert lp.reload_modified()
+        assert not lp.reload_modified()
+
+        os.unlink(filenames[0])
+        assert lp.reload_modified()
+        assert lp.nfiles == nfiles - 1
+
+        # in-memory files are merged with the indexed ones
+        tr_mem = trace.Trace(
+            'zz', 'mem', '', 'BHZ', tmin=tmin-500., deltat=1.0,
+            ydata=num.arange(100.))
+
+        tmin_indexed = lp.tmin
+        memfile = pile.MemTracesFile(None, [tr_mem])
+        lp.add_file(memfile)
+        assert lp.nfiles == nfiles
+        assert 'zz' in lp.networks
+        assert lp.tmin == tmin-500.
+        assert ('zz', 'mem') in lp.gather_keys(lambda tr: tr.nslc_id[:2])
+        assert len(lp.get_trace_table()) == nfiles
+
+        trs, _ = lp.chop(tmin-450., tmin+50.)
+        tr_zz, = [tr for tr in trs if tr.network == 'zz']
+        assert num.all(tr_zz.ydata == num.arange(50., 100.))
+
+        lp.remove_file(memfile)
+        assert lp.nfiles == nfiles - 1
+        assert 'zz' not in lp.networks
+        assert lp.tmin == tmin_indexed
+
+        shutil.rmtree(datadir)
+        shutil.rmtree(otherdir)
+
+    def testParallelLoad(self):
+        import shutil
+        nfiles = 30
+        nsamples = 100
+        tmin = 1234567890
+        datadir = makeManyFiles(
+            nfiles, nsamples, ['xx'], ['aaaa', 'bbbb'], ['BHZ'], tmin)
+        filenames = util.select_files([datadir], show_progress=False)
+        with open(pjoin(datadir, 'garbage.mseed'), 'w') as f:
+            f.write('not a miniseed file')
+
+        filenames.append(pjoin(datadir, 'garbage.mseed'))
+
+        p1 = pile.Pile()
+        p1.load_files(filenames=filenames, show_progress=False)
+
+        cachedir = pjoin(datadir, '_cache_')
+        p2 = pile.Pile()
+        p2.load_files(
+            filenames=filenames, cache=pile.get_cache(cachedir),
+            show_progress=False, nworkers=4)
+
+        files1 = sorted(p1.iter_files(), key=lambda f: f.abspath)
+        files2 = sorted(p2.iter_files(), key=lambda f: f.abspath)
+        assert len(files1) == len(files2) == nfiles
+        for f1, f2 in zip(files1, files2):
+            assert f1.abspath == f2.abspath
+            assert f1.tmin == f2.tmin and f1.tmax == f2.tmax
+            assert pile.get_cache(cachedir).get_info(f1.abspath) \
+                == (f1.format, f1.mtime)
+
+        # aborted scan must not leave worker processes behind
+        import multiprocessing
+        procs_before = set(multiprocessing.active_children())
+
+        def abort(label, i, n):
+            return label == 'Scanning files' and i > 3
+
+        p3 = pile.Pile()
+        p3.load_files(
+            filenames=filenames, show_progress=False, nworkers=4,
+            update_progress=abort)
+
+        assert 0 < len(list(p3.iter_files())) < nfiles
+        assert set(multiprocessing.active_children()) == procs_before
+
+        shutil.rmtree(datadir)
+
+    def testPrefetch(self):
+        import shutil
+        nfiles = 40
+        nsamples = 1000
+        tmin = 1234567890
+        datadir = makeManyFiles(
+            nfiles, nsamples, ['xx'], ['aaaa', 'bbbb'], ['BHZ'], tmin)
+        filenames = util.select_files([datadir], show_progress=False)
+        p = pile.Pile()
+        p.load_files(filenames=filenames, show_progress=False)
+
+        for kwargs in [
+                dict(tinc=333., tpad=10.),
+                dict(tinc=2000., prefetch_nbytes_max=0),
+                dict(tinc=100., tmax=tmin+5000.)]:
+
+            wins1 = list(p.chopper(**kwargs))
+            for prefetch in (1, 3):
+                wins2 = list(p.chopper(prefetch=prefetch, **kwargs))
+                assert len(wins1) == len(wins2)
+                for trs1, trs2 in zip(wins1, wins2):
+                    assert len(trs1) == len(trs2)
+                    for tr1, tr2 in zip(trs1, trs2):
+                        assert tr1.nslc_id == tr2.nslc_id
+                        assert num.all(tr1.ydata == tr2.ydata)
+
+        for file in p.iter_files():
+            assert not file.data_loaded
+
+        # abandon iterator before it is exhausted
+        for trs in p.chopper(tinc=500., prefetch=2):
+            break
+
+        # prefetched data is released when the file is not needed anymore or
+        # has been loaded otherwise
+        import time
+        files = sorted(p.iter_files(), key=lambda file: file.tmin)[-3:]
+        prefetcher = pile.Prefetcher()
+        prefetcher.request(files)
+        for _ in range(1000):
+            if len(prefetcher._done) == 3:
+                break
+
+            time.sleep(0.01)
+
+        nbytes = prefetcher._nbytes
+        assert nbytes > 0
+        prefetcher.retain(set(files[1:]))
+        assert 0 < prefetcher._nbytes < nbytes
+
+        files[1].load_data()
+        prefetcher.retain(set(files[1:]))
+        assert files[1] not in prefetcher._done
+        assert prefetcher.take(files[2]) is not None
+        assert prefetcher._nbytes == 0
+        prefetcher.stop()
+        files[1].drop_data()
+
+        shutil.rmtree(datadir)
+
+    def testPartialLoading(self):
+        import shutil
+        datadir = tempfile.mkdtemp()
+        tmin = 1234567890
+        traces = []
+        for i, (sta, cha) in enumerate([
+                ('aaaa', 'BHZ'), ('aaaa', 'BHN'), ('bbbb', 'BHZ')]):
+
+            ydata = num.arange(i, i+100000, dtype=num.int32)
+            traces.append(trace.Trace(
+                'xx', sta, '', cha, tmin, None, 0.01, ydata))
+
+        fn = pjoin(datadir, 'data.mseed')
+        io.save(traces, fn)
+
+        records = io.mseed.get_record_index(fn)
+        assert records.size > 10
+        assert num.sum(records['nsamples']) == 300000
+        offset, nbytes = io.mseed.get_byte_range(
+            records, tmin+100., tmin+110., [('xx', 'aaaa', '', 'BHN')])
+
+        assert nbytes < os.stat(fn).st_size // 10
+        trs = io.load(fn, byte_range=(offset, nbytes))
+        assert any(tr.nslc_id == ('xx', 'aaaa', '', 'BHN') for tr in trs)
+        assert sum(tr.data_len() for tr in trs) < 100000
+
+        cache = pile.get_cache(pjoin(datadir, '_cache_'))
+        for p in [pile.Pile(), pile.LazyPile(cache)]:
+            if isinstance(p, pile.LazyPile):
+                p.load_files([fn], show_progress=False)
+            else:
+                p.load_files([fn], cache=cache, show_progress=False)
+
+            for kwargs in [
+                    dict(tmin=tmin+50., tmax=tmin+500., tinc=33.3),
+                    dict(tmin=tmin+10., tmax=tmin+20., tinc=5.,
+                         trace_selector=lambda tr: tr.station == 'bbbb'),
+                    dict(tmin=tmin-10., tmax=tmin+1010., tinc=100.,
+                         want_incomplete=False)]:
+
+                wins1 = list(p.chopper(**kwargs))
+                wins2 = list(p.chopper(load_partial=True, **kwargs))
+                assert len(wins1) == len(wins2)
+                for trs1, trs2 in zip(wins1, wins2):
+                    assert len(trs1) == len(trs2)
+                    for tr1, tr2 in zip(trs1, trs2):
+                        assert tr1.nslc_id == tr2.nslc_id
+                        assert abs(tr1.tmin - tr2.tmin) < 1e-3 * tr1.deltat
+                        assert num.all(tr1.ydata == tr2.ydata)
+
+        assert cache.get(os.path.abspath(fn)).records.size == records.size
+
+        # files which cannot be read partially are loaded completely, record
+        # indices are kept within budget
+        fn_sac = pjoin(datadir, 'data.sac')
+        fn2 = pjoin(datadir, 'data2.mseed')
+        io.save([trace.Trace(
+            'xx', 'cccc', '', 'BHZ', tmin, None, 0.01,
+            num.arange(100000, dtype=num.float32))], fn_sac, format='sac')
+        io.save([trace.Trace(
+            'xx', 'dddd', '', 'BHZ', tmin, None, 0.01,
+            num.arange(100000, dtype=num.int32))], fn2)
+
+        p = pile.Pile()
+        p.records_nbytes_max = 0
+        p.load_files(
+            [fn, fn_sac, fn2], fileformat='detect', show_progress=False)
+
+        kwargs = dict(tmin=tmin+50., tmax=tmin+500., tinc=33.3)
+        wins1 = list(p.chopper(**kwargs))
+        wins2 = list(p.chopper(load_partial=True, **kwargs))
+        assert len(wins1) == len(wins2)
+        for trs1, trs2 in zip(wins1, wins2):
+            assert [tr.nslc_id for tr in trs1] \
+                == [tr.nslc_id for tr in trs2]
+            for tr1, tr2 in zip(trs1, trs2):
+                assert num.all(tr1.ydata == tr2.ydata)
+
+        assert len(p._records_files) == 1
+        for file in p.iter_files():
+            assert not file.data_loaded
+            if file.abspath == fn_sac:
+                assert not file.is_partially_readable()
+                assert file.records is None
+
+        shutil.rmtree(datadir)
+
+    def testChopperDtype(self):
+        import shutil
+        datadir = tempfile.mkdtemp()
+        tmin = 1234567890
+        ydata = num.arange(100000, dtype=num.int32)
+        tr = trace.Trace('xx', 'aaaa', '', 'BHZ', tmin, None, 0.01, ydata)
+        fn = pjoin(datadir, 'data.mseed')
+        io.save([tr], fn)
+
+        p = pile.make_pile([fn], show_progress=False)
+        for load_partial in (False, True):
+            for trs in p.chopper(
+                    tmin=tmin+10., tmax=tmin+100., tinc=30.,
+                    load_partial=load_partial, dtype=num.float32):
+
+                assert len(trs) == 1
+                assert trs[0].ydata.dtype == num.float32
+
+        trs = p.chop(tmin+10., tmin+20., dtype=num.float32)[0]
+        assert trs[0].ydata.dtype == num.float32
+        assert num.all(trs[0].ydata == num.arange(1000, 2000))
+
+        trs = p.chop(tmin+10., tmin+20.)[0]
+        assert trs[0].ydata.dtype == num.int32
+
+        shutil.rmtree(datadir)
+
+    def testDataCache(self):
+        import shutil
+        nfiles = 20
+        nsamples = 1000
+        tmin = 1234567890
+        datadir = makeManyFiles(
+            nfiles, nsamples, ['xx'], ['aaaa', 'bbbb'], ['BHZ'], tmin)
+        filenames = util.select_files([datadir], show_progress=False)
+        p = pile.Pile()
+        p.load_files(filenames=filenames, show_progress=False)
+        nbytes_file = nsamples * 8
+
+        p.set_data_cache_size(nfiles * nbytes_file)
+        cache = p.get_data_cache()
+
+        sums = []
+        for i in range(2):
+            s = 0.
+            for traces in p.chopper(tinc=333.):
+                for tr in traces:
+                    s += num.sum(tr.ydata)
+
+            sums.append(s)
+
+        assert sums[0] == sums[1]
+        assert cache.nmisses == nfiles
+        assert cache.nevictions == 0
+        assert cache.nbytes == nfiles * nbytes_file
+        assert cache.get_hit_rate() > 0.5
+        assert all(file.data_loaded for file in p.iter_files())
+
+        p.set_data_cache_size(3 * nbytes_file)
+        assert len(cache) == 3
+        assert cache.nevictions == nfiles - 3
+        assert len([f for f in p.iter_files() if f.data_loaded]) == 3
+
+        list(p.chopper(tinc=333.))
+        assert len([f for f in p.iter_files() if f.data_loaded]) == 3
+
+        p.set_data_cache_size(None)
+        assert not any(file.data_loaded for file in p.iter_files())
+
+        shutil.rmtree(datadir)
+
+    def testChopperGroupedParallel(self):
+        import shutil
+        nfiles = 60
+        nsamples = 1000
+        tmin = 1234567890
+        stations = ['s%02i' % i for i in range(8)]
+        datadir = makeManyFiles(
+            nfiles, nsamples, ['xx'], stations, ['BHZ', 'BHN'], tmin)
+        filenames = util.select_files([datadir], show_progress=False)
+        p = pile.Pile()
+        p.load_files(filenames=filenames, show_progress=False)
+
+        def gather(tr):
+            return tr.nslc_id[:2]
+
+        def summary(traces):
+            return [(tr.nslc_id, tr.tmin, tr.data_len()) for tr in traces]
+
+        ref = [summary(traces) for traces in p.chopper_grouped(
+            gather, tinc=777.)]
+
+        assert ref
+
+        lp = pile.LazyPile(pile.get_cache(pjoin(datadir, '_cache_')))
+        lp.load_files(filenames, show_progress=False)
+
+        for p_ in (p, lp):
+            for nworkers in (2, 4):
+                res = [summary(traces) for traces in p_.chopper_grouped(
+                    gather, tinc=777., nworkers=nworkers)]
+
+                assert res == ref
+
+                res = [summary(traces) for traces in p_.chopper_grouped(
+                    gather, tinc=777., nworkers=nworkers, ordered=False)]
+
+                assert sorted(res) == sorted(ref)
+
+        res = [summary(traces) for traces in lp.chopper_grouped(
+            gather, tinc=777., nworkers=2, load_partial=True)]
+
+        assert res == ref
+
+        nref = [sum(n for (_, _, n) in s) for s in ref]
+        for nprocs in (1, 2):
+            res = list(p.chopper_grouped(
+                gather, tinc=777., nworkers=3, process=count_samples,
+                nprocs=nprocs))
+
+            assert res == nref
+
+        # stop early, data must be released
+        for traces in p.chopper_grouped(gather, tinc=777., nworkers=3):
+            break
+
+        for file in p.iter_files():
+            assert not file.data_loaded
+            assert file.data_use_count == 0
+
+        assert all(
+            not isinstance(k, tuple) for k in p.open_files.keys())
+
+        shutil.rmtree(datadir)
+
+    def testThreadImapGroupsBounded(self):
+        import threading
+        import time
+
+        n = 6
+        nitems = 40
+        nworkers = 3
+        nbuffer = 2
+        lock = threading.Lock()
+        counts = {'produced': 0}
+
+        def produce(i):
+            for j in range(nitems):
+                with lock:
+                    counts['produced'] += 1
+
+                yield j
+
+        nconsumed = 0
+        nahead_max = 0
+        results = []
+        for i, done, result in pile._thread_imap_groups(
+                produce, n, nworkers, True, nbuffer=nbuffer):
+
+            if not done:
+                nconsumed += 1
+                results.append((i, result))
+                # slow consumer, give the workers time to run ahead
+                time.sleep(0.001)
+                with lock:
+                    nahead_max = max(
+                        nahead_max, counts['produced'] - nconsumed)
+
+        assert results == [(i, j) for i in range(n) for j in range(nitems)]
+        # per worker: a full queue plus the item in hand, plus the one item
+        # the consumer is handling
+        assert nahead_max <= nworkers * (nbuffer + 1) + 1
+
+    def testMatchTemplates(self):
+        deltat = 0.1
+        tmin = 1234567890.
+        nsamples = 10000
+        channels = ['BHZ', 'BHN', 'BHE']
+        traces = [
+            trace.Trace(
+                'XX', 'STA', '', channel, tmin=tmin, deltat=deltat,
+                ydata=num.random.normal(size=nsamples)*0.5)
+            for channel in channels]
+
+        ysignals = [
+            num.sin(num.arange(100)*0.1*(i+1)) * num.hanning(100) * 3.
+            for i in range(len(channels))]
+
+        moveouts = [0, 15, 40]
+        ievents = [1000, 4567, 8000]
+        for ievent in ievents:
+            for tr, ysignal, moveout in zip(traces, ysignals, moveouts):
+                tr.ydata[ievent+moveout:ievent+moveout+100] += ysignal
+
+        template = [
+            trace.Trace(
+                'XX', 'STA', '', channel,
+                tmin=tmin + (ievents[0]+moveout)*deltat, deltat=deltat,
+                ydata=ysignal.copy())
+            for (channel, ysignal, moveout)
+            in zip(channels, ysignals, moveouts)]
+
+        p = pile.Pile()
+        p.add_file(pile.MemTracesFile(None, traces))
+        for tinc in (None, 170.):
+            detections = list(p.match_templates([template], 0.6, tinc=tinc))
+            assert [itemplate for (itemplate, _, _) in detections] \
+                == [0, 0, 0]
+            assert [int(round((t - tmin) / deltat))
+                    for (_, t, _) in detections] == ievents
+            assert all(value > 0.8 for (_, _, value) in detections)
+
     def testMemTracesFile(self):
         tr = trace.Trace(ydata=num.arange(100, dtype=num.float))
 
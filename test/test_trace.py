@@ -7,9 +7,13 @@ from builtins import range
 from pyrocko import trace, util, model, pile
 import unittest
 import math
+import copy
+import os
+import tempfile
 import time
 import numpy as num
 import pickle as pickle
+from scipy import signal
 
 from . import common
 
@@ -108,6 +112,119 @@ class TraceTestCase(unittest.TestCase):
                 assert x.ydata.size == 18
                 assert numeq(x.ydata[8:10], res, 1e-6)
 
+    def testDegappingBatch(self):
+        rstate = num.random.RandomState(1)
+
+        def make_traces(dtype):
+            traces = []
+            for sta in ['A', 'B']:
+                tmin = sometime
+                for i in range(200):
+                    n = rstate.randint(0, 30)
+                    ydata = (rstate.normal(size=n)*100.).astype(dtype)
+                    tshift = 0.3 if rstate.rand() < 0.05 else 0.0
+                    traces.append(trace.Trace(
+                        station=sta, tmin=tmin + tshift, deltat=1.0,
+                        tmax=tmin + tshift + (n-1), ydata=ydata))
+
+                    tmin += n + rstate.choice([-40, -5, -1, 0, 1, 3, 10])
+
+            traces.sort(key=lambda tr: tr.full_id)
+            return traces
+
+        for dtype, deoverlaps in [
+                (num.float64, ['use_second', 'use_first', 'crossfade_cos',
+                               'add']),
+                (num.int32, ['use_second', 'use_first', 'add'])]:
+
+            for deoverlap in deoverlaps:
+                for fillmethod in ['interpolate', 'zeros']:
+                    for maxgap, maxlap in [(5, None), (5, 10), (0, 0)]:
+                        traces = make_traces(dtype)
+                        kwargs = dict(
+                            maxgap=maxgap, fillmethod=fillmethod,
+                            deoverlap=deoverlap, maxlap=maxlap)
+
+                        xs = trace.degapper(
+                            [tr.copy() for tr in traces], **kwargs)
+                        ys = trace._degapper_pairwise(
+                            [tr.copy() for tr in traces], **kwargs)
+
+                        assert len(xs) == len(ys)
+                        for x, y in zip(xs, ys):
+                            assert x.nslc_id == y.nslc_id
+                            assert x.tmin == y.tmin and x.tmax == y.tmax
+                            assert x.ydata.dtype == y.ydata.dtype
+                            assert num.all(x.ydata == y.ydata)
+
+    def testTraceTable(self):
+        rstate = num.random.RandomState(123)
+        traces = []
+        for sta in ['A', 'B', 'C']:
+            for deltat in [0.5, 1.0]:
+                tmin = sometime
+                for i in range(100):
+                    n = rstate.randint(1, 20)
+                    traces.append(trace.Trace(
+                        station=sta, tmin=tmin, deltat=deltat,
+                        tmax=tmin + (n-1)*deltat))
+
+                    tmin += rstate.choice([-30, -3, 1, 2, 8, 20]) * deltat \
+                        + n * deltat
+
+        # misaligned sampling, for which connection depends on the order
+        traces.append(trace.Trace(
+            station='C', tmin=sometime + 0.3, deltat=1.0,
+            tmax=sometime + 30.3))
+
+        rstate.shuffle(traces)
+        ttab = trace.TraceTable.from_traces(traces)
+        assert len(ttab) == len(traces)
+
+        for tr, tr2 in zip(traces, ttab.iter_traces()):
+            assert tr.nslc_id == tr2.nslc_id
+            assert tr.tmin == tr2.tmin and tr.tmax == tr2.tmax
+
+        assert trace.minmaxtime(ttab) == trace.minmaxtime(traces)
+
+        sel = ttab.select(
+            tmin=sometime+100., tmax=sometime+200., codes='*.A.*.*')
+        assert len(sel) == len([
+            tr for tr in traces
+            if tr.station == 'A' and tr.is_relevant(
+                sometime+100., sometime+200.)])
+
+        for maxgap, maxlap in [(5, None), (5, 10), (0, 0)]:
+            traces_sorted = sorted(
+                [tr.copy(data=False) for tr in traces],
+                key=lambda tr: (tr.nslc_id, tr.deltat, tr.tmin))
+
+            degapped = []
+            for deltat in [0.5, 1.0]:
+                degapped.extend(trace.degapper(
+                    [tr for tr in traces_sorted if tr.deltat == deltat],
+                    maxgap=maxgap, maxlap=maxlap))
+
+            degapped.sort(key=lambda tr: (tr.nslc_id, tr.deltat, tr.tmin))
+            ttab_degapped = trace.degapper(ttab, maxgap=maxgap, maxlap=maxlap)
+
+            assert isinstance(ttab_degapped, trace.TraceTable)
+            assert len(ttab_degapped) == len(degapped)
+            for tr, tr2 in zip(degapped, ttab_degapped.iter_traces()):
+                assert tr.nslc_id == tr2.nslc_id
+                assert tr.tmin == tr2.tmin
+                assert abs(tr.tmax - tr2.tmax) < 1e-6
+
+        # with data, degapper is used
+        traces = [
+            trace.Trace(tmin=sometime, deltat=1.0, ydata=num.zeros(10)),
+            trace.Trace(tmin=sometime+12., deltat=1.0, ydata=num.ones(10))]
+
+        ttab = trace.TraceTable.from_traces(traces)
+        ttab_degapped = ttab.degap()
+        assert len(ttab_degapped) == 1
+        assert ttab_degapped.get_trace(0).ydata.size == 22
+
     def testRotation(self):
         s2 = math.sqrt(2.)
         ndata = num.array([s2, s2], dtype=num.float)
@@ -197,6 +314,38 @@ class TraceTestCase(unittest.TestCase):
 
         assert(num.all(u.get_ydata() - num.array([-1., 1.]) < 1.0e-6))
 
+    def testProjectionMany(self):
+        traces = []
+        for ista in range(5):
+            for channel in 'ZNE':
+                for iseg in range(2):
+                    traces.append(trace.Trace(
+                        '', 'S%i' % ista, '', channel,
+                        tmin=sometime + iseg*300. + num.random.randint(0, 5),
+                        deltat=0.5,
+                        ydata=num.random.normal(size=200)))
+
+        matrix = num.random.normal(size=(3, 3))
+        projected = trace.project(traces, matrix, 'ZNE', 'LQT')
+        assert len(projected) == 5 * 2 * 3
+
+        for tr in projected:
+            inputs = [
+                x.chop(tr.tmin, tr.tmax, inplace=False, include_last=True)
+                for x in traces
+                if x.station == tr.station and x.tmin <= tr.tmin
+                and tr.tmax <= x.tmax]
+
+            assert [x.channel for x in inputs] == list('ZNE')
+            ydata = num.dot(
+                matrix['LQT'.index(tr.channel)],
+                [x.ydata for x in inputs])
+
+            assert numeq(tr.ydata, ydata, 1e-10)
+
+        rotated = trace.rotate(traces, 30., ['N', 'E'], ['R', 'T'])
+        assert len(rotated) == 5 * 2 * 2
+
     def testExtend(self):
         tmin = sometime
         t = trace.Trace(tmin=tmin, ydata=num.ones(10, dtype=num.float))
@@ -261,6 +410,58 @@ class TraceTestCase(unittest.TestCase):
             t.bandpass_fft(0.1, 5.)
         # d2 = time.time() - b
 
+    def testFilteringSOS(self):
+        rstate = num.random.RandomState(22)
+        ydata = rstate.normal(size=5000)
+        tr = trace.Trace(tmin=sometime, deltat=0.05, ydata=ydata)
+
+        # same result as filtering with transfer function coefficients, for
+        # well conditioned filters
+        b, a = trace._get_cached_filter_coefs(4, [0.1*2.0*0.05], btype='high')
+        t1 = tr.copy()
+        t1.highpass(4, 0.1, demean=False)
+        assert numeq(t1.ydata, signal.lfilter(b, a, ydata), 1e-8)
+
+        # high order and low corner frequency
+        t2 = tr.copy()
+        t2.lowpass(10, 0.02)
+        assert num.all(num.isfinite(t2.ydata))
+        assert num.max(num.abs(t2.ydata)) < num.max(num.abs(ydata))
+
+        # zero-phase: impulse response is symmetric
+        t3 = trace.Trace(tmin=sometime, deltat=0.05, ydata=num.zeros(2001))
+        t3.ydata[1000] = 1.0
+        t3.bandpass(4, 0.5, 2.0, demean=False, zerophase=True)
+        assert numeq(t3.ydata, t3.ydata[::-1], 1e-12)
+        assert num.argmax(t3.ydata) == 1000
+
+        with self.assertRaises(trace.TraceTooShort):
+            trace.Trace(deltat=0.05, ydata=num.ones(10)).bandpass(
+                4, 0.5, 2.0, zerophase=True)
+
+    def testContinuousFiltering(self):
+        rstate = num.random.RandomState(23)
+        ydata = rstate.normal(size=1000)
+        for name, args in [
+                ('lowpass', (4, 0.5)),
+                ('highpass', (6, 0.05)),
+                ('bandpass', (3, 0.1, 1.0))]:
+
+            a = trace.Trace(tmin=sometime, deltat=0.1, ydata=ydata)
+            getattr(a, name)(*args, demean=False)
+
+            cs = []
+            pipe = getattr(trace, 'co_' + name)(
+                trace.co_list_append(cs), *args)
+            for i in range(10):
+                pipe.send(trace.Trace(
+                    tmin=sometime+i*10., deltat=0.1,
+                    ydata=ydata[i*100:(i+1)*100]))
+
+            pipe.close()
+            c = trace.degapper(cs)[0]
+            assert numeq(c.ydata, a.ydata, 1e-10)
+
     def testCropping(self):
         n = 20
         tmin = sometime
@@ -369,6 +570,34 @@ class TraceTestCase(unittest.TestCase):
         assert numeq(c_ab.ydata, c_ba.ydata[::-1], 0.001)
         assert numeq(c_ab2.ydata, c_ba2.ydata[::-1], 0.001)
 
+    def testCorrelateNormalizedMany(self):
+        ydata = num.random.normal(size=1000) + 3.
+        ytemplates = num.random.normal(size=(3, 50))
+        ydata[100:150] = ytemplates[1]*2.
+        ydata[500:550] = 1.0
+
+        cc = trace.correlate_normalized_many(
+            ytemplates, ydata, nbytes_max=1)
+
+        assert cc.shape == (3, 951)
+        for i in range(3):
+            for k in (0, 100, 477, 950):
+                cc_ref = num.corrcoef(ytemplates[i], ydata[k:k+50])[0, 1]
+                assert abs(cc[i, k] - cc_ref) < 1e-10
+
+        assert abs(cc[1, 100] - 1.0) < 1e-10
+        assert num.all(cc[:, 500] == 0.0)
+
+        t = trace.Trace(tmin=sometime, deltat=0.1, ydata=ydata)
+        templates = [[
+            trace.Trace(tmin=sometime-10., deltat=0.1, ydata=ytemplate)]
+            for ytemplate in ytemplates]
+
+        ccs = trace.match_templates(templates, [t])
+        assert ccs[1].tmin == sometime
+        assert numeq(ccs[1].ydata, cc[1], 1e-10)
+        assert abs(ccs[1].max()[0] - (sometime + 10.)) < 1e-6
+
     def testNumpyCorrelate(self):
         primes = num.array(
             [1, 2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31], dtype=num.int)
@@ -492,6 +721,172 @@ class TraceTestCase(unittest.TestCase):
                 assert (round(c2s[0].tmin / dt2) * dt2 - c2s[0].tmin) \
                     / dt1 < 0.5001
 
+    def testResamplePolyphase(self):
+        y = num.random.normal(size=2000)
+
+        for (dt1, dt2) in [
+                (0.01, 0.025),
+                (0.01, 0.015),
+                (0.01, 0.003),
+                (0.01, 0.03)]:
+
+            a = trace.Trace(tmin=sometime, deltat=dt1, ydata=y.copy())
+            a.resample_polyphase(dt2)
+            assert a.deltat == dt2
+
+            up, down = trace._rational_ratio(dt1, dt2)
+            yref = signal.resample_poly(y, up, down)
+            n = a.ydata.size
+            assert abs(n - yref.size) <= up
+            num.testing.assert_allclose(
+                a.ydata[:n], yref[:n], rtol=0., atol=1e-10)
+
+        a = trace.Trace(tmin=sometime, deltat=0.01, ydata=y.copy())
+        with self.assertRaises(trace.UnavailableDecimation):
+            a.copy().downsample_to(0.025)
+
+        a.downsample_to(0.025, allow_polyphase=True)
+        assert a.deltat == 0.025
+
+        # no silent upsampling
+        with self.assertRaises(trace.UnavailableDecimation):
+            a.downsample_to(0.01, allow_polyphase=True)
+
+    def testContinuousResample(self):
+        y = num.random.normal(size=1000)
+        dt1, dt2 = 0.01, 0.025
+
+        for tadd in (0.0, 0.003, 0.01, 0.7):
+            a = trace.Trace(tmin=sometime+tadd, deltat=dt1, ydata=y)
+            a.resample_polyphase(dt2, snap=True)
+
+            bs = [trace.Trace(
+                tmin=sometime+i*dt1*77+tadd,
+                deltat=dt1,
+                ydata=y[i*77:(i+1)*77]) for i in range(13)]
+
+            cs = []
+            resampler = trace.co_downsample_to(
+                trace.co_list_append(cs), dt2, allow_polyphase=True)
+
+            for b in bs:
+                resampler.send(b)
+
+            resampler.close()
+
+            assert abs(cs[0].tmin - a.tmin) < dt1 * 0.01
+            for c1, c2 in zip(cs[:-1], cs[1:]):
+                assert abs(c1.tmax + dt2 - c2.tmin) < dt1 * 0.01
+
+            yc = num.concatenate([c.ydata for c in cs])
+            assert a.ydata.size - yc.size < 20
+            num.testing.assert_allclose(
+                yc, a.ydata[:yc.size], rtol=0., atol=1e-10)
+
+        resampler = trace.co_downsample_to(
+            trace.co_list_append([]), dt1, allow_polyphase=True)
+
+        with self.assertRaises(trace.UnavailableDecimation):
+            resampler.send(trace.Trace(
+                tmin=sometime, deltat=dt2, ydata=y))
+
+    def testWorkspace(self):
+        tr = trace.Trace(
+            tmin=sometime, deltat=0.01, ydata=num.random.normal(size=10000))
+
+        taper = trace.CosFader(xfade=1.)
+        response = trace.ButterworthResponse(corner=5., order=4, type='low')
+        ws = trace.Workspace()
+        nbytes = None
+        for i in range(5):
+            tmin = sometime + i * 10.
+            chopped = tr.chop(tmin, tmin + 20., inplace=False)
+            chopped_ws = tr.chop(tmin, tmin + 20., inplace=False, workspace=ws)
+            assert numeq(chopped.ydata, chopped_ws.ydata, 0.)
+
+            tapered = chopped.taper(taper, inplace=False)
+            tapered_ws = chopped_ws.taper(taper, inplace=False, workspace=ws)
+            assert numeq(tapered.ydata, tapered_ws.ydata, 0.)
+
+            for tfade in (0., 2.):
+                transferred = tapered.transfer(
+                    tfade=tfade, transfer_function=response)
+                transferred_ws = tapered_ws.transfer(
+                    tfade=tfade, transfer_function=response, workspace=ws)
+                assert numeq(transferred.ydata, transferred_ws.ydata, 1e-10)
+                assert transferred.tmin == transferred_ws.tmin
+
+            envelope = chopped.envelope(inplace=False)
+            envelope_ws = chopped_ws.envelope(inplace=False, workspace=ws)
+            assert numeq(envelope.ydata, envelope_ws.ydata, 1e-10)
+
+            if nbytes is None:
+                nbytes = ws.nbytes
+            else:
+                assert ws.nbytes == nbytes
+
+            assert chopped_ws.ydata.base is ws.empty('chop', 0).base
+
+    def testProcessingDtype(self):
+        assert trace.get_processing_dtype() == num.float64
+        with self.assertRaises(ValueError):
+            trace.set_processing_dtype(num.int32)
+
+        tr64 = trace.Trace(
+            tmin=sometime, deltat=0.01, ydata=num.random.normal(size=10000))
+
+        def process(tr, lowpass_corner=10., highpass_corner=0.5):
+            tr = tr.copy()
+            tr.lowpass(4, lowpass_corner)
+            tr.highpass(4, highpass_corner)
+            tr.taper(trace.CosFader(xfade=1.))
+            tr = tr.transfer(
+                tfade=2., transfer_function=trace.ButterworthResponse(
+                    corner=5., order=4, type='low'))
+            tr.downsample_to(0.02)
+            tr.resample(0.05)
+            return tr
+
+        try:
+            trace.set_processing_dtype(num.float32)
+            assert trace.get_processing_dtype() == num.float32
+
+            tr32 = tr64.copy()
+            tr32.set_ydata(tr64.ydata.astype(num.float32))
+            processed32 = process(tr32)
+            assert processed32.ydata.dtype == num.float32
+
+            # corners far below Nyquist are critical for IIR filters
+            processed32_low = process(tr32, 0.05, 0.01)
+            assert processed32_low.ydata.dtype == num.float32
+
+            trint = tr64.copy()
+            trint.set_ydata((tr64.ydata * 1000.).astype(num.int32))
+            trint.taper(trace.CosFader(xfade=1.))
+            assert trint.ydata.dtype == num.float32
+
+            a, b = tr32.chop(
+                sometime, sometime + 50., inplace=False), \
+                tr32.chop(sometime + 50., sometime + 100., inplace=False)
+            b.shift(0.01)
+            degapped = trace.degapper([a, b])
+            assert len(degapped) == 1
+            assert degapped[0].ydata.dtype == num.float32
+
+        finally:
+            trace.set_processing_dtype(num.float64)
+
+        processed64 = process(tr64)
+        assert processed64.ydata.dtype == num.float64
+        assert numeq(
+            processed32.ydata, processed64.ydata,
+            1e-6 * num.max(num.abs(processed64.ydata)))
+
+        processed64_low = process(tr64, 0.05, 0.01)
+        assert numeq(
+            processed32_low.ydata, processed64_low.ydata,
+            1e-6 * num.max(num.abs(processed64_low.ydata)))
+
     def testEqualizeSamplingRates(self):
         y = num.random.random(1000)
         t1 = trace.Trace(tmin=0, ydata=y, deltat=0.01)
@@ -576,6 +971,48 @@ class TraceTestCase(unittest.TestCase):
                 m, n = rt.misfit(candidate=cand, setup=setup)
                 self.assertNotEqual(m, None, 'misfit\'s m is None')
 
+    def testMisfitMany(self):
+        y = num.random.normal(size=1000)
+        observed = trace.Trace(tmin=sometime, deltat=0.01, ydata=y)
+        candidates = [
+            trace.Trace(
+                tmin=sometime + (i % 3) * 0.01,
+                deltat=0.005 if i % 4 == 0 else 0.01,
+                ydata=num.random.normal(size=2000 if i % 4 == 0 else 1000))
+            for i in range(8)]
+
+        taper = trace.CosFader(xfade=2.)
+        fresponse = trace.ButterworthResponse(corner=5., order=4, type='low')
+        setups = [trace.MisfitSetup(
+            norm=n,
+            taper=taper,
+            domain=domain,
+            filter=fresponse) for domain in trace.DomainChoice.choices
+            for n in [1, 2]]
+
+        setups.append(trace.MisfitSetup(norm=2, taper=taper))
+
+        mn = trace.misfit_many(observed, candidates, setups)
+        assert mn.shape == (len(candidates), len(setups), 2)
+        for icand, candidate in enumerate(candidates):
+            for isetup, setup in enumerate(setups):
+                m, n = observed.misfit(candidate, setup)
+                num.testing.assert_allclose(
+                    mn[icand, isetup], num.real([m, n]), rtol=1e-10)
+
+        cache = trace.cached_misfit_chain
+        nbytes_max = cache.nbytes_max
+        try:
+            cache.set_limits(nbytes_max=100000)
+            for candidate in candidates:
+                observed.misfit(candidate, setups[0])
+
+            assert 0 < cache.nbytes <= 100000
+            assert trace.get_cache_stats()['misfit_chain']['nevictions'] > 0
+
+        finally:
+            cache.set_limits(nbytes_max=nbytes_max)
+
     def testMisfitBox(self):
 
         ydata = num.zeros(9)
@@ -667,6 +1104,86 @@ class TraceTestCase(unittest.TestCase):
         tr2.ydata += tr1.ydata.mean()
         assert numeq(tr1.ydata, tr2.ydata, 0.01)
 
+    def test_transfer_many(self):
+        rstate = num.random.RandomState(10)
+        responses = [
+            trace.PoleZeroResponse(
+                zeros=[0j, 0j], poles=[-0.037+0.037j, -0.037-0.037j],
+                constant=1.0e3),
+            trace.ButterworthResponse(corner=2.0, order=3)]
+
+        traces = []
+        tfs = []
+        for i in range(12):
+            n = rstate.choice([1000, 1100, 3000])
+            deltat = rstate.choice([0.1, 0.05])
+            traces.append(trace.Trace(
+                station='S%i' % i, tmin=sometime, deltat=deltat,
+                ydata=rstate.normal(size=n)))
+
+            # equal content, different instances
+            tfs.append(copy.deepcopy(responses[i % 2]))
+
+        for kwargs in [
+                dict(),
+                dict(tfade=10., freqlimits=(0.01, 0.02, 2., 4.)),
+                dict(tfade=10., freqlimits=(0.01, 0.02, 2., 4.),
+                     invert=True, cut_off_fading=False)]:
+
+            for tfs_ in [tfs, responses[0]]:
+                outs = trace.transfer_many(
+                    traces, tfs_, nbytes_max=100000, **kwargs)
+
+                for i, (tr, out) in enumerate(zip(traces, outs)):
+                    if isinstance(tfs_, list):
+                        tf = tfs_[i]
+                    else:
+                        tf = tfs_
+
+                    ref = tr.transfer(transfer_function=tf, **kwargs)
+                    assert out.tmin == ref.tmin and out.tmax == ref.tmax
+                    assert numeq(out.ydata, ref.ydata, 1e-9 * num.max(
+                        num.abs(ref.ydata)))
+
+        with self.assertRaises(trace.TraceTooShort):
+            trace.transfer_many(traces, tfs, tfade=1000.)
+
+    def test_transfer_coefs_cache(self):
+        tr = trace.Trace(
+            tmin=sometime, deltat=0.1, ydata=num.random.normal(size=1234))
+
+        resp = trace.PoleZeroResponse(
+            zeros=[0j], poles=[-0.1+0.1j, -0.1-0.1j], constant=3.0)
+
+        stats_before = trace.get_cache_stats()['transfer_coefficients']
+        a = tr.transfer(transfer_function=resp)
+        b = tr.transfer(transfer_function=copy.deepcopy(resp))
+        stats = trace.get_cache_stats()['transfer_coefficients']
+        assert stats['nhits'] == stats_before['nhits'] + 1
+        assert num.all(a.ydata == b.ydata)
+
+        resp.constant = 6.0
+        c = tr.transfer(transfer_function=resp)
+        assert numeq(c.ydata, 2.0*a.ydata, 1e-6)
+
+        # file based responses are keyed with the modification time of the
+        # response file
+        fd, fn = tempfile.mkstemp(suffix='.resp')
+        os.close(fd)
+        try:
+            resp = trace.Evalresp(
+                fn, nslc_id=('', 'STA', '', 'BHZ'), time=sometime)
+
+            key = trace._response_key(resp)
+            assert key is not None
+            assert key == trace._response_key(copy.deepcopy(resp))
+            os.utime(fn, (0, 0))
+            assert key != trace._response_key(resp)
+        finally:
+            os.unlink(fn)
+
+        assert trace._response_key(resp) is None
+
     def test_muliply_taper(self):
 
         taper = trace.CosTaper(0., 1., 2., 3.)
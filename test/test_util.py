@@ -195,6 +195,41 @@ class UtilTestCase(unittest.TestCase):
 |   3.33E+09 |
 |   3.33E+10 |'''.strip())
 
+    def test_lru_cache(self):
+        cache = util.LRUCache(nmax=3)
+        for i in range(5):
+            cache[i] = i*10
+
+        assert len(cache) == 3
+        assert 0 not in cache and 4 in cache
+        assert cache[2] == 20
+        cache[5] = 50
+        assert 3 not in cache and 2 in cache
+
+        with self.assertRaises(KeyError):
+            cache[0]
+
+        assert cache.get(0) is None
+        assert cache.get_or_set(0, lambda: 0) == 0
+        stats = cache.get_stats()
+        assert stats['nhits'] == 1
+        assert stats['nmisses'] == 3
+        assert stats['nevictions'] == 4
+
+        cache = util.LRUCache(nbytes_max=1000)
+        for i in range(4):
+            cache[i] = num.zeros(40)
+
+        assert len(cache) == 3 and cache.nbytes == 960
+        cache[4] = (num.zeros(10), num.zeros(20))
+        assert len(cache) == 3 and cache.nbytes == 880
+
+        cache.set_limits(nbytes_max=300)
+        assert len(cache) == 1 and cache.nbytes == 240
+
+        cache.clear()
+        assert len(cache) == 0 and cache.nbytes == 0
+
     def test_download(self):
         fn = self.fpath('responses.xml')
         url = 'http://data.pyrocko.org/examples/responses.xml'